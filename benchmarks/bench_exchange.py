@@ -0,0 +1,25 @@
+import pytest
+
+import dom_extract
+import html_extract
+from conftest import EXCHANGE_URL
+
+# Container extraction on the saved 100-container exchange page. The live
+# WebDriver paths need Chrome (see modules/navarropy_scrapper/bench_extraction.py
+# for round-trip counts); here the offline parser and the record building they
+# all share are measured.
+
+
+@pytest.mark.benchmark(group='exchange-extraction')
+def bench_extract_containers_html(benchmark, exchange_html):
+    records = benchmark(html_extract.extract_containers_html, exchange_html, EXCHANGE_URL)
+    assert len(records) == 100
+
+
+@pytest.mark.benchmark(group='exchange-extraction')
+def bench_build_records(benchmark, exchange_html):
+    doc = html_extract.lxml_html.document_fromstring(exchange_html)
+    raws = [html_extract._read_container(c, EXCHANGE_URL) for c in html_extract._CONTAINER(doc)]
+
+    records = benchmark(lambda: [dom_extract.build_record(EXCHANGE_URL, raw) for raw in raws])
+    assert len(records) == 100
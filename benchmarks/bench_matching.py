@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import crawler
+from bench_matcher import make_names, make_queries, naive_best
+from matcher import FuzzyMatcher
+
+# Expected-vs-scraped name matching from the poewiki check (test.py): the
+# trigram-indexed FuzzyMatcher it uses now against the pairwise difflib loop
+# it replaced. Runs once on the saved category page with test.py's expected
+# names, and once at 2,000 x 2,000 synthetic names.
+
+
+@pytest.fixture(scope='module')
+def scraped_names(wiki_html):
+    return crawler.parse_image_names(wiki_html)
+
+
+@pytest.fixture(scope='module')
+def synthetic_names():
+    rng = random.Random(42)
+    candidates = make_names(2000, rng)
+    queries = make_queries(candidates, len(candidates), rng)
+    return candidates, queries
+
+
+@pytest.mark.benchmark(group='matcher-category')
+def bench_fuzzy_matcher_category(benchmark, poewiki_check, scraped_names):
+    results = benchmark(lambda: FuzzyMatcher(scraped_names).match_all(poewiki_check.expected_images))
+    assert len(results) == len(poewiki_check.expected_images)
+
+
+@pytest.mark.benchmark(group='matcher-category')
+def bench_pairwise_difflib_category(benchmark, poewiki_check, scraped_names):
+    results = benchmark(lambda: [naive_best(name, scraped_names) for name in poewiki_check.expected_images])
+    assert len(results) == len(poewiki_check.expected_images)
+
+
+@pytest.mark.benchmark(group='matcher-2000')
+def bench_fuzzy_matcher_2000(benchmark, synthetic_names):
+    candidates, queries = synthetic_names
+    results = benchmark.pedantic(lambda: FuzzyMatcher(candidates).match_all(queries), rounds=3)
+    assert len(results) == len(set(queries))
+
+
+@pytest.mark.benchmark(group='matcher-2000')
+def bench_pairwise_difflib_2000(benchmark, synthetic_names):
+    candidates, queries = synthetic_names
+    # 50 queries are enough to time the O(n*m) loop; scale by 40 for the full set
+    results = benchmark.pedantic(lambda: [naive_best(q, candidates) for q in queries[:50]], rounds=1)
+    assert len(results) == 50
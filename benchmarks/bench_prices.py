@@ -0,0 +1,32 @@
+import pytest
+
+import price_engine
+
+# Price parsing and per-item aggregation over 200,000 listings built from
+# the exchange fixture (the same 100 containers spread over 100 items).
+
+ROWS = 200_000
+
+
+@pytest.fixture(scope='module')
+def listing_records(exchange_records):
+    copies = ROWS // len(exchange_records)
+    return [dict(record, URL=f"{record['URL']}/{i % 100}") for i in range(copies) for record in exchange_records]
+
+
+@pytest.fixture(scope='module')
+def parsed_listings(listing_records):
+    return price_engine.parse_listings(listing_records)
+
+
+@pytest.mark.benchmark(group='prices')
+def bench_parse_listings(benchmark, listing_records):
+    frame = price_engine.pd.DataFrame.from_records(listing_records)
+    listings = benchmark(price_engine.parse_listings, frame)
+    assert len(listings) == ROWS
+
+
+@pytest.mark.benchmark(group='prices')
+def bench_aggregate_online(benchmark, parsed_listings):
+    result = benchmark(price_engine.aggregate, parsed_listings, True)
+    assert len(result) == 100
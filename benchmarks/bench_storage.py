@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import output_sink
+from conftest import NAVARROPY_DIR, load_script
+
+# Persistence paths: the JSON array link_collector.py.py used to rewrite
+# after every URL (kept here as the save_all_data_to_json baseline), the
+# NDJSON sink that replaced it, and the urls.db writes in main.py (batched
+# writer vs. the original commit per row).
+
+ROWS = 500
+
+
+@pytest.fixture(scope='module')
+def navarropy_main():
+    return load_script('navarropy_main', os.path.join(NAVARROPY_DIR, 'main.py'))
+
+
+@pytest.fixture
+def run_records(exchange_records):
+    # Ten URLs' worth of listings
+    return exchange_records * 10
+
+
+def save_all_data_to_json(all_data, run_epoch, json_dir):
+    """The collector's old output step: the whole run so far rewritten as one indented JSON array."""
+    os.makedirs(json_dir, exist_ok=True)
+    with open(os.path.join(json_dir, f"exchange_data_{run_epoch}.json"), 'w', encoding='utf-8') as f:
+        json.dump(all_data, f, ensure_ascii=False, indent=4)
+
+
+@pytest.mark.benchmark(group='json-output')
+def bench_save_all_data_to_json(benchmark, run_records, tmp_path):
+    benchmark(save_all_data_to_json, run_records, 1, str(tmp_path))
+    assert (tmp_path / 'exchange_data_1.json').exists()
+
+
+@pytest.mark.benchmark(group='json-output')
+def bench_ndjson_sink_append(benchmark, exchange_records, tmp_path):
+    sink = output_sink.NdjsonSink(str(tmp_path / 'exchange_data_1.ndjson'))
+    benchmark(sink.write, exchange_records)
+    sink.close()
+
+
+def url_rows(count=ROWS):
+    return [(f"item_{i:016x}", f"https://www.pathofexile.com/trade/exchange/Settlers/{i:08x}", f"Item {i}")
+            for i in range(count)]
+
+
+@pytest.mark.benchmark(group='urls-db')
+def bench_url_batch_writer(benchmark, navarropy_main, tmp_path):
+    rows = url_rows()
+    counter = iter(range(10 ** 6))
+
+    def setup():
+        conn, _ = navarropy_main.setup_database(str(tmp_path / f"urls_{next(counter)}.db"))
+        return (conn,), {}
+
+    def write(conn):
+        writer = navarropy_main.UrlBatchWriter(conn)
+        for img_id, url, title in rows:
+            writer.add(img_id, url, title)
+        writer.flush()
+        conn.close()
+
+    benchmark.pedantic(write, setup=setup, rounds=10)
+
+
+@pytest.mark.benchmark(group='urls-db')
+def bench_row_per_commit(benchmark, navarropy_main, tmp_path):
+    rows = url_rows()
+    counter = iter(range(10 ** 6))
+
+    def setup():
+        conn, c = navarropy_main.setup_database(str(tmp_path / f"urls_{next(counter)}.db"))
+        return (conn, c), {}
+
+    def write(conn, c):
+        for row in rows:
+            c.execute('INSERT OR IGNORE INTO extracted_data (img_id, url, item_title) VALUES (?, ?, ?)', row)
+            conn.commit()
+        conn.close()
+
+    benchmark.pedantic(write, setup=setup, rounds=10)
+
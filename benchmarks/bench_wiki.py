@@ -0,0 +1,44 @@
+import pytest
+
+import crawler
+from conftest import WIKI_URL
+
+# Category page parsing on a saved poewiki category page (300 files, 8
+# subcategories). requests.get in the poewiki scraper is pointed at the
+# fixture so only the parsing is timed.
+
+
+class FixtureResponse:
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+
+
+@pytest.fixture
+def offline_scraper(poewiki_scraper, wiki_html, monkeypatch):
+    monkeypatch.setattr(poewiki_scraper.requests, 'get', lambda url, *args, **kwargs: FixtureResponse(wiki_html))
+    return poewiki_scraper
+
+
+@pytest.mark.benchmark(group='wiki-images')
+def bench_get_image_names(benchmark, offline_scraper):
+    names = benchmark(offline_scraper.get_image_names, WIKI_URL)
+    assert len(names) == 302
+
+
+@pytest.mark.benchmark(group='wiki-images')
+def bench_parse_image_names(benchmark, wiki_html):
+    names = benchmark(crawler.parse_image_names, wiki_html)
+    assert len(names) == 302
+
+
+@pytest.mark.benchmark(group='wiki-subcategories')
+def bench_get_subcategories(benchmark, offline_scraper):
+    subcategories = benchmark(offline_scraper.get_subcategories, WIKI_URL)
+    assert len(subcategories) == 8
+
+
+@pytest.mark.benchmark(group='wiki-subcategories')
+def bench_parse_subcategories(benchmark, wiki_html):
+    subcategories = benchmark(crawler.parse_subcategories, wiki_html)
+    assert len(subcategories) == 8
@@ -0,0 +1,69 @@
+import importlib.util
+import logging
+import os
+import sys
+
+import pytest
+
+# The scrapers are scripts rather than packages: put their directories on
+# sys.path the way they expect to be run, and load files whose names clash
+# across modules (scraper.py, main.py) under explicit module names.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = os.path.join(ROOT, 'modules')
+NAVARROPY_DIR = os.path.join(MODULES, 'navarropy_scrapper')
+SCRAPER_IMAGES_DIR = os.path.join(MODULES, 'scraper_images')
+POEWIKI_DIR = os.path.join(MODULES, '_test_bs4_poewiki_supabase')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+for path in (NAVARROPY_DIR, SCRAPER_IMAGES_DIR, POEWIKI_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Scripts that call logging.basicConfig on import (api.py, link_collector.py.py)
+# would otherwise add log files; with a handler on the root logger it is a no-op.
+logging.getLogger().addHandler(logging.NullHandler())
+
+EXCHANGE_URL = "https://www.pathofexile.com/trade/exchange/Settlers/benchmark"
+WIKI_URL = "https://www.poewiki.net/wiki/Category:Amulet_icons"
+
+
+def load_script(module_name, path):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_fixture(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='session')
+def exchange_html():
+    return read_fixture(os.path.join(NAVARROPY_DIR, 'fixtures', 'exchange_page.html'))
+
+
+@pytest.fixture(scope='session')
+def wiki_html():
+    return read_fixture(os.path.join(FIXTURES_DIR, 'wiki_category.html'))
+
+
+@pytest.fixture(scope='session')
+def exchange_records(exchange_html):
+    import html_extract
+    return html_extract.extract_containers_html(exchange_html, EXCHANGE_URL)
+
+
+@pytest.fixture(scope='session')
+def poewiki_scraper():
+    return load_script('poewiki_scraper', os.path.join(POEWIKI_DIR, 'scraper.py'))
+
+
+@pytest.fixture(scope='session')
+def poewiki_check():
+    return load_script('poewiki_check', os.path.join(POEWIKI_DIR, 'test.py'))
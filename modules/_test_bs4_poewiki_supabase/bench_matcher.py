@@ -0,0 +1,115 @@
+import argparse
+import difflib
+import random
+import time
+
+from matcher import FuzzyMatcher, normalize
+
+# Scaling benchmark for FuzzyMatcher against the pairwise difflib loop that
+# test.py used. Generates synthetic wiki icon names (both sides the same size;
+# queries are exact, shortened, misspelt and made-up names, see make_queries)
+# and reports index build time, query time and how often the indexed best match
+# scores as well as the exhaustive one.
+#
+#   python bench_matcher.py [--sizes 1000 10000 50000] [--naive-limit 1000]
+
+SYLLABLES = ["at", "zi", "ri", "fo", "ble", "as", "tra", "men", "tis", "ara", "ku", "ti", "ash", "es", "star",
+             "bad", "ge", "bro", "ther", "hood", "up", "ris", "ing", "lab", "vol", "tax", "ic", "kaom", "shav",
+             "ron", "ne", "wrap", "mage", "blood", "head", "hun", "ter", "dor", "yani", "sol", "ar", "is", "ven",
+             "ar", "ium", "xo", "ph", "uul", "net", "ol", "esh", "chay", "ula", "maven", "sir", "us", "elder"]
+SUFFIXES = ["", "_race_season_2", "_pvp_season_2", "_race_season_4", "_alternate_art", "_relic"]
+
+
+def make_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_names(count, rng):
+    vocabulary = [make_word(rng) for _ in range(max(200, count // 5))]
+    names = set()
+    while len(names) < count:
+        words = "_".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 4)))
+        names.add(f"{words}{rng.choice(SUFFIXES)}_inventory_icon.png")
+    return sorted(names)
+
+
+def perturb(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(1, 3)):
+        pos = rng.randrange(len(chars))
+        chars[pos] = rng.choice("abcdefghijklmnopqrstuvwxyz_")
+    return "".join(chars)
+
+
+def make_queries(candidates, count, rng):
+    """
+    Queries in the shapes test.py sees: exact names (spaces instead of
+    underscores), names with a word dropped, names with typos, and two-word
+    names from the candidates' vocabulary that may not exist at all.
+    """
+    vocabulary = sorted({word for name in candidates for word in name.split('_inventory_icon')[0].split('_')
+                         if word[:1].isupper()})
+    queries = []
+    for n, name in enumerate(rng.sample(candidates, count)):
+        stem, _, suffix = name.partition('_inventory_icon')
+        words = stem.split('_')
+        kind = n % 4
+        if kind == 0:
+            queries.append(name.replace('_', ' '))
+        elif kind == 1 and len(words) > 2:
+            queries.append('_'.join(words[:1] + words[2:]) + '_inventory_icon' + suffix)
+        elif kind == 2:
+            queries.append(f"{rng.choice(vocabulary)}_{rng.choice(vocabulary)}_inventory_icon.png")
+        else:
+            queries.append(perturb(name, rng))
+    return queries
+
+
+def naive_best(query, candidates):
+    # Same argument order as test.py's original loop (scraped name first); ratio() is not symmetric
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        score = difflib.SequenceMatcher(None, normalize(candidate), normalize(query)).ratio()
+        if score > best_score:
+            best, best_score = candidate, score
+    return best, best_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks indexed fuzzy matching against pairwise difflib.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--naive-limit', type=int, default=1000,
+                        help="Largest size the O(n*m) loop is run at; larger sizes are extrapolated.")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    naive_per_pair = None
+    for size in args.sizes:
+        candidates = make_names(size, rng)
+        queries = make_queries(candidates, size, rng)
+
+        start = time.perf_counter()
+        matcher = FuzzyMatcher(candidates)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = matcher.match_all(queries)
+        query = time.perf_counter() - start
+
+        line = (f"{size:>6} x {size:<6} index build {build:6.2f}s, queries {query:7.2f}s "
+                f"({size / query:,.0f} names/s)")
+
+        if size <= args.naive_limit:
+            sample = queries[:min(200, size)]
+            start = time.perf_counter()
+            agree = sum(1 for q in sample if results[q][1] >= naive_best(q, candidates)[1])
+            naive_per_pair = (time.perf_counter() - start) / (len(sample) * size)
+            line += f", agrees with exhaustive on {agree}/{len(sample)}"
+        if naive_per_pair:
+            line += f", pairwise difflib ~{naive_per_pair * size * size:,.0f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import difflib
+from collections import Counter
+
+# Indexed fuzzy name matching.
+#
+# Comparing every scraped name with every expected name through
+# difflib.SequenceMatcher is O(n*m). FuzzyMatcher instead builds a trigram
+# inverted index over the candidate names once. A query that is a candidate
+# (after normalize()) is answered from a dict; otherwise the candidates sharing
+# trigrams with it are ranked by Dice overlap, and only the best of them (plus
+# any tied with the last one kept) are scored exactly with SequenceMatcher.
+# Past prune_above candidates, trigrams that occur in a large share of them
+# (e.g. "_inventory_icon" or ".png" fragments on wiki icons) are left out of
+# the index and only the rarest query trigrams are probed, so posting lists
+# stay short; below that every trigram counts, since at that size the shared
+# ones still separate names like "Eye_Astrolabe" and "Eye_Agate_Astrolabe".
+#
+# SequenceMatcher.ratio() is not symmetric; like test.py's original loop the
+# scraped name is the first sequence and the expected name the second.
+
+
+def normalize(name):
+    return name.lower().replace(' ', '_')
+
+
+def ngrams(text, n=3):
+    padded = f"^{text}$"
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class FuzzyMatcher:
+    """
+    Parameters:
+        candidates (iterable): Names to match against.
+        n (int): n-gram size.
+        shortlist (int): Candidates scored exactly per query; candidates tied
+            with the last one are scored too.
+        max_df (float): Drop n-grams present in more than this share of candidates...
+        prune_above (int): ...but only once there are more candidates than this.
+        probe (int): Rarest query n-grams used to generate candidates once
+            n-grams are dropped.
+    """
+
+    def __init__(self, candidates, n=3, shortlist=50, max_df=0.05, prune_above=20000, probe=12):
+        self.candidates = list(dict.fromkeys(candidates))
+        self.normalized = [normalize(c) for c in self.candidates]
+        self.exact = {}
+        for idx, name in enumerate(self.normalized):
+            self.exact.setdefault(name, idx)
+        self.n = n
+        self.shortlist = shortlist
+        self.probe = probe
+
+        postings = {}
+        self.sizes = []
+        for idx, name in enumerate(self.normalized):
+            grams = ngrams(name, n)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(idx)
+        self.pruned = len(self.candidates) > prune_above
+        limit = max(1, int(max_df * len(self.candidates))) if self.pruned else len(self.candidates)
+        self.index = {gram: ids for gram, ids in postings.items() if len(ids) <= limit}
+        self.stop_grams = {gram: ids for gram, ids in postings.items() if len(ids) > limit}
+
+    def shortlist_for(self, query):
+        """
+        Returns candidate indexes ranked by n-gram overlap with query (Dice
+        coefficient, so long candidates sharing the query's n-grams do not
+        outrank close ones); candidates tied at the cutoff are all kept.
+        """
+        grams = ngrams(normalize(query), self.n)
+        postings = [self.index[g] for g in grams if g in self.index]
+        if self.pruned:
+            # Probe the rarest n-grams first; they are the most selective.
+            postings = sorted(postings, key=len)[:self.probe]
+        counts = Counter()
+        for ids in postings:
+            counts.update(ids)
+        if not counts:
+            # Only common n-grams in the query: fall back to those.
+            for gram in grams:
+                counts.update(self.stop_grams.get(gram, ()))
+        ranked = sorted(((2 * shared / (len(grams) + self.sizes[idx]), idx) for idx, shared in counts.items()),
+                        reverse=True)
+        if len(ranked) <= self.shortlist:
+            return [idx for _, idx in ranked]
+        cutoff = ranked[self.shortlist - 1][0]
+        return [idx for score, idx in ranked if score >= cutoff]
+
+    def best_match(self, query):
+        """
+        Returns:
+            tuple: (best candidate or None, SequenceMatcher ratio)
+        """
+        exact = self.exact.get(normalize(query))
+        if exact is not None:
+            return self.candidates[exact], 1.0
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(normalize(query))
+        best, best_score = None, 0.0
+        for idx in self.shortlist_for(query):
+            matcher.set_seq1(self.normalized[idx])
+            if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best, best_score = self.candidates[idx], score
+        return best, best_score
+
+    def match_all(self, queries):
+        """
+        Returns:
+            dict: query -> (best candidate or None, score)
+        """
+        return {query: self.best_match(query) for query in queries}
@@ -1,7 +1,14 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import unquote
 
+# Shared crawler lives in modules/scraper_images
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper_images'))
+from crawler import crawl_image_names
+from http_cache import HttpCache
+
 base_url = "https://www.poewiki.net"
 category_url = f"{base_url}/wiki/Category:Amulet_icons"
 
@@ -31,11 +38,14 @@ def get_subcategories(url):
     return subcategories
 
 def main():
-    image_names = get_image_names(category_url)
-    subcategories = get_subcategories(category_url)
-
-    for subcategory in subcategories:
-        image_names.extend(get_image_names(subcategory))
+    # Crawl the category and its whole subcategory tree concurrently, reusing
+    # cached pages that are still fresh or revalidate with a 304
+    cache = HttpCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'))
+    try:
+        image_names = crawl_image_names(category_url, base_url=base_url, cache=cache)
+    finally:
+        cache.report()
+        cache.close()
 
     for image in image_names:
         print(image)
@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Bulk mirror of a local directory into Supabase storage.
+#
+# One client is shared by a bounded thread pool. A local manifest maps each
+# remote object name to the sha256 of the content last uploaded, so unchanged
+# files are skipped without any request; changed or new files are written with
+# a single upsert instead of remove + upload. Failed uploads are retried with
+# exponential backoff. The Supabase client is only created when something
+# has to be uploaded; pass `bucket` to sync() to upload through anything else
+# with the same upload(name, data, options) method.
+#
+#   python bulk_sync.py <dir> [--prefix icons/] [--workers 8] [--retries 3]
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def iter_files(source_dir, prefix=''):
+    """Yields (local path, remote object name) for every file under source_dir."""
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, source_dir).replace(os.sep, '/')
+            yield path, f"{prefix}{rel}"
+
+
+def upload_with_retry(bucket, remote_name, path, retries=3, sleep=time.sleep):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    with open(path, 'rb') as f:
+        data = f.read()
+    for attempt in range(retries + 1):
+        try:
+            return bucket.upload(remote_name, data, {"content-type": content_type, "upsert": "true"})
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2 ** attempt
+            print(f"Upload of {remote_name} failed ({e}); retrying in {delay:.1f}s")
+            sleep(delay)
+
+
+def sync(source_dir, prefix='', workers=8, retries=3, manifest_path=None, bucket_name=None, bucket=None,
+         sleep=time.sleep):
+    """
+    Uploads new or changed files under source_dir.
+
+    Parameters:
+        bucket_name (str): Supabase bucket (default: BUCKET_NAME from the environment).
+        bucket: Storage bucket to upload to instead of the Supabase one.
+        sleep (callable): Sleep used for the retry backoff.
+
+    Returns:
+        dict: uploaded, skipped and failed counts plus elapsed seconds.
+    """
+    manifest_path = manifest_path or os.path.join(source_dir, '.sync_manifest.json')
+    manifest = load_manifest(manifest_path)
+    lock = threading.Lock()
+    stats = {"uploaded": 0, "skipped": 0, "failed": 0}
+
+    pending = []
+    for path, remote_name in iter_files(source_dir, prefix):
+        digest = file_digest(path)
+        if manifest.get(remote_name) == digest:
+            stats["skipped"] += 1
+        else:
+            pending.append((path, remote_name, digest))
+
+    start = time.monotonic()
+    if pending:
+        if bucket is None:
+            from upload_to_supabase import BUCKET_NAME, get_client
+            bucket = get_client().storage.from_(bucket_name or BUCKET_NAME)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(upload_with_retry, bucket, remote_name, path, retries, sleep): (remote_name, digest)
+                       for path, remote_name, digest in pending}
+            for future in as_completed(futures):
+                remote_name, digest = futures[future]
+                try:
+                    future.result()
+                    with lock:
+                        manifest[remote_name] = digest
+                        stats["uploaded"] += 1
+                        if stats["uploaded"] % 100 == 0:
+                            save_manifest(manifest_path, manifest)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"Failed to upload {remote_name}: {e}")
+        save_manifest(manifest_path, manifest)
+
+    stats["elapsed"] = time.monotonic() - start
+    rate = stats["uploaded"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    print(f"Uploaded {stats['uploaded']}, skipped {stats['skipped']} unchanged, failed {stats['failed']} "
+          f"in {stats['elapsed']:.1f}s ({rate:.1f} files/sec)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirrors a directory into Supabase storage.")
+    parser.add_argument('source_dir')
+    parser.add_argument('--prefix', default='', help="Remote path prefix, e.g. 'icons/'.")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent uploads.")
+    parser.add_argument('--retries', type=int, default=3, help="Retries per failed upload.")
+    parser.add_argument('--manifest', default=None, help="Manifest path (default: <source_dir>/.sync_manifest.json).")
+    args = parser.parse_args()
+
+    result = sync(args.source_dir, args.prefix, args.workers, args.retries, args.manifest)
+    sys.exit(1 if result["failed"] else 0)
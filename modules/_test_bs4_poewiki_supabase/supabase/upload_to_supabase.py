@@ -19,18 +19,20 @@ def generate_image():
     img_byte_arr = img_byte_arr.getvalue()
     return img_byte_arr
 
+_client = None
+
+def get_client():
+    # Create the client once and reuse it for every upload
+    global _client
+    if _client is None:
+        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
 def upload_image_to_supabase(image_data, image_name):
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    
-    # Try deleting the existing image first
-    try:
-        delete_response = supabase.storage.from_(BUCKET_NAME).remove([image_name])
-        print(f"Deleted existing image: {delete_response}")
-    except Exception as e:
-        print(f"No existing image to delete or error deleting: {e}")
-    
-    # Upload the new image
-    response = supabase.storage.from_(BUCKET_NAME).upload(image_name, image_data, {"content-type": "image/png"})
+    supabase: Client = get_client()
+
+    # Upsert overwrites an existing image in one request (no delete first)
+    response = supabase.storage.from_(BUCKET_NAME).upload(image_name, image_data, {"content-type": "image/png", "upsert": "true"})
     return response
 
 if __name__ == "__main__":
@@ -1,7 +1,14 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import unquote
-import difflib
+
+# Shared crawler lives in modules/scraper_images
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper_images'))
+from crawler import crawl_image_names
+from http_cache import HttpCache
+from matcher import FuzzyMatcher
 
 base_url = "https://www.poewiki.net"
 category_url = f"{base_url}/wiki/Category:Amulet_icons"
@@ -45,14 +52,22 @@ def get_subcategories(url):
     return subcategories
 
 def main():
-    image_names = get_image_names(category_url)
-    subcategories = get_subcategories(category_url)
+    # Crawl the category and its whole subcategory tree concurrently, reusing
+    # cached pages that are still fresh or revalidate with a 304
+    cache = HttpCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'))
+    try:
+        image_names = crawl_image_names(category_url, base_url=base_url, cache=cache)
+    finally:
+        cache.report()
+        cache.close()
 
-    for subcategory in subcategories:
-        image_names.extend(get_image_names(subcategory))
+    # Best scraped match for every expected image, via the trigram index
+    results = FuzzyMatcher(image_names).match_all(expected_images)
+    for expected, (best, score) in results.items():
+        print(f"{score:.2f}  {expected} -> {best}")
+
+    matches = sum(1 for _, score in results.values() if score > 0.5)
 
-    matches = sum(1 for img in image_names if any(difflib.SequenceMatcher(None, img, exp).ratio() > 0.5 for exp in expected_images))
-    
     if matches >= len(expected_images) / 2:
         print("Check passed!")
         exit(0)
@@ -0,0 +1,310 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+
+import output_sink
+import price_engine
+
+# Precomputed aggregates behind the read API (api.py).
+#
+# Every finished run is folded into aggregates.db once:
+#   history       per item and run: best / weighted median / mean / worst
+#                 price, listings, sellers, stock (price_engine.aggregate)
+#   latest        the history row of each item's newest run
+#   item_sellers  per item, each seller's listings, stock and best price in
+#                 the item's newest run
+#   top_sellers   item_sellers summed per seller
+# A run only touches its own history rows and the latest/item_sellers rows of
+# the items it contains (older runs loaded late only add history); only the
+# small top_sellers table is recomputed. meta.generation is bumped in the same
+# transaction, so readers can key caches and ETags on it. The database is in
+# WAL mode, so the API keeps serving while a run is being folded in.
+#
+#   python aggregate_store.py build data_files/exchange_data_*.ndjson [--db aggregates.db]
+#   python aggregate_store.py status [--db aggregates.db]
+
+DEFAULT_DB_PATH = 'aggregates.db'
+RUN_EPOCH_RE = re.compile(r'exchange_data_(\d+)')
+HISTORY_COLUMNS = ('best', 'weighted_median', 'mean', 'worst', 'spread', 'listings', 'sellers', 'stock')
+TOP_SELLER_ORDER = {
+    'stock': 'stock DESC',
+    'listings': 'listings DESC',
+    'items': 'items DESC',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS runs (
+    run_epoch INTEGER PRIMARY KEY,
+    records INTEGER NOT NULL,
+    items INTEGER NOT NULL,
+    built_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    get_currency TEXT,
+    pay_currency TEXT
+);
+CREATE TABLE IF NOT EXISTS history (
+    item_id INTEGER NOT NULL,
+    run_epoch INTEGER NOT NULL,
+    best REAL, weighted_median REAL, mean REAL, worst REAL, spread REAL,
+    listings INTEGER, sellers INTEGER, stock INTEGER,
+    PRIMARY KEY (item_id, run_epoch)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latest (
+    item_id INTEGER PRIMARY KEY,
+    run_epoch INTEGER NOT NULL,
+    best REAL, weighted_median REAL, mean REAL, worst REAL, spread REAL,
+    listings INTEGER, sellers INTEGER, stock INTEGER
+);
+CREATE TABLE IF NOT EXISTS item_sellers (
+    item_id INTEGER NOT NULL,
+    profile TEXT NOT NULL,
+    run_epoch INTEGER NOT NULL,
+    listings INTEGER, stock INTEGER, best_price REAL, online INTEGER,
+    PRIMARY KEY (item_id, profile)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS top_sellers (
+    profile TEXT PRIMARY KEY,
+    items INTEGER, listings INTEGER, stock INTEGER, online INTEGER
+);
+'''
+
+
+def _nullable(value):
+    """NaN -> None and NumPy scalars -> Python, for sqlite and JSON."""
+    if value is None:
+        return None
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def load_run(path):
+    """Reads one exchange_data_{epoch} output (.ndjson or .json array)."""
+    if path.endswith('.ndjson'):
+        return list(output_sink.iter_ndjson(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class AggregateStore:
+    """
+    Parameters:
+        db_path (str): Path to the aggregates database.
+        readonly (bool): Open for reading only (the API's connections).
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, readonly=False):
+        self.db_path = db_path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(db_path)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            self.conn.commit()
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------ writing
+
+    def _item_ids(self, rows):
+        self.conn.executemany('INSERT INTO items (url, get_currency, pay_currency) VALUES (?, ?, ?) '
+                              'ON CONFLICT (url) DO UPDATE SET get_currency=excluded.get_currency, '
+                              'pay_currency=excluded.pay_currency', rows)
+        urls = [row[0] for row in rows]
+        ids = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            ids.update(self.conn.execute(f'SELECT url, item_id FROM items WHERE url IN ({",".join("?" * len(chunk))})',
+                                         chunk).fetchall())
+        return ids
+
+    def update(self, run_epoch, records):
+        """
+        Folds one run into the aggregates. Re-folding a run (e.g. a resumed
+        one) replaces what the earlier attempt wrote; items only the earlier
+        attempt had fall back to their previous run in latest, without sellers.
+
+        Parameters:
+            run_epoch (int): The run the records belong to.
+            records (list): link_collector records.
+
+        Returns:
+            dict: run_epoch, records, items and seconds taken.
+        """
+        start = time.perf_counter()
+        run_epoch = int(run_epoch)
+        listings = price_engine.parse_listings(records) if records else None
+        if listings is None or listings.empty:
+            per_item, per_seller = [], []
+        else:
+            stats = price_engine.aggregate(listings)
+            per_item = [(url, _nullable(row.get_currency), _nullable(row.pay_currency),
+                         [_nullable(getattr(row, c)) for c in HISTORY_COLUMNS])
+                        for url, row in zip(stats.index, stats.itertuples(index=False))]
+            priced = listings[np.isfinite(listings["price"].to_numpy())]
+            sellers = priced.groupby(["URL", "profile"], observed=True).agg(
+                listings=("price", "size"), stock=("stock", "sum"), best_price=("price", "min"),
+                online=("online", "max"))
+            per_seller = [(url, profile, int(r.listings), int(r.stock), _nullable(r.best_price), int(bool(r.online)))
+                          for (url, profile), r in zip(sellers.index, sellers.itertuples(index=False))]
+
+        with self.conn:
+            ids = self._item_ids([(url, get, pay) for url, get, pay, _ in per_item]) if per_item else {}
+            # A re-folded run replaces its earlier attempt, including items that attempt had and this one lacks
+            dropped = {row[0] for row in self.conn.execute('SELECT item_id FROM history WHERE run_epoch=?',
+                                                           (run_epoch,))} - set(ids.values())
+            self.conn.execute('DELETE FROM history WHERE run_epoch=?', (run_epoch,))
+            self.conn.execute('DELETE FROM item_sellers WHERE run_epoch=?', (run_epoch,))
+            self.conn.executemany(
+                f'INSERT INTO history (item_id, run_epoch, {", ".join(HISTORY_COLUMNS)}) '
+                f'VALUES (?, ?{", ?" * len(HISTORY_COLUMNS)})',
+                [(ids[url], run_epoch, *values) for url, _, _, values in per_item])
+            # Only items whose newest run this is get their latest / sellers rows replaced
+            self.conn.executemany(
+                f'INSERT INTO latest (item_id, run_epoch, {", ".join(HISTORY_COLUMNS)}) '
+                f'VALUES (?, ?{", ?" * len(HISTORY_COLUMNS)}) '
+                f'ON CONFLICT (item_id) DO UPDATE SET run_epoch=excluded.run_epoch, '
+                + ', '.join(f'{c}=excluded.{c}' for c in HISTORY_COLUMNS)
+                + ' WHERE excluded.run_epoch >= latest.run_epoch',
+                [(ids[url], run_epoch, *values) for url, _, _, values in per_item])
+            # Dropped items fall back to their newest remaining run; sellers are only kept for the newest
+            # run, so they have none until they are scraped again
+            self.conn.executemany('DELETE FROM latest WHERE item_id=? AND run_epoch=?',
+                                  [(i, run_epoch) for i in dropped])
+            self.conn.executemany(
+                f'INSERT OR IGNORE INTO latest (item_id, run_epoch, {", ".join(HISTORY_COLUMNS)}) '
+                f'SELECT item_id, run_epoch, {", ".join(HISTORY_COLUMNS)} FROM history '
+                f'WHERE item_id=? ORDER BY run_epoch DESC LIMIT 1',
+                [(i,) for i in dropped])
+            current = {row[0] for row in self.conn.execute('SELECT item_id FROM latest WHERE run_epoch=?', (run_epoch,))}
+            self.conn.executemany('DELETE FROM item_sellers WHERE item_id=?', [(i,) for i in current])
+            self.conn.executemany(
+                'INSERT INTO item_sellers (item_id, profile, run_epoch, listings, stock, best_price, online) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(ids[url], profile, run_epoch, *rest) for url, profile, *rest in per_seller if ids[url] in current])
+            self.conn.execute('DELETE FROM top_sellers')
+            self.conn.execute('INSERT INTO top_sellers (profile, items, listings, stock, online) '
+                              'SELECT profile, COUNT(*), SUM(listings), SUM(stock), MAX(online) '
+                              'FROM item_sellers GROUP BY profile')
+            self.conn.execute('INSERT OR REPLACE INTO runs (run_epoch, records, items, built_at) VALUES (?, ?, ?, ?)',
+                              (run_epoch, len(records), len(per_item), int(time.time())))
+            self.conn.execute("UPDATE meta SET value=value + 1 WHERE key='generation'")
+        return {"run_epoch": run_epoch, "records": len(records), "items": len(per_item),
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    def update_from_files(self, paths):
+        """
+        Folds exchange_data_{epoch} files in, oldest first, skipping runs already
+        built. A run given more than once (its .ndjson and its .json export) is
+        folded from the first of its files only.
+        """
+        built = self.built_runs()
+        runs = sorted((int(RUN_EPOCH_RE.search(os.path.basename(p)).group(1)), p) for p in paths
+                      if RUN_EPOCH_RE.search(os.path.basename(p)))
+        results = []
+        for run_epoch, path in runs:
+            if run_epoch in built:
+                continue
+            result = self.update(run_epoch, load_run(path))
+            built.add(run_epoch)
+            line = f"{path}: {result['records']} records, {result['items']} items in {result['seconds']:.2f}s"
+            logging.info(line)
+            print(line)
+            results.append(result)
+        return results
+
+    # ------------------------------------------------------------ reading
+
+    def generation(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key='generation'").fetchone()
+        return row[0] if row else 0
+
+    def built_runs(self):
+        return {row[0] for row in self.conn.execute('SELECT run_epoch FROM runs')}
+
+    def status(self):
+        runs, first, last = self.conn.execute('SELECT COUNT(*), MIN(run_epoch), MAX(run_epoch) FROM runs').fetchone()
+        return {
+            "generation": self.generation(),
+            "runs": runs,
+            "first_run": first,
+            "last_run": last,
+            "items": self.conn.execute('SELECT COUNT(*) FROM items').fetchone()[0],
+            "sellers": self.conn.execute('SELECT COUNT(*) FROM top_sellers').fetchone()[0],
+        }
+
+    def latest(self, currency=None, limit=None):
+        """Newest aggregate per item; currency filters on either side of the pair."""
+        sql = ('SELECT i.item_id, i.url, i.get_currency, i.pay_currency, l.* FROM latest l '
+               'JOIN items i USING (item_id)')
+        params = []
+        if currency:
+            sql += ' WHERE i.get_currency=? OR i.pay_currency=?'
+            params += [currency, currency]
+        sql += ' ORDER BY i.item_id'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def item(self, item_id):
+        row = self.conn.execute('SELECT i.item_id, i.url, i.get_currency, i.pay_currency, l.* FROM items i '
+                                'LEFT JOIN latest l USING (item_id) WHERE i.item_id=?', (item_id,)).fetchone()
+        return dict(row) if row else None
+
+    def history(self, item_id, start=None, end=None):
+        return [dict(row) for row in self.conn.execute(
+            f'SELECT run_epoch, {", ".join(HISTORY_COLUMNS)} FROM history '
+            'WHERE item_id=? AND run_epoch BETWEEN ? AND ? ORDER BY run_epoch',
+            (item_id, start or 0, end if end is not None else 2 ** 62))]
+
+    def item_sellers(self, item_id, limit=20):
+        return [dict(row) for row in self.conn.execute(
+            'SELECT profile, run_epoch, listings, stock, best_price, online FROM item_sellers '
+            'WHERE item_id=? ORDER BY best_price, stock DESC LIMIT ?', (item_id, limit))]
+
+    def top_sellers(self, by='stock', limit=20):
+        """Sellers across every item's newest run, ordered by stock, listings or items."""
+        return [dict(row) for row in self.conn.execute(
+            f'SELECT profile, items, listings, stock, online FROM top_sellers '
+            f'ORDER BY {TOP_SELLER_ORDER[by]}, profile LIMIT ?', (limit,))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds the aggregates the read API serves.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build', help="Fold exchange_data_{epoch} files in (runs already built are skipped).")
+    p_build.add_argument('paths', nargs='+')
+    p_build.add_argument('--db', default=DEFAULT_DB_PATH)
+    p_status = sub.add_parser('status', help="Show what the aggregates contain.")
+    p_status.add_argument('--db', default=DEFAULT_DB_PATH)
+    args = parser.parse_args(argv)
+
+    store = AggregateStore(args.db)
+    if args.command == 'build':
+        start = time.perf_counter()
+        results = store.update_from_files(args.paths)
+        print(f"Built {len(results)} new runs in {time.perf_counter() - start:.2f}s")
+    print(json.dumps(store.status(), indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
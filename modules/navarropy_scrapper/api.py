@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask, Response, abort, g, jsonify, request
+from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
+
+import aggregate_store
+
+# Read API over the aggregates built by aggregate_store.py.
+#
+#   GET /api/health                          generation, runs, items, cache stats
+#   GET /api/ratios?currency=&limit=         newest ratios of every item
+#   GET /api/items/<item_id>                 newest ratios of one item
+#   GET /api/items/<item_id>/history?start=&end=
+#   GET /api/items/<item_id>/sellers?limit=  sellers in the item's newest run
+#   GET /api/sellers/top?by=stock|listings|items&limit=
+#
+# Responses are rendered once and kept in an in-process LRU cache with a TTL,
+# keyed on the request and the aggregates' generation, so a finished run
+# invalidates everything at once without the API having to be told. Each body
+# carries a strong ETag; a client sending it back in If-None-Match gets an
+# empty 304.
+#
+#   python api.py [--db aggregates.db] [--port 5000] [--cache-size 1024] [--cache-ttl 30]
+
+MAX_LIMIT = 1000
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Parameters:
+        maxsize (int): Entries kept; 0 disables the cache.
+        ttl (float): Seconds an entry stays valid.
+        clock (callable): Monotonic time source.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.entries), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+def _int_arg(name, default=None, maximum=None):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        abort(400, description=f"'{name}' must be an integer")
+    if value < 0:
+        abort(400, description=f"'{name}' must not be negative")
+    return min(value, maximum) if maximum else value
+
+
+def create_app(db_path=aggregate_store.DEFAULT_DB_PATH, cache_size=1024, cache_ttl=30.0):
+    """
+    Builds the Flask app.
+
+    Parameters:
+        db_path (str): Aggregates database written by aggregate_store.py.
+        cache_size (int): Rendered responses kept in the LRU cache (0 disables it).
+        cache_ttl (float): Seconds a cached response stays valid.
+
+    Returns:
+        Flask: The application.
+    """
+    app = Flask(__name__)
+    app.json.sort_keys = False
+    CORS(app)
+    cache = TTLCache(cache_size, cache_ttl)
+    app.config['RESPONSE_CACHE'] = cache
+
+    def store():
+        # One read-only connection per request: the threaded server starts a thread per connection,
+        # so per-thread connections would pile up. Opening one is cheap next to the query.
+        if 'store' not in g:
+            g.store = aggregate_store.AggregateStore(db_path, readonly=True)
+        return g.store
+
+    @app.teardown_appcontext
+    def close_store(exc):
+        s = g.pop('store', None)
+        if s is not None:
+            s.close()
+
+    def cached_json(build):
+        """Serves build(store)'s result as JSON through the cache, with ETag / 304 handling."""
+        s = store()
+        key = (request.path, request.query_string, s.generation())
+        entry = cache.get(key)
+        if entry is None:
+            payload = build(s)
+            if payload is None:
+                abort(404, description="No such item")
+            body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            entry = (body, hashlib.sha1(body).hexdigest())
+            cache.put(key, entry)
+        body, etag = entry
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f"public, max-age={int(cache_ttl)}"
+        return response
+
+    @app.errorhandler(HTTPException)
+    def json_error(e):
+        response = jsonify({"error": e.name, "description": e.description})
+        response.status_code = e.code
+        return response
+
+    @app.get('/api/health')
+    def health():
+        return jsonify(dict(store().status(), cache=cache.stats()))
+
+    @app.get('/api/ratios')
+    def ratios():
+        currency = request.args.get('currency')
+        limit = _int_arg('limit')
+        return cached_json(lambda s: s.latest(currency=currency, limit=limit))
+
+    @app.get('/api/items/<int:item_id>')
+    def item(item_id):
+        return cached_json(lambda s: s.item(item_id))
+
+    @app.get('/api/items/<int:item_id>/history')
+    def history(item_id):
+        start, end = _int_arg('start'), _int_arg('end')
+        return cached_json(lambda s: s.history(item_id, start, end) if s.item(item_id) else None)
+
+    @app.get('/api/items/<int:item_id>/sellers')
+    def item_sellers(item_id):
+        limit = _int_arg('limit', 20, MAX_LIMIT)
+        return cached_json(lambda s: s.item_sellers(item_id, limit) if s.item(item_id) else None)
+
+    @app.get('/api/sellers/top')
+    def top_sellers():
+        by = request.args.get('by', 'stock')
+        if by not in aggregate_store.TOP_SELLER_ORDER:
+            abort(400, description=f"'by' must be one of {', '.join(aggregate_store.TOP_SELLER_ORDER)}")
+        limit = _int_arg('limit', 20, MAX_LIMIT)
+        return cached_json(lambda s: s.top_sellers(by, limit))
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves the scraped exchange aggregates over HTTP.")
+    parser.add_argument('--db', default=aggregate_store.DEFAULT_DB_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--cache-size', type=int, default=1024, help="Responses kept in the LRU cache (0 disables it).")
+    parser.add_argument('--cache-ttl', type=float, default=30.0, help="Seconds a cached response stays valid.")
+    parser.add_argument('--access-log', action='store_true', help="Log every request (slows the server down).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(filename='api.log', filemode='a', format='%(asctime)s - %(levelname)s - %(message)s',
+                        level=logging.INFO)
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app = create_app(args.db, args.cache_size, args.cache_ttl)
+    logging.info(f"Serving {args.db} on http://{args.host}:{args.port}")
+    print(f"Serving {args.db} on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
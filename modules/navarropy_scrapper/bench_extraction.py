@@ -0,0 +1,86 @@
+import argparse
+import os
+import pathlib
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+import dom_extract
+import html_extract
+
+# Compares the per-element and single-script container extraction paths on a
+# saved exchange page. Loads the fixture in headless Chrome, counts WebDriver
+# commands (HTTP round-trips to chromedriver) and wall time for each path, and
+# checks that both produce the same records. The offline lxml parser
+# (html_extract.py) is run on driver.page_source and must match as well.
+#
+#   python bench_extraction.py [--fixture fixtures/exchange_page.html] [--repeat 5]
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'exchange_page.html')
+
+
+def count_round_trips(driver):
+    """Wraps driver.execute so every WebDriver command is counted."""
+    counter = {"calls": 0}
+    execute = driver.execute
+
+    def counted(driver_command, params=None):
+        counter["calls"] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counted
+    return counter
+
+
+def run(driver, counter, extractor, url, repeat):
+    timings = []
+    records = None
+    counter["calls"] = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = extractor(driver, url)
+        timings.append(time.perf_counter() - start)
+    return records, counter["calls"] // repeat, min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks container extraction on a saved exchange page.")
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    driver = webdriver.Chrome(options=options)
+    try:
+        url = pathlib.Path(args.fixture).resolve().as_uri()
+        driver.get(url)
+        counter = count_round_trips(driver)
+
+        extractors = dict(dom_extract.EXTRACTORS)
+        extractors["offline"] = lambda d, u: html_extract.extract_containers_html(d.page_source, u)
+
+        results = {}
+        for name, extractor in extractors.items():
+            records, calls, best, mean = run(driver, counter, extractor, url, args.repeat)
+            results[name] = records
+            print(f"{name:>8}: {len(records)} containers, {calls} round-trips, "
+                  f"best {best * 1000:.1f} ms, mean {mean * 1000:.1f} ms")
+
+        differing = False
+        for name in ("script", "offline"):
+            if results[name] != results["elements"]:
+                mismatches = sum(1 for a, b in zip(results["elements"], results[name]) if a != b)
+                print(f"Records differ between elements and {name}: {mismatches} mismatching containers.")
+                differing = True
+        if differing:
+            raise SystemExit(1)
+        print("Records identical across extraction paths.")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import sys
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Shared Chrome factory for main.py and link_collector.py.py.
+#
+# * The chromedriver path resolved by ChromeDriverManager is cached in
+#   .chromedriver_cache.json, so normal startups do no network version check.
+#   The cache is dropped and re-resolved once if the cached binary fails to
+#   start (e.g. after a Chrome update).
+# * With block_resources, images, media and fonts are blocked through CDP
+#   Network.setBlockedURLs. The <img> elements stay in the DOM with their
+#   title attributes, which is all the scrapers read from them.
+
+DRIVER_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chromedriver_cache.json')
+
+BLOCKED_URL_PATTERNS = [
+    # Images
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    # Fonts
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # Media
+    '*.mp4', '*.webm', '*.ogg', '*.mp3', '*.wav',
+]
+
+DEFAULT_PROFILE = "Profile 1"  # Change to your dedicated profile
+
+
+def default_user_data_dir():
+    """Returns the Chrome user data directory for the current OS."""
+    if sys.platform.startswith('win'):
+        return os.path.join(os.environ['LOCALAPPDATA'], r'Google\Chrome\User Data')
+    elif sys.platform.startswith('darwin'):
+        return os.path.expanduser('~/Library/Application Support/Google/Chrome')
+    elif sys.platform.startswith('linux'):
+        return os.path.expanduser('~/.config/google-chrome')
+    raise Exception("Unsupported operating system")
+
+
+def driver_path(refresh=False):
+    """
+    Returns the chromedriver binary path, resolving it over the network only
+    when there is no usable cached path.
+    """
+    if not refresh:
+        try:
+            with open(DRIVER_CACHE, 'r', encoding='utf-8') as f:
+                path = json.load(f).get('path')
+            if path and os.path.exists(path):
+                return path
+        except (OSError, ValueError):
+            pass
+
+    path = ChromeDriverManager().install()
+    try:
+        with open(DRIVER_CACHE, 'w', encoding='utf-8') as f:
+            json.dump({"path": path, "resolved_at": int(time.time())}, f)
+    except OSError as e:
+        logging.warning(f"Could not cache chromedriver path: {e}")
+    return path
+
+
+def build_options(profile_dir=None, profile=DEFAULT_PROFILE, headless=False):
+    options = Options()
+    if profile_dir:
+        # Isolated profile, e.g. one per parallel worker
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    else:
+        options.add_argument(f"--user-data-dir={default_user_data_dir()}")
+        options.add_argument(f'--profile-directory={profile}')
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-gpu")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    else:
+        options.add_argument("--start-maximized")
+    return options
+
+
+def block_heavy_resources(driver, patterns=BLOCKED_URL_PATTERNS):
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+
+
+def create_driver(profile_dir=None, profile=DEFAULT_PROFILE, headless=False, block_resources=True):
+    """
+    Starts Chrome for the scrapers.
+
+    Parameters:
+        profile_dir (str): Isolated user data directory to use instead of the
+            shared Chrome profile (required when several browsers run at once).
+        profile (str): Profile directory inside the shared user data directory.
+        headless (bool): Run Chrome without a window.
+        block_resources (bool): Block images, media and fonts via CDP.
+
+    Returns:
+        webdriver.Chrome: The initialized driver.
+    """
+    options = build_options(profile_dir, profile, headless)
+    start = time.monotonic()
+    try:
+        driver = webdriver.Chrome(service=Service(driver_path()), options=options)
+    except Exception as e:
+        logging.warning(f"Cached chromedriver failed to start ({e}); resolving it again.")
+        driver = webdriver.Chrome(service=Service(driver_path(refresh=True)), options=options)
+    if block_resources:
+        block_heavy_resources(driver)
+    elapsed = time.monotonic() - start
+    logging.info(f"WebDriver started in {elapsed:.2f}s (headless={headless}, block_resources={block_resources}).")
+    print(f"WebDriver started in {elapsed:.2f}s (headless={headless}, block_resources={block_resources}).")
+    return driver
+
+
+def timed_get(driver, url, waits=None):
+    """Navigates to url and records the page load time under 'page-load'."""
+    start = time.monotonic()
+    driver.get(url)
+    elapsed = time.monotonic() - start
+    if waits is not None:
+        waits.record('page-load', elapsed)
+    return elapsed
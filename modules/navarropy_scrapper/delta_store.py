@@ -0,0 +1,306 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+import output_sink
+
+# Delta storage for consecutive link_collector runs.
+#
+# Most listings in a run are the same seller at the same price as in the
+# previous run. diff() matches the two runs in O(n) with dictionaries keyed on
+# (URL, Profile Link, Per-Want, Per-Have) plus an occurrence number for
+# repeated identical listings:
+#   * same key, same stock             -> unchanged (not stored)
+#   * same key, different stock        -> changed_stock
+#   * same key, other fields differ    -> changed_other (e.g. Player Status)
+#   * key gone, same (URL, Profile Link) still present with another price
+#                                      -> changed_price
+#   * otherwise                        -> added / removed
+# DeltaStore keeps a full keyframe every `keyframe_every` runs and only the
+# operations in between; reconstruct() replays a keyframe and its deltas.
+# Reconstructed runs contain the same records as the original, but not
+# necessarily in the original order.
+#
+#   python delta_store.py append data_files/exchange_data_*.ndjson [--store deltas]
+#   python delta_store.py reconstruct 1725000000 [--store deltas] [--out run.ndjson]
+#   python delta_store.py report [--store deltas]
+
+INDEX_NAME = 'index.json'
+RUN_EPOCH_RE = re.compile(r'exchange_data_(\d+)')
+PRICE_FIELDS = ("Per-Want", "Per-Have")
+
+
+def seller_key(record):
+    return record.get("URL"), record.get("Profile Link")
+
+
+def listing_key(record):
+    return seller_key(record) + tuple(record.get(field) for field in PRICE_FIELDS)
+
+
+def keyed(records):
+    """Maps (listing key, occurrence) -> record, in record order."""
+    seen = Counter()
+    out = {}
+    for record in records:
+        key = listing_key(record)
+        out[key + (seen[key],)] = record
+        seen[key] += 1
+    return out
+
+
+def diff(previous, current):
+    """
+    Classifies the listings of `current` against `previous`.
+
+    Parameters:
+        previous (list): The previous run's records.
+        current (list): This run's records.
+
+    Returns:
+        tuple: (ops, counts). ops is the list of JSON-serialisable operations
+            that turn previous into current (see apply()); counts maps each
+            class (added, removed, changed_price, changed_stock,
+            changed_other, unchanged) to its number of listings.
+    """
+    before = keyed(previous)
+    after = keyed(current)
+    counts = Counter()
+    ops = []
+
+    unmatched_before = {}
+    for key, record in before.items():
+        if key not in after:
+            unmatched_before.setdefault(seller_key(record), []).append(key)
+
+    for key, record in after.items():
+        old = before.get(key)
+        if old is None:
+            continue
+        changed = {field: value for field, value in record.items() if old.get(field) != value}
+        if not changed:
+            counts["unchanged"] += 1
+            continue
+        counts["changed_stock" if set(changed) == {"Items in Stock"} else "changed_other"] += 1
+        ops.append({"op": "change", "key": list(key), "set": changed})
+
+    for key, record in after.items():
+        if key in before:
+            continue
+        candidates = unmatched_before.get(seller_key(record))
+        if candidates:
+            # Same seller on the same item, new price: rewrite the old listing
+            old_key = candidates.pop(0)
+            old = before[old_key]
+            changed = {field: value for field, value in record.items() if old.get(field) != value}
+            counts["changed_price"] += 1
+            ops.append({"op": "change", "key": list(old_key), "set": changed})
+        else:
+            counts["added"] += 1
+            ops.append({"op": "add", "record": record})
+
+    for keys in unmatched_before.values():
+        for key in keys:
+            counts["removed"] += 1
+            ops.append({"op": "remove", "key": list(key)})
+
+    return ops, dict(counts)
+
+
+def apply(previous, ops):
+    """Replays diff() operations on the previous run's records."""
+    state = keyed(previous)
+    added = []
+    for op in ops:
+        if op["op"] == "add":
+            added.append(op["record"])
+            continue
+        key = tuple(op["key"])
+        if op["op"] == "remove":
+            del state[key]
+        else:
+            state[key] = dict(state[key], **op["set"])
+    return list(state.values()) + added
+
+
+def _write_ndjson_gz(path, rows):
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write('\n')
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _read_ndjson_gz(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _ndjson_bytes(records):
+    return sum(len(json.dumps(r, ensure_ascii=False).encode('utf-8')) + 1 for r in records)
+
+
+class DeltaStore:
+    """
+    Parameters:
+        store_dir (str): Directory holding index.json and the run files.
+        keyframe_every (int): Store a full snapshot every this many runs.
+    """
+
+    def __init__(self, store_dir='deltas', keyframe_every=24):
+        self.store_dir = store_dir
+        self.keyframe_every = keyframe_every
+        os.makedirs(store_dir, exist_ok=True)
+        self.index_path = os.path.join(store_dir, INDEX_NAME)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = []
+        # Records of the newest run, so consecutive appends do not replay
+        self._head = None
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def append(self, run_epoch, records):
+        """
+        Stores a run as a delta against the previous run, or as a keyframe.
+        Appending the newest stored run again replaces it.
+
+        Returns:
+            dict: The run's index entry (kind, class counts, bytes).
+        """
+        run_epoch = int(run_epoch)
+        replaced = None
+        if self.index and run_epoch == self.index[-1]["run_epoch"]:
+            # The newest run stored again (e.g. after --resume): replace its entry
+            replaced = self.index.pop()
+            self._head = None
+        elif self.index and run_epoch < self.index[-1]["run_epoch"]:
+            raise ValueError(f"Run {run_epoch} is older than the last stored run {self.index[-1]['run_epoch']}")
+
+        since_keyframe = 0
+        for entry in reversed(self.index):
+            if entry["kind"] == "keyframe":
+                break
+            since_keyframe += 1
+        keyframe = not self.index or since_keyframe + 1 >= self.keyframe_every
+
+        if keyframe:
+            name = f"run_{run_epoch}.keyframe.ndjson.gz"
+            rows = records
+            counts = {"records": len(records)}
+        else:
+            previous = self._head if self._head is not None else self.reconstruct(self.index[-1]["run_epoch"])
+            ops, counts = diff(previous, records)
+            name = f"run_{run_epoch}.delta.ndjson.gz"
+            rows = ops
+            # Keep the head in replay order: later deltas number repeated
+            # listings by their position in the reconstructed run
+            records = apply(previous, ops)
+
+        stored = _write_ndjson_gz(os.path.join(self.store_dir, name), rows)
+        entry = {
+            "run_epoch": run_epoch,
+            "kind": "keyframe" if keyframe else "delta",
+            "file": name,
+            "records": len(records),
+            "counts": counts,
+            "stored_bytes": stored,
+            "full_bytes": _ndjson_bytes(records),
+        }
+        self.index.append(entry)
+        self._save_index()
+        if replaced is not None and replaced["file"] != name:
+            try:
+                os.remove(os.path.join(self.store_dir, replaced["file"]))
+            except OSError:
+                pass
+        self._head = records
+        return entry
+
+    def reconstruct(self, run_epoch):
+        """Rebuilds a stored run's full snapshot from its keyframe and deltas."""
+        run_epoch = int(run_epoch)
+        position = next((i for i, e in enumerate(self.index) if e["run_epoch"] == run_epoch), None)
+        if position is None:
+            raise KeyError(f"Run {run_epoch} is not in {self.store_dir}")
+        start = position
+        while self.index[start]["kind"] != "keyframe":
+            start -= 1
+        records = _read_ndjson_gz(os.path.join(self.store_dir, self.index[start]["file"]))
+        for entry in self.index[start + 1:position + 1]:
+            records = apply(records, _read_ndjson_gz(os.path.join(self.store_dir, entry["file"])))
+        return records
+
+    def report(self):
+        """Logs per-class totals and the storage saved against full snapshots."""
+        totals = Counter()
+        for entry in self.index:
+            if entry["kind"] == "delta":
+                totals.update(entry["counts"])
+        stored = sum(e["stored_bytes"] for e in self.index)
+        full = sum(e["full_bytes"] for e in self.index)
+        keyframes = sum(1 for e in self.index if e["kind"] == "keyframe")
+        lines = [
+            f"Delta store {os.path.abspath(self.store_dir)}: {len(self.index)} runs "
+            f"({keyframes} keyframes, {len(self.index) - keyframes} deltas)",
+            "  Listings: " + ', '.join(f"{name} {totals[name]}" for name in
+                                       ("unchanged", "changed_stock", "changed_price", "changed_other",
+                                        "added", "removed")),
+            f"  Stored {stored / 1048576:.2f} MB vs {full / 1048576:.2f} MB of full NDJSON snapshots "
+            f"({(1 - stored / full) * 100 if full else 0:.1f}% saved)",
+        ]
+        for line in lines:
+            logging.info(line)
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stores exchange runs as deltas against the previous run.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_append = sub.add_parser('append', help="Append exchange_data_{epoch}.ndjson runs, oldest first.")
+    p_append.add_argument('paths', nargs='+')
+    p_append.add_argument('--store', default='deltas')
+    p_append.add_argument('--keyframe-every', type=int, default=24)
+
+    p_reconstruct = sub.add_parser('reconstruct', help="Write a stored run back out as NDJSON.")
+    p_reconstruct.add_argument('run_epoch', type=int)
+    p_reconstruct.add_argument('--store', default='deltas')
+    p_reconstruct.add_argument('--out', default=None)
+
+    p_report = sub.add_parser('report', help="Show change counts and storage saved.")
+    p_report.add_argument('--store', default='deltas')
+
+    args = parser.parse_args(argv)
+    store = DeltaStore(args.store, getattr(args, 'keyframe_every', 24))
+    if args.command == 'append':
+        runs = sorted((int(RUN_EPOCH_RE.search(os.path.basename(p)).group(1)), p) for p in args.paths)
+        for epoch, path in runs:
+            start = time.perf_counter()
+            entry = store.append(epoch, list(output_sink.iter_ndjson(path)))
+            print(f"{path}: {entry['kind']} {entry['counts']} in {time.perf_counter() - start:.2f}s")
+        store.report()
+    elif args.command == 'reconstruct':
+        out_path = args.out or f"exchange_data_{args.run_epoch}.reconstructed.ndjson"
+        with output_sink.NdjsonSink(out_path) as sink:
+            sink.write(store.reconstruct(args.run_epoch))
+        print(f"Reconstructed run {args.run_epoch} ({sink.records_written} records) to {os.path.abspath(out_path)}")
+    else:
+        store.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import logging
+import re
+
+from selenium.webdriver.common.by import By
+
+# Exchange container extraction for link_collector.py.py.
+#
+# Two interchangeable paths read the same raw fields from every
+# `row exchange` container:
+#   * extract_containers_webdriver - one WebDriver call per element (the
+#     original implementation, several hundred round-trips per page);
+#   * extract_containers_script - a single execute_script call that walks the
+#     DOM in the browser with the very same XPath expressions and returns a
+#     JSON array.
+# Both feed build_record(), so the resulting records are identical.
+#
+# The page renders an offer as "2 × Divine Orb" (with non-breaking spaces);
+# build_record() rewrites it as "2x Divine Orb", the form the Per-Want/Per-Have
+# details and the HTTP engine (exchange_api.py) use, so every engine hands the
+# sinks and stores the same strings.
+
+CONTAINER_XPATH = '//*[@class="row exchange"]'
+WHAT_GET_XPATH = './/*[@class="price-block"]'
+WHAT_PAY_XPATH = './/*[@class="price-block s"]'
+PROFILE_LINK_XPATH = './/*[@class="pull-right"]//*[@class="profile-link"]//a'
+STOCK_XPATH = './/div[@class="stock s"]/span[1]'
+STATUS_XPATH = './/*[@title="Settlers"]'
+DETAIL_SPAN_XPATH = './/div[@class="{cls}"]//span'
+DETAIL_AMOUNT_XPATH = './/span[@class="amount"]'
+DETAIL_IMG_XPATH = './/img'
+
+OFFER_RE = re.compile(r'^([0-9][0-9.,]*)\s*[×x]\s*(.+)$')
+
+EXTRACT_SCRIPT = """
+const q = arguments[0];
+const all = (xpath, ctx) => {
+    const snap = document.evaluate(xpath, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snap.snapshotLength; i++) nodes.push(snap.snapshotItem(i));
+    return nodes;
+};
+const text = (el) => (el.innerText || '').replace(/\\u00a0/g, ' ');
+const details = (c, cls) => all(q.detail_span.replace('{cls}', cls), c).map((s) => {
+    const amounts = all(q.detail_amount, s);
+    const imgs = all(q.detail_img, s);
+    return (amounts.length && imgs.length) ? [text(amounts[0]), imgs[0].title || ''] : null;
+}).filter((d) => d !== null);
+
+return all(q.container, document).map((c) => {
+    try {
+        const links = all(q.profile_link, c);
+        const stock = all(q.stock, c);
+        const status = all(q.status, c);
+        return {
+            what_get: all(q.what_get, c).map(text),
+            what_pay: all(q.what_pay, c).map(text),
+            link: links.length ? links[0].href : null,
+            stock: stock.length ? text(stock[0]) : null,
+            status: status.length ? status[0].innerHTML : null,
+            per_want: details(c, 'per-want'),
+            per_have: details(c, 'per-have'),
+        };
+    } catch (e) {
+        return {error: String(e)};
+    }
+});
+"""
+
+SCRIPT_QUERIES = {
+    "container": CONTAINER_XPATH,
+    "what_get": WHAT_GET_XPATH,
+    "what_pay": WHAT_PAY_XPATH,
+    "profile_link": PROFILE_LINK_XPATH,
+    "stock": STOCK_XPATH,
+    "status": STATUS_XPATH,
+    "detail_span": DETAIL_SPAN_XPATH,
+    "detail_amount": DETAIL_AMOUNT_XPATH,
+    "detail_img": DETAIL_IMG_XPATH,
+}
+
+
+def normalize_offer(text):
+    """'2 ×  Divine Orb' -> '2x Divine Orb'; text that is not an offer is returned stripped."""
+    text = ' '.join(text.split())
+    match = OFFER_RE.match(text)
+    return f"{match.group(1)}x {match.group(2)}" if match else text
+
+
+def build_record(url, raw):
+    """
+    Turns the raw fields read from one container into a link_collector record.
+
+    Parameters:
+        url (str): The source URL.
+        raw (dict): what_get/what_pay (lists of str), link, stock, status
+            (str or None) and per_want/per_have (lists of [amount, title]).
+
+    Returns:
+        dict: The record in the exchange_data JSON shape.
+    """
+    what_get = ' | '.join(normalize_offer(t) for t in raw["what_get"] if t.strip())
+    what_pay = ' | '.join(normalize_offer(t) for t in raw["what_pay"] if t.strip())
+    link = raw["link"] if raw["link"] is not None else "N/A"
+
+    stock_text = raw["stock"].strip() if raw["stock"] is not None else "0"
+    try:
+        stock = int(''.join(filter(str.isdigit, stock_text))) if stock_text else 0
+    except ValueError:
+        stock = 0
+        logging.warning(f"Invalid stock number '{stock_text}' for URL {url}")
+
+    status = raw["status"] is not None and raw["status"].lower() == 'online'
+
+    def join_details(pairs):
+        details = [f"{amount.strip()}x {title.strip()}" for amount, title in pairs]
+        return ' ⇒ '.join(details) if details else "N/A"
+
+    return {
+        "URL": url,  # Reference to the source URL
+        "What You Get": what_get,
+        "What You Pay": what_pay,
+        "Profile Link": link,
+        "Items in Stock": stock,
+        "Player Status": status,
+        "Per-Want": join_details(raw["per_want"]) or "N/A",
+        "Per-Have": join_details(raw["per_have"]) or "N/A"
+    }
+
+
+def _read_container(c):
+    what_get = [e.text for e in c.find_elements(By.XPATH, WHAT_GET_XPATH)]
+    what_pay = [e.text for e in c.find_elements(By.XPATH, WHAT_PAY_XPATH)]
+
+    link_elements = c.find_elements(By.XPATH, PROFILE_LINK_XPATH)
+    link = link_elements[0].get_attribute('href') if link_elements else None
+
+    stock_elements = c.find_elements(By.XPATH, STOCK_XPATH)
+    stock = stock_elements[0].text if stock_elements else None
+
+    status_elements = c.find_elements(By.XPATH, STATUS_XPATH)
+    status = status_elements[0].get_attribute('innerHTML') if status_elements else None
+
+    def details(cls):
+        pairs = []
+        for s in c.find_elements(By.XPATH, DETAIL_SPAN_XPATH.format(cls=cls)):
+            amount_elements = s.find_elements(By.XPATH, DETAIL_AMOUNT_XPATH)
+            img_elements = s.find_elements(By.XPATH, DETAIL_IMG_XPATH)
+            if amount_elements and img_elements:
+                pairs.append([amount_elements[0].text, img_elements[0].get_attribute('title')])
+        return pairs
+
+    return {
+        "what_get": what_get,
+        "what_pay": what_pay,
+        "link": link,
+        "stock": stock,
+        "status": status,
+        "per_want": details('per-want'),
+        "per_have": details('per-have'),
+    }
+
+
+def extract_containers_webdriver(driver, url):
+    """
+    Extracts every exchange container with per-element WebDriver calls.
+
+    Parameters:
+        driver (webdriver.Chrome): A driver with the exchange page loaded.
+        url (str): The source URL the records are attributed to.
+
+    Returns:
+        list: A list of dictionaries, one per exchange container.
+    """
+    data = []
+    for i, c in enumerate(driver.find_elements(By.XPATH, CONTAINER_XPATH), 1):
+        try:
+            data.append(build_record(url, _read_container(c)))
+        except Exception as e:
+            logging.error(f"  Failed to extract container {i} for URL {url}: {e}")
+            print(f"  Failed to extract container {i} for URL {url}: {e}")
+    return data
+
+
+def extract_containers_script(driver, url):
+    """
+    Extracts every exchange container with one execute_script round-trip.
+
+    Parameters:
+        driver (webdriver.Chrome): A driver with the exchange page loaded.
+        url (str): The source URL the records are attributed to.
+
+    Returns:
+        list: A list of dictionaries, one per exchange container.
+    """
+    data = []
+    for i, raw in enumerate(driver.execute_script(EXTRACT_SCRIPT, SCRIPT_QUERIES) or [], 1):
+        try:
+            if "error" in raw:
+                raise Exception(raw["error"])
+            data.append(build_record(url, raw))
+        except Exception as e:
+            logging.error(f"  Failed to extract container {i} for URL {url}: {e}")
+            print(f"  Failed to extract container {i} for URL {url}: {e}")
+    return data
+
+
+EXTRACTORS = {
+    "elements": extract_containers_webdriver,
+    "script": extract_containers_script,
+}
@@ -0,0 +1,204 @@
+import logging
+from urllib.parse import urlparse, quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limiter
+
+# Browserless client for the trade site's bulk exchange endpoints.
+#
+# A saved exchange URL such as
+#   https://www.pathofexile.com/trade/exchange/Settlers/9z28fK
+# is resolved to its stored query through the JSON API, the query is re-run
+# against the exchange search endpoint and every returned offer is turned into
+# the same record shape the browser path in link_collector.py.py produces.
+
+DEFAULT_BASE_URL = "https://www.pathofexile.com"
+USER_AGENT = "poe.coffee-backend/1.0 (+https://github.com/benjamin-mcdaniel/poe.coffee.backend)"
+PROFILE_URL = "https://www.pathofexile.com/account/view-profile/{account}"
+
+
+def parse_exchange_url(url):
+    """
+    Splits a saved exchange URL into its league and query id.
+
+    Parameters:
+        url (str): A URL of the form .../trade/exchange/<league>/<query id>.
+
+    Returns:
+        tuple: (league, query_id)
+    """
+    parts = [p for p in urlparse(url).path.split('/') if p]
+    try:
+        idx = parts.index('exchange')
+        return parts[idx + 1], parts[idx + 2]
+    except (ValueError, IndexError):
+        raise ValueError(f"Not a trade exchange URL: {url}")
+
+
+def format_amount(value):
+    """Formats a ratio the way the exchange page displays it (6 decimals at most, no trailing zeros)."""
+    value = round(float(value), 6)
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+class ExchangeClient:
+    """
+    Pooled HTTP client for the exchange search/fetch API.
+
+    Parameters:
+        base_url (str): Site root; point it at a local stub server for testing.
+        pool_size (int): Number of keep-alive connections kept per host.
+        timeout (float): Per-request timeout in seconds.
+        poesessid (str): Optional POESESSID cookie for logged-in searches.
+        limiter (RateLimiter): Shared rate limiter every request goes through.
+        max_throttle_retries (int): Retries for a request answered with 429.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, pool_size=4, timeout=15, poesessid=None,
+                 limiter=None, max_throttle_retries=3):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.limiter = limiter or rate_limiter.RateLimiter()
+        self.max_throttle_retries = max_throttle_retries
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "application/json",
+        })
+        if poesessid:
+            self.session.cookies.set("POESESSID", poesessid)
+
+        # 429s are left to the rate limiter; urllib3 would otherwise retry them
+        # itself whenever Retry-After is set and the limiter would never know.
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET", "POST"]), respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._currency_names = None
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method, path, on_wait=None, **kwargs):
+        url = f"{self.base_url}{path}"
+        for _ in range(self.max_throttle_retries + 1):
+            waited = self.limiter.acquire(url)
+            if on_wait is not None:
+                on_wait(waited)
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            if not self.limiter.observe(url, response.status_code, response.headers):
+                break
+        response.raise_for_status()
+        return response.json()
+
+    def _get(self, path, on_wait=None):
+        return self._request("GET", path, on_wait)
+
+    def _post(self, path, payload, on_wait=None):
+        return self._request("POST", path, on_wait, json=payload)
+
+    def currency_names(self, on_wait=None):
+        """
+        Maps exchange currency ids (e.g. "chaos") to their display names
+        (e.g. "Chaos Orb"), which is what the browser path reads from img titles.
+        The static data is fetched once per client.
+        """
+        if self._currency_names is None:
+            names = {}
+            for group in self._get("/api/trade/data/static", on_wait).get("result", []):
+                for entry in group.get("entries", []):
+                    if entry.get("id"):
+                        names[entry["id"]] = entry.get("text") or entry["id"]
+            self._currency_names = names
+        return self._currency_names
+
+    def fetch_query(self, league, query_id, on_wait=None):
+        """Fetches the stored query behind a saved exchange search."""
+        return self._get(f"/api/trade/exchange/{quote(league)}/{quote(query_id)}", on_wait)
+
+    def search(self, league, query, on_wait=None):
+        """Runs an exchange query and returns the raw listing results."""
+        payload = {
+            "query": query.get("query", query),
+            "sort": query.get("sort", {"have": "asc"}),
+            "engine": "new",
+        }
+        return self._post(f"/api/trade/exchange/{quote(league)}", payload, on_wait)
+
+    def fetch_listings(self, url, on_wait=None):
+        """
+        Resolves a saved exchange URL and returns its listings as records.
+
+        Parameters:
+            url (str): The saved exchange URL stored in urls.db.
+            on_wait (callable): Called with the seconds waited on the rate
+                limiter before each API request.
+
+        Returns:
+            list: A list of dictionaries in the link_collector record shape.
+        """
+        league, query_id = parse_exchange_url(url)
+        query = self.fetch_query(league, query_id, on_wait)
+        result = self.search(league, query, on_wait).get("result") or {}
+        # The endpoint returns either a list or an id -> listing mapping.
+        results = result.values() if isinstance(result, dict) else result
+        return listings_to_records(url, results, self.currency_names(on_wait))
+
+
+def _offer_side(side, names):
+    name = names.get(side.get("currency"), side.get("currency", ""))
+    return side.get("amount", 0), name
+
+
+def listings_to_records(url, results, names):
+    """
+    Converts exchange API results into link_collector records.
+
+    Parameters:
+        url (str): The source URL the records are attributed to.
+        results (iterable): Result objects from the exchange endpoint.
+        names (dict): Currency id to display name mapping.
+
+    Returns:
+        list: A list of dictionaries in the link_collector record shape.
+    """
+    records = []
+    for entry in results:
+        listing = (entry or {}).get("listing") or {}
+        account = listing.get("account") or {}
+        online = account.get("online")
+        status = bool(online) and (not isinstance(online, dict) or online.get("status") != "afk")
+        link = PROFILE_URL.format(account=quote(account["name"])) if account.get("name") else "N/A"
+
+        for offer in listing.get("offers") or []:
+            try:
+                get_amount, get_name = _offer_side(offer["item"], names)
+                pay_amount, pay_name = _offer_side(offer["exchange"], names)
+                stock = int(offer["item"].get("stock") or 0)
+
+                if get_amount and pay_amount:
+                    per_want = f"1x {get_name} ⇒ {format_amount(pay_amount / get_amount)}x {pay_name}"
+                    per_have = f"1x {pay_name} ⇒ {format_amount(get_amount / pay_amount)}x {get_name}"
+                else:
+                    per_want = per_have = "N/A"
+
+                records.append({
+                    "URL": url,
+                    "What You Get": f"{format_amount(get_amount)}x {get_name}",
+                    "What You Pay": f"{format_amount(pay_amount)}x {pay_name}",
+                    "Profile Link": link,
+                    "Items in Stock": stock,
+                    "Player Status": status,
+                    "Per-Want": per_want,
+                    "Per-Have": per_have
+                })
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping malformed offer for URL {url}: {e}")
+    return records
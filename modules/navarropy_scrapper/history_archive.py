@@ -0,0 +1,339 @@
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import price_engine
+
+# Columnar archive of link_collector runs.
+#
+# Each run becomes one directory of .npy column files, partitioned by the
+# run's UTC date:
+#
+#   archive/date=2024-08-30/run_1725000000/
+#       meta.json                 row count, column list, source file
+#       <column>.npy              one NumPy array per column
+#       <column>.dict.json        sorted distinct values of a string column;
+#                                 <column>.npy then holds int32 codes into it
+#       url_offsets.npy           rows are sorted by URL; rows of URL code c
+#                                 are [url_offsets[c], url_offsets[c + 1])
+#
+# String columns are dictionary encoded, so every record can be rebuilt
+# exactly (read_run); the numeric price_engine columns are stored next to
+# them. Reads open the arrays with mmap_mode='r' and push predicates down:
+# partitions outside the date range are skipped by directory name, runs that
+# never saw the URL are skipped after reading only its dictionary, and the
+# remaining runs read just the requested columns' slice for that URL.
+#
+#   python history_archive.py convert data_files/exchange_data_*.json --archive archive
+#   python history_archive.py history <URL> --days 90 [--columns price stock]
+#   python history_archive.py compare data_files/exchange_data_*.json --archive archive
+
+RECORD_COLUMNS = {
+    "URL": "url",
+    "What You Get": "what_get",
+    "What You Pay": "what_pay",
+    "Profile Link": "profile",
+    "Items in Stock": "stock",
+    "Player Status": "online",
+    "Per-Want": "per_want",
+    "Per-Have": "per_have",
+}
+STRING_COLUMNS = ("url", "what_get", "what_pay", "profile", "per_want", "per_have",
+                  "get_currency", "pay_currency")
+NUMERIC_COLUMNS = {
+    "stock": np.int64,
+    "online": np.bool_,
+    "offers": np.int32,
+    "get_amount": np.float64,
+    "pay_amount": np.float64,
+    "price": np.float64,
+    "inverse": np.float64,
+}
+
+
+def partition_name(run_epoch):
+    day = datetime.datetime.fromtimestamp(run_epoch, tz=datetime.timezone.utc).date()
+    return f"date={day.isoformat()}"
+
+
+def run_dir(archive_dir, run_epoch):
+    return os.path.join(archive_dir, partition_name(run_epoch), f"run_{run_epoch}")
+
+
+def _encode(values):
+    """Returns (sorted distinct strings, int32 codes); missing values become ''."""
+    values = pd.Series(values, dtype=object).fillna('').astype(str).to_numpy(dtype=object)
+    uniques, codes = np.unique(values, return_inverse=True)
+    return [str(u) for u in uniques], codes.astype(np.int32)
+
+
+def write_run(archive_dir, run_epoch, records, source=None):
+    """
+    Archives one run's records.
+
+    Parameters:
+        archive_dir (str): Archive root.
+        run_epoch (int): The run's epoch; decides the date partition.
+        records (DataFrame or list): link_collector records.
+        source (str): Original file, recorded in meta.json.
+
+    Returns:
+        str: The run directory written.
+    """
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    df = df.reset_index(drop=True)
+    parsed = price_engine.parse_listings(df)
+
+    # Sort rows by URL so one item's rows form a contiguous slice of every column
+    url_dict, url_codes = _encode(df["URL"])
+    order = np.argsort(url_codes, kind='stable')
+    counts = np.bincount(url_codes, minlength=len(url_dict))
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    target = run_dir(archive_dir, run_epoch)
+    tmp_target = f"{target}.tmp"
+    shutil.rmtree(tmp_target, ignore_errors=True)
+    os.makedirs(tmp_target)
+
+    def save_strings(name, values):
+        dictionary, codes = _encode(values)
+        np.save(os.path.join(tmp_target, f"{name}.npy"), codes[order])
+        with open(os.path.join(tmp_target, f"{name}.dict.json"), 'w', encoding='utf-8') as f:
+            json.dump(dictionary, f, ensure_ascii=False)
+
+    for field, name in RECORD_COLUMNS.items():
+        if name in STRING_COLUMNS:
+            save_strings(name, df[field] if field in df else [''] * len(df))
+    save_strings("get_currency", parsed["get_currency"].astype(object))
+    save_strings("pay_currency", parsed["pay_currency"].astype(object))
+    for name, dtype in NUMERIC_COLUMNS.items():
+        np.save(os.path.join(tmp_target, f"{name}.npy"), parsed[name].to_numpy(dtype=dtype)[order])
+    np.save(os.path.join(tmp_target, "url_offsets.npy"), offsets)
+
+    meta = {
+        "run_epoch": int(run_epoch),
+        "rows": int(len(df)),
+        "string_columns": list(STRING_COLUMNS),
+        "numeric_columns": list(NUMERIC_COLUMNS),
+        "source": os.path.basename(source) if source else None,
+    }
+    with open(os.path.join(tmp_target, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_target, target)
+    return target
+
+
+class ArchivedRun:
+    """Lazy, memory-mapped view of one archived run."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.run_epoch = self.meta["run_epoch"]
+        self._dicts = {}
+
+    def dictionary(self, name):
+        if name not in self._dicts:
+            with open(os.path.join(self.path, f"{name}.dict.json"), 'r', encoding='utf-8') as f:
+                self._dicts[name] = json.load(f)
+        return self._dicts[name]
+
+    def column(self, name):
+        """Memory-mapped column array (codes for string columns)."""
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+
+    def url_slice(self, url):
+        """Row range of url in this run, or None if the run never listed it."""
+        urls = self.dictionary("url")
+        code = int(np.searchsorted(urls, url))
+        if code >= len(urls) or urls[code] != url:
+            return None
+        offsets = self.column("url_offsets")
+        return slice(int(offsets[code]), int(offsets[code + 1]))
+
+    def read(self, columns, rows=slice(None)):
+        """Reads columns for a row range; string columns are decoded."""
+        out = {}
+        for name in columns:
+            values = np.asarray(self.column(name)[rows])
+            if name in self.meta["string_columns"]:
+                values = np.asarray(self.dictionary(name), dtype=object)[values] if len(values) else values.astype(object)
+            out[name] = values
+        return out
+
+
+def iter_runs(archive_dir, start_epoch=None, end_epoch=None):
+    """Yields ArchivedRun objects in run order, pruning partitions outside [start, end]."""
+    first = partition_name(start_epoch) if start_epoch is not None else None
+    last = partition_name(end_epoch) if end_epoch is not None else None
+    for partition in sorted(glob.glob(os.path.join(archive_dir, "date=*"))):
+        name = os.path.basename(partition)
+        if (first and name < first) or (last and name > last):
+            continue
+        paths = [p for p in glob.glob(os.path.join(partition, "run_*")) if not p.endswith('.tmp')]
+        for path in sorted(paths, key=lambda p: int(p.rsplit('_', 1)[1])):
+            run = ArchivedRun(path)
+            if (start_epoch is None or run.run_epoch >= start_epoch) and (end_epoch is None or run.run_epoch <= end_epoch):
+                yield run
+
+
+def history(archive_dir, url, columns=("price", "stock", "online"), start_epoch=None, end_epoch=None):
+    """
+    One item's listings across archived runs.
+
+    Returns:
+        DataFrame: run_epoch plus the requested columns, one row per listing.
+    """
+    frames = []
+    for run in iter_runs(archive_dir, start_epoch, end_epoch):
+        rows = run.url_slice(url)
+        if rows is None or rows.start == rows.stop:
+            continue
+        data = run.read(columns, rows)
+        data["run_epoch"] = np.full(rows.stop - rows.start, run.run_epoch, dtype=np.int64)
+        frames.append(pd.DataFrame(data))
+    if not frames:
+        return pd.DataFrame(columns=["run_epoch", *columns])
+    return pd.concat(frames, ignore_index=True)[["run_epoch", *columns]]
+
+
+def read_run(path):
+    """Rebuilds a run's records (in URL order) from the archive."""
+    run = ArchivedRun(path)
+    data = run.read(list(RECORD_COLUMNS.values()))
+    records = []
+    for i in range(run.meta["rows"]):
+        record = {}
+        for field, name in RECORD_COLUMNS.items():
+            value = data[name][i]
+            if name == "stock":
+                value = int(value)
+            elif name == "online":
+                value = bool(value)
+            record[field] = value
+        records.append(record)
+    return records
+
+
+def _load_json_records(path):
+    if path.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def convert(paths, archive_dir, verify=False):
+    """
+    Archives exchange_data_{epoch}.json / .ndjson files.
+
+    Returns:
+        list: (source path, run directory) pairs.
+    """
+    converted = []
+    for path in paths:
+        match = price_engine.RUN_EPOCH_RE.search(os.path.basename(path))
+        if match is None:
+            logging.warning(f"Skipping {path}: no run epoch in the file name.")
+            print(f"Skipping {path}: no run epoch in the file name.")
+            continue
+        records = _load_json_records(path)
+        if not records:
+            continue
+        target = write_run(archive_dir, int(match.group(1)), records, source=path)
+        if verify:
+            key = lambda r: (r["URL"],)
+            if sorted(read_run(target), key=key) != sorted(records, key=key):
+                raise ValueError(f"Archived run {target} does not round-trip {path}")
+        converted.append((path, target))
+        logging.info(f"Archived {len(records)} records from {path} to {target}")
+        print(f"Archived {len(records)} records from {path} to {target}")
+    return converted
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def compare(paths, archive_dir, url=None, repeat=3):
+    """Prints size and load time of the JSON files against the archive."""
+    json_bytes = sum(os.path.getsize(p) for p in paths)
+    archive_bytes = dir_size(archive_dir)
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def json_history():
+        for path in paths:
+            [r for r in _load_json_records(path) if r["URL"] == url]
+
+    if url is None:
+        first = next(iter_runs(archive_dir), None)
+        url = first.dictionary("url")[0] if first else ''
+
+    json_time = best_of(json_history)
+    price_time = best_of(lambda: history(archive_dir, url, columns=("price",)))
+    full_time = best_of(lambda: [run.read(["price", "stock"]) for run in iter_runs(archive_dir)])
+
+    lines = [
+        f"JSON files:      {len(paths)} files, {json_bytes / 1048576:8.2f} MB",
+        f"Archive:         {archive_bytes / 1048576:8.2f} MB ({json_bytes / archive_bytes if archive_bytes else 0:.1f}x smaller)",
+        f"Item history via json.load:    {json_time * 1000:9.1f} ms",
+        f"Item history via archive:      {price_time * 1000:9.1f} ms (price column, one URL slice per run)",
+        f"All prices+stock via archive:  {full_time * 1000:9.1f} ms",
+    ]
+    for line in lines:
+        logging.info(line)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar archive of exchange runs.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_convert = sub.add_parser('convert', help="Archive exchange_data_{epoch}.json / .ndjson files.")
+    p_convert.add_argument('paths', nargs='+')
+    p_convert.add_argument('--archive', default='archive')
+    p_convert.add_argument('--verify', action='store_true', help="Check every run round-trips to the same records.")
+
+    p_history = sub.add_parser('history', help="Print one item's listings across runs.")
+    p_history.add_argument('url')
+    p_history.add_argument('--archive', default='archive')
+    p_history.add_argument('--days', type=int, default=90)
+    p_history.add_argument('--columns', nargs='+', default=['price', 'stock', 'online'])
+
+    p_compare = sub.add_parser('compare', help="Compare size and load time against the JSON files.")
+    p_compare.add_argument('paths', nargs='+')
+    p_compare.add_argument('--archive', default='archive')
+    p_compare.add_argument('--url', default=None, help="Item to time history reads for (default: first archived).")
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        convert(sorted({p for pattern in args.paths for p in glob.glob(pattern)}), args.archive, args.verify)
+    elif args.command == 'history':
+        start = int(time.time()) - args.days * 86400
+        frame = history(args.archive, args.url, tuple(args.columns), start_epoch=start)
+        with pd.option_context('display.max_rows', 100):
+            print(frame)
+    else:
+        compare(sorted({p for pattern in args.paths for p in glob.glob(pattern)}), args.archive, args.url)
+
+
+if __name__ == "__main__":
+    main()
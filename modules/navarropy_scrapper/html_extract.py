@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import logging
+import argparse
+from urllib.parse import urljoin
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree, html as lxml_html
+
+import dom_extract
+import output_sink
+import snapshots
+
+# Offline container extraction from saved exchange HTML.
+#
+# Evaluates the same XPath expressions as dom_extract.py with lxml and feeds
+# the raw fields through dom_extract.build_record(), so records match the live
+# WebDriver/script paths. Element text follows innerText for the inline
+# markup the exchange uses: runs of ASCII whitespace collapse to one space,
+# the result is trimmed, and non-breaking spaces become plain spaces
+# afterwards (as Selenium's .text and the extraction script do).
+#
+# Re-parse a snapshot run (see snapshots.py) on every core:
+#
+#   python html_extract.py snapshots/1725000000 [--out reparsed.ndjson] [--processes N]
+
+_CONTAINER = etree.XPath(dom_extract.CONTAINER_XPATH)
+_WHAT_GET = etree.XPath(dom_extract.WHAT_GET_XPATH)
+_WHAT_PAY = etree.XPath(dom_extract.WHAT_PAY_XPATH)
+_PROFILE_LINK = etree.XPath(dom_extract.PROFILE_LINK_XPATH)
+_STOCK = etree.XPath(dom_extract.STOCK_XPATH)
+_STATUS = etree.XPath(dom_extract.STATUS_XPATH)
+_DETAIL_SPANS = {cls: etree.XPath(dom_extract.DETAIL_SPAN_XPATH.format(cls=cls)) for cls in ('per-want', 'per-have')}
+_DETAIL_AMOUNT = etree.XPath(dom_extract.DETAIL_AMOUNT_XPATH)
+_DETAIL_IMG = etree.XPath(dom_extract.DETAIL_IMG_XPATH)
+
+_COLLAPSIBLE = re.compile(r'[ \t\n\r\f]+')
+
+
+def visible_text(el):
+    return _COLLAPSIBLE.sub(' ', el.text_content()).strip(' ').replace('\xa0', ' ')
+
+
+def inner_html(el):
+    parts = [el.text or '']
+    parts.extend(etree.tostring(child, encoding='unicode', method='html') for child in el)
+    return ''.join(parts)
+
+
+def _read_container(c, url):
+    links = _PROFILE_LINK(c)
+    stock = _STOCK(c)
+    status = _STATUS(c)
+
+    def details(cls):
+        pairs = []
+        for s in _DETAIL_SPANS[cls](c):
+            amounts = _DETAIL_AMOUNT(s)
+            imgs = _DETAIL_IMG(s)
+            if amounts and imgs:
+                pairs.append([visible_text(amounts[0]), imgs[0].get('title', '')])
+        return pairs
+
+    return {
+        "what_get": [visible_text(e) for e in _WHAT_GET(c)],
+        "what_pay": [visible_text(e) for e in _WHAT_PAY(c)],
+        "link": urljoin(url, links[0].get('href', '')) if links else None,
+        "stock": visible_text(stock[0]) if stock else None,
+        "status": inner_html(status[0]) if status else None,
+        "per_want": details('per-want'),
+        "per_have": details('per-have'),
+    }
+
+
+def extract_containers_html(page_html, url):
+    """
+    Extracts every exchange container from saved page HTML.
+
+    Parameters:
+        page_html (str): The page source, e.g. driver.page_source or a snapshot.
+        url (str): The source URL the records are attributed to.
+
+    Returns:
+        list: A list of dictionaries, one per exchange container.
+    """
+    doc = lxml_html.document_fromstring(page_html)
+    data = []
+    for i, c in enumerate(_CONTAINER(doc), 1):
+        try:
+            data.append(dom_extract.build_record(url, _read_container(c, url)))
+        except Exception as e:
+            logging.error(f"  Failed to extract container {i} for URL {url}: {e}")
+    return data
+
+
+def parse_snapshot(entry):
+    """Worker entry point: (url, snapshot path) -> (url, records)."""
+    url, path = entry
+    return url, extract_containers_html(snapshots.read_snapshot(path), url)
+
+
+def reparse_run(run_dir, out_path, processes=None, chunksize=8):
+    """
+    Re-extracts every snapshot in a run directory into an NDJSON file.
+
+    Returns:
+        tuple: (pages parsed, records written)
+    """
+    entries = list(snapshots.iter_snapshots(run_dir))
+    start = time.perf_counter()
+    pages = 0
+    with output_sink.NdjsonSink(out_path) as sink:
+        if processes == 1:
+            results = map(parse_snapshot, entries)
+            for url, records in results:
+                sink.write(records)
+                pages += 1
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                for url, records in pool.map(parse_snapshot, entries, chunksize=chunksize):
+                    sink.write(records)
+                    pages += 1
+        written = sink.records_written
+    elapsed = time.perf_counter() - start
+    rate = pages / elapsed if elapsed else 0.0
+    logging.info(f"Re-parsed {pages} pages ({written} records) in {elapsed:.1f}s ({rate:.1f} pages/sec)")
+    print(f"Re-parsed {pages} pages ({written} records) in {elapsed:.1f}s ({rate:.1f} pages/sec) -> {out_path}")
+    return pages, written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-extracts listings from saved exchange page snapshots.")
+    parser.add_argument('run_dir', help="A snapshot run directory, e.g. snapshots/1725000000.")
+    parser.add_argument('--out', default=None,
+                        help="NDJSON output (default: data_files/exchange_data_{run}_reparsed.ndjson).")
+    parser.add_argument('--processes', type=int, default=None, help="Parser processes (default: CPU count).")
+    args = parser.parse_args(argv)
+
+    run = os.path.basename(os.path.normpath(args.run_dir))
+    out_path = args.out or output_sink.ndjson_path(f"{run}_reparsed")
+    reparse_run(args.run_dir, out_path, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import os
 import sys
+import argparse
 import time
-import json
 import sqlite3
 import logging
 
+import aggregate_store
+import browser
+import delta_store
+import dom_extract
+import exchange_api
+import listing_store
+import metrics
+import output_sink
+import rate_limiter
+import readiness
+import run_progress
+import scheduler
+import snapshots
+import worker_pool
+
 # ------------------- Logging Configuration -------------------
 logging.basicConfig(
     filename='trade_scraper.log',
@@ -21,6 +32,10 @@ logging.basicConfig(
 )
 # --------------------------------------------------------------
 
+# The fixed time.sleep(2) every URL used to get before its containers were read;
+# the rate limiter and readiness waits report what they saved against it.
+FIXED_DELAY = 2
+
 def get_trade_links(db_path='urls.db'):
     """
     Fetches trade URLs from the SQLite database.
@@ -46,264 +61,358 @@ def get_trade_links(db_path='urls.db'):
         print(f"Database error: {e}")
         return []
 
-def save_all_data_to_json(all_data, run_epoch, json_dir='data_files'):
+def create_driver(profile_dir=None, headless=False, block_resources=True):
     """
-    Saves all extracted data to a single JSON file named with the run's epoch time.
+    Starts the Chrome session used by the browser engine.
 
     Parameters:
-        all_data (list): A list of dictionaries containing all extracted data.
-        run_epoch (int): The epoch Unix time when the script started.
-        json_dir (str): Directory where the JSON file will be saved.
-    """
-    try:
-        # Get the directory where the script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_dir = os.path.join(script_dir, json_dir)
-
-        # Ensure the directory exists
-        os.makedirs(json_dir, exist_ok=True)
-
-        # Generate filename using run epoch time
-        filename = f"exchange_data_{run_epoch}.json"
-        filepath = os.path.join(json_dir, filename)
-
-        # Print absolute path for debugging
-        absolute_filepath = os.path.abspath(filepath)
-        print(f"Saving JSON to: {absolute_filepath}")
-        logging.info(f"Saving JSON to: {absolute_filepath}")
-
-        # Write all data to the JSON file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, ensure_ascii=False, indent=4)
-
-        # Confirm file was created
-        if os.path.exists(filepath):
-            logging.info(f"All data successfully saved to '{absolute_filepath}'.")
-            print(f"All data successfully saved to '{absolute_filepath}'.")
-        else:
-            logging.error(f"JSON file '{absolute_filepath}' was not created.")
-            print(f"JSON file '{absolute_filepath}' was not created.")
-    except Exception as e:
-        logging.error(f"Failed to write all data to JSON file: {e}")
-        print(f"Failed to write all data to JSON file: {e}")
+        profile_dir (str): Isolated user data directory to use instead of the
+            shared Chrome profile (required when several browsers run at once).
+        headless (bool): Run Chrome without a window.
+        block_resources (bool): Block images, media and fonts while browsing.
 
-def test_file_writing(json_dir='data_files'):
-    """
-    Tests whether the script can write to the specified JSON directory.
-
-    Parameters:
-        json_dir (str): Directory where the test JSON file will be saved.
+    Returns:
+        webdriver.Chrome: The initialized driver, or None if it failed to start.
     """
     try:
-        # Get the directory where the script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_dir = os.path.join(script_dir, json_dir)
-        os.makedirs(json_dir, exist_ok=True)
-        
-        test_filename = "test_write.json"
-        test_filepath = os.path.join(json_dir, test_filename)
-        absolute_test_filepath = os.path.abspath(test_filepath)
-        
-        test_data = {"test": "This is a test."}
-        
-        with open(test_filepath, 'w', encoding='utf-8') as f:
-            json.dump(test_data, f, ensure_ascii=False, indent=4)
-        
-        if os.path.exists(test_filepath):
-            print(f"Test JSON file successfully created at '{absolute_test_filepath}'.")
-            logging.info(f"Test JSON file successfully created at '{absolute_test_filepath}'.")
-            # Optionally, remove the test file after confirmation
-            os.remove(test_filepath)
-            print("Test JSON file removed after confirmation.")
-            logging.info("Test JSON file removed after confirmation.")
-        else:
-            print(f"Failed to create test JSON file at '{absolute_test_filepath}'.")
-            logging.error(f"Failed to create test JSON file at '{absolute_test_filepath}'.")
-    except Exception as e:
-        print(f"An error occurred during the test file writing: {e}")
-        logging.error(f"An error occurred during the test file writing: {e}")
-
-def main():
-    # Optional: Uncomment the line below to perform a test file write before starting
-    # test_file_writing()
-
-    # Capture the script's start time in epoch Unix time (seconds)
-    run_epoch = int(time.time())
-    logging.info(f"Script started at epoch time: {run_epoch}")
-    print(f"Script started at epoch time: {run_epoch}")
-
-    # Determine Chrome user data directory based on OS
-    if sys.platform.startswith('win'):
-        user_data_dir = os.path.join(os.environ['LOCALAPPDATA'], r'Google\Chrome\User Data')
-    elif sys.platform.startswith('darwin'):
-        user_data_dir = os.path.expanduser('~/Library/Application Support/Google/Chrome')
-    elif sys.platform.startswith('linux'):
-        user_data_dir = os.path.expanduser('~/.config/google-chrome')
-    else:
-        logging.error("Unsupported operating system")
-        print("Unsupported operating system")
-        raise Exception("Unsupported operating system")
-
-    profile = "Profile 1"  # Change to your dedicated profile
-
-    # Fetch URLs from the database
-    urls = get_trade_links()
-    if not urls:
-        logging.info("No URLs found in the database. Exiting.")
-        print("No URLs found in the database. Exiting.")
-        return
-
-    # Configure Chrome options
-    options = Options()
-    options.add_argument(f"--user-data-dir={user_data_dir}")
-    options.add_argument(f'--profile-directory={profile}')
-    options.add_argument("--disable-extensions")
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-gpu")
-    # options.add_argument("--headless")  # Uncomment for headless mode
-
-    # Initialize WebDriver
-    try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        driver = browser.create_driver(profile_dir=profile_dir, headless=headless, block_resources=block_resources)
         logging.info("WebDriver initialized successfully.")
         print("WebDriver initialized successfully.")
+        return driver
     except Exception as e:
         logging.error(f"Failed to initialize WebDriver: {e}")
         print(f"Failed to initialize WebDriver: {e}")
-        return
+        return None
+
+def scrape_url_browser(driver, url, extraction='elements', limiter=None, waits=None, snapshot_store=None,
+                       run_metrics=None):
+    """
+    Loads an exchange URL in the browser and extracts every listing container.
+
+    Parameters:
+        driver (webdriver.Chrome): An initialized WebDriver.
+        url (str): The exchange URL to scrape.
+        extraction (str): 'elements' for per-element WebDriver calls, 'script'
+            to read every container with a single injected script.
+        limiter (RateLimiter): Shared rate limiter consulted before navigating.
+        waits (WaitTimings): Recorder for the measured readiness waits.
+        snapshot_store (SnapshotStore): Where to save the rendered page source
+            for offline re-parsing, if set.
+        run_metrics (RunMetrics): Span recorder for the run's phase timings.
+
+    Returns:
+        list: A list of dictionaries, one per exchange container.
+    """
+    run_metrics = run_metrics or metrics.RunMetrics('link_collector', 0)
+    run_metrics.start_url(url)
+
+    if limiter is not None:
+        with run_metrics.span('rate-limit-sleep', url):
+            limiter.acquire(url)
+
+    with run_metrics.span('navigate', url):
+        browser.timed_get(driver, url, waits)
+    logging.debug(f"Navigated to URL: {url}")
+
+    with run_metrics.span('wait-for-ready', url):
+        # Wait until the search button is clickable
+        WebDriverWait(driver, 60).until(
+            EC.element_to_be_clickable((By.XPATH, '//button[@class="btn search-btn"]'))
+        )
+        # Wait for the exchange containers to load
+        WebDriverWait(driver, 30).until(
+            EC.presence_of_all_elements_located((By.XPATH, dom_extract.CONTAINER_XPATH))
+        )
+        # Wait until the container list stops changing
+        readiness.wait_for_stable_count(driver, dom_extract.CONTAINER_XPATH, 'containers-stable', waits)
+    logging.debug("Exchange containers are present and stable.")
+
+    # Extract exchange containers
+    with run_metrics.span('extract', url):
+        data = dom_extract.EXTRACTORS[extraction](driver, url)
+    if snapshot_store is not None:
+        with run_metrics.span('snapshot', url):
+            snapshot_store.save(url, driver.page_source)
+    if not data:
+        logging.warning(f"No exchange containers found for URL {url}")
+        return []
+
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for i, data_entry in enumerate(data, 1):
+            logging.debug(f"  Container {i}: {data_entry}")
+
+    return data
 
-    all_data = []  # To accumulate data from all URLs
+def scrape_url_http(client, url, run_metrics=None):
+    """
+    Fetches an exchange URL's listings through the JSON API, without a browser.
+
+    Parameters:
+        client (ExchangeClient): A pooled exchange API client.
+        url (str): The exchange URL to scrape.
+        run_metrics (RunMetrics): Span recorder for the run's phase timings.
 
+    Returns:
+        list: A list of dictionaries, one per exchange offer.
+    """
+    run_metrics = run_metrics or metrics.RunMetrics('link_collector', 0)
+    run_metrics.start_url(url)
+    # The client waits on the rate limiter before each API request; those waits
+    # go in their own phase so 'navigate' only times the requests themselves.
+    waits = []
+    start = run_metrics.clock()
     try:
-        for idx, url in enumerate(urls, 1):
-            print(f"\nProcessing URL {idx}/{len(urls)}: {url}")
-            logging.info(f"Processing URL {idx}/{len(urls)}: {url}")
+        data = client.fetch_listings(url, on_wait=waits.append)
+    except Exception:
+        run_metrics.inc('errors', phase='navigate')
+        raise
+    finally:
+        waited = sum(waits)
+        run_metrics.observe('rate-limit-sleep', waited, url)
+        run_metrics.observe('navigate', run_metrics.clock() - start - waited, url)
+    logging.debug(f"Fetched {len(data)} listings via the exchange API: {url}")
+    return data
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Collects trade exchange listings for every URL in urls.db.")
+    parser.add_argument('--engine', choices=('browser', 'http'), default='browser',
+                        help="'browser' drives Chrome through Selenium; 'http' calls the exchange JSON API directly.")
+    parser.add_argument('--api-base-url', default=exchange_api.DEFAULT_BASE_URL,
+                        help="Site root for the http engine (e.g. a local stub server).")
+    parser.add_argument('--extraction', choices=sorted(dom_extract.EXTRACTORS), default='elements',
+                        help="Browser engine container extraction: per-element WebDriver calls or one injected script.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of concurrent headless browsers for the browser engine.")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run Chrome headless (always on when --workers > 1).")
+    parser.add_argument('--load-resources', action='store_true',
+                        help="Load images, media and fonts instead of blocking them (for before/after timing).")
+    parser.add_argument('--listing-db', metavar='PATH', nargs='?', const=listing_store.DEFAULT_DB_PATH,
+                        help="Also write listings to the normalized SQLite store (default path: listings.db).")
+    parser.add_argument('--snapshot-dir', metavar='PATH', nargs='?', const='snapshots',
+                        help="Browser engine: save each page's HTML, gzipped, for offline re-parsing with html_extract.py.")
+    parser.add_argument('--delta-dir', metavar='PATH', nargs='?', const='deltas',
+                        help="After the run, store it as a delta against the previous run (default path: deltas).")
+    parser.add_argument('--aggregates', metavar='PATH', nargs='?', const=aggregate_store.DEFAULT_DB_PATH,
+                        help="After the run, fold it into the aggregates api.py serves (default path: aggregates.db).")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Where to write the run's phase timings and counters: JSON, or a Prometheus "
+                             "textfile if PATH ends in .prom (default: data_files/metrics_{epoch}.json).")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep running: revisit each URL on a schedule derived from its price/stock volatility "
+                             "and listing count (state persists in urls.db; stop with Ctrl+C).")
+    parser.add_argument('--budget', type=float, default=scheduler.DEFAULT_BUDGET,
+                        help="Daemon mode: global request budget in requests per second.")
+    parser.add_argument('--resume', metavar='RUN_EPOCH', type=int,
+                        help="Continue an interrupted run: only its unfinished and retryable failed URLs are scraped, "
+                             "appending to the same output.")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="Attempts per URL; failed URLs are retried at the end of the pass until they reach it.")
+    parser.add_argument('--export-json', action='store_true',
+                        help="After the run, also export the NDJSON output as an indented exchange_data_{epoch}.json array.")
+    args = parser.parse_args(argv)
+    if args.daemon and args.resume:
+        parser.error("--resume continues a one-shot run; the daemon resumes from its schedule on its own.")
+    if args.daemon and (args.delta_dir or args.aggregates):
+        # Both fold one pass per run epoch; a daemon session revisits URLs many times under one epoch
+        parser.error("--delta-dir and --aggregates store whole runs and cannot be used with --daemon.")
+    if args.daemon and args.workers > 1:
+        parser.error("--workers cannot be used with --daemon; the daemon visits one URL at a time.")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    progress = None
+    if args.resume:
+        run_epoch = args.resume
+        progress = run_progress.RunProgress(run_epoch)
+        urls = progress.urls()
+        if not urls:
+            logging.info(f"No progress recorded for run {run_epoch}. Exiting.")
+            print(f"No progress recorded for run {run_epoch}. Exiting.")
+            return
+        requeued = progress.resume(args.max_attempts)
+        logging.info(f"Resuming run {run_epoch}: {requeued} URLs to scrape.")
+        print(f"Resuming run {run_epoch}: {requeued} URLs to scrape.")
+    else:
+        # Capture the script's start time in epoch Unix time (seconds)
+        run_epoch = int(time.time())
+        logging.info(f"Script started at epoch time: {run_epoch}")
+        print(f"Script started at epoch time: {run_epoch}")
+
+        # Fetch URLs from the database
+        urls = get_trade_links()
+        if not urls:
+            logging.info("No URLs found in the database. Exiting.")
+            print("No URLs found in the database. Exiting.")
+            return
+        if not args.daemon:
+            progress = run_progress.RunProgress(run_epoch)
+            progress.add(urls)
+    already_done = progress.counts()['done'] if progress is not None else 0
+
+    limiter = rate_limiter.RateLimiter()
+    waits = readiness.WaitTimings()
+    run_metrics = metrics.RunMetrics('link_collector', run_epoch)
+    driver = None
+    client = None
+    use_pool = args.engine == 'browser' and args.workers > 1
+    snapshot_store = None
+    if args.snapshot_dir and args.engine == 'browser':
+        snapshot_store = snapshots.SnapshotStore(args.snapshot_dir, run_epoch)
+    if args.engine == 'http':
+        client = exchange_api.ExchangeClient(base_url=args.api_base_url, poesessid=os.environ.get('POESESSID'),
+                                             limiter=limiter)
+        scrape_url = lambda url: scrape_url_http(client, url, run_metrics)
+    elif not use_pool:
+        driver = create_driver(headless=args.headless, block_resources=not args.load_resources)
+        if driver is None:
+            return
+        scrape_url = lambda url: scrape_url_browser(driver, url, args.extraction, limiter, waits, snapshot_store,
+                                                    run_metrics)
+
+    # Stream each URL's records to disk as soon as they are extracted
+    ndjson_path = output_sink.ndjson_path(run_epoch, json_dir='data_files')
+    if args.resume and os.path.exists(ndjson_path):
+        # Drop anything written after the last URL marked done; those URLs are scraped again
+        offset = progress.sink_offset()
+        if os.path.getsize(ndjson_path) > offset:
+            logging.info(f"Dropping {os.path.getsize(ndjson_path) - offset} bytes after the last completed URL.")
+            print(f"Dropping {os.path.getsize(ndjson_path) - offset} bytes after the last completed URL.")
+            os.truncate(ndjson_path, offset)
+    sink = output_sink.NdjsonSink(ndjson_path)
+    logging.info(f"Streaming records to: {os.path.abspath(sink.path)}")
+    print(f"Streaming records to: {os.path.abspath(sink.path)}")
+
+    store = None
+    if args.listing_db:
+        store = listing_store.ListingStore(args.listing_db)
+        store_run_id = store.start_run(run_epoch)
+
+    def write_result(url, data):
+        """Persists one URL's records; returns the output size after them, for the run's progress."""
+        if data:
+            # A failed write leaves neither the output nor the store holding part of the URL
+            with run_metrics.span('persist', url), sink.atomic():
+                sink.write(data)
+                if store is not None:
+                    # The run epoch keeps retries and later imports of the run on the same rows;
+                    # the daemon revisits URLs within one run, so each visit keeps its own time
+                    store.write_listings(store_run_id, int(time.time()) if args.daemon else run_epoch, url, data)
+        run_metrics.inc('urls_scraped')
+        run_metrics.inc('containers_extracted', len(data))
+        # One line per URL; the per-step detail is in the spans and at DEBUG
+        breakdown = metrics.format_breakdown(run_metrics.finish_url(url))
+        count = run_metrics.counter('urls_scraped') + already_done
+        line = f"[{count}{'' if args.daemon else f'/{len(urls)}'}] {len(data)} containers from {url} ({breakdown})"
+        logging.info(line)
+        print(line)
+        return sink.size()
+
+    def scrape_pending():
+        while True:
+            url = progress.claim()
+            if url is None:
+                return
             try:
-                driver.get(url)
-                logging.info(f"Navigated to URL: {url}")
-                print(f"Navigated to URL: {url}")
-
-                # Wait until the search button is clickable
-                WebDriverWait(driver, 60).until(
-                    EC.element_to_be_clickable((By.XPATH, '//button[@class="btn search-btn"]'))
-                )
-                logging.info("Search button is clickable.")
-                print("Search button is clickable.")
-
-                # Wait for the exchange containers to load
-                WebDriverWait(driver, 30).until(
-                    EC.presence_of_all_elements_located((By.XPATH, '//*[@class="row exchange"]'))
-                )
-                logging.info("Exchange containers are present.")
-                print("Exchange containers are present.")
-
-                time.sleep(2)  # Additional wait if necessary
-
-                # Extract exchange containers
-                containers = driver.find_elements(By.XPATH, '//*[@class="row exchange"]')
-                if not containers:
-                    logging.warning(f"No exchange containers found for URL {url}")
-                    print(f"No exchange containers found for URL {url}")
-                    continue  # Skip to the next URL
-
-                data = []
-                for i, c in enumerate(containers, 1):
-                    try:
-                        # Extract "What You Get" details
-                        what_get_elements = c.find_elements(By.XPATH, './/*[@class="price-block"]')
-                        what_get = ' | '.join(e.text.strip() for e in what_get_elements if e.text.strip())
-
-                        # Extract "What You Pay" details
-                        what_pay_elements = c.find_elements(By.XPATH, './/*[@class="price-block s"]')
-                        what_pay = ' | '.join(e.text.strip() for e in what_pay_elements if e.text.strip())
-
-                        # Extract Profile Link
-                        link_elements = c.find_elements(By.XPATH, './/*[@class="pull-right"]//*[@class="profile-link"]//a')
-                        link = link_elements[0].get_attribute('href') if link_elements else "N/A"
-
-                        # Extract Items in Stock
-                        stock_elements = c.find_elements(By.XPATH, './/div[@class="stock s"]/span[1]')
-                        stock_text = stock_elements[0].text.strip() if stock_elements else "0"
-                        try:
-                            stock = int(''.join(filter(str.isdigit, stock_text))) if stock_text else 0
-                        except ValueError:
-                            stock = 0
-                            logging.warning(f"Invalid stock number '{stock_text}' for URL {url}")
-
-                        # Extract Player Status
-                        status_elements = c.find_elements(By.XPATH, './/*[@title="Settlers"]')
-                        status = False
-                        if status_elements:
-                            status_text = status_elements[0].get_attribute('innerHTML').lower()
-                            status = status_text == 'online'
-
-                        # Function to extract per-want and per-have details
-                        def extract_details(cls):
-                            elements = c.find_elements(By.XPATH, f'.//div[@class="{cls}"]//span')
-                            details = []
-                            for s in elements:
-                                amount_elements = s.find_elements(By.XPATH, './/span[@class="amount"]')
-                                img_elements = s.find_elements(By.XPATH, './/img')
-                                if amount_elements and img_elements:
-                                    amount = amount_elements[0].text.strip()
-                                    title = img_elements[0].get_attribute('title').strip()
-                                    details.append(f"{amount}x {title}")
-                            return ' ⇒ '.join(details) if details else "N/A"
-
-                        per_want = extract_details('per-want') or "N/A"
-                        per_have = extract_details('per-have') or "N/A"
-
-                        # Append extracted data
-                        data_entry = {
-                            "URL": url,  # Reference to the source URL
-                            "What You Get": what_get,
-                            "What You Pay": what_pay,
-                            "Profile Link": link,
-                            "Items in Stock": stock,
-                            "Player Status": status,
-                            "Per-Want": per_want,
-                            "Per-Have": per_have
-                        }
-                        data.append(data_entry)
-                        logging.info(f"  Container {i}: {data_entry}")
-                        print(f"  Container {i}: {data_entry}")
-                    except Exception as e:
-                        logging.error(f"  Failed to extract container {i} for URL {url}: {e}")
-                        print(f"  Failed to extract container {i} for URL {url}: {e}")
-
-                if data:
-                    print(f"  Total containers extracted from URL {idx}: {len(data)}")
-                    logging.info(f"  Total containers extracted from URL {idx}: {len(data)}")
-                    # Accumulate data
-                    all_data.extend(data)
-                    # Save data after each URL
-                    save_all_data_to_json(all_data, run_epoch, json_dir='data_files')
-                else:
-                    logging.info(f"No data extracted from URL {url}.")
-                    print(f"No data extracted from URL {url}.")
-
+                data = scrape_url(url)
+                progress.done(url, len(data), write_result(url, data))
             except Exception as e:
+                run_metrics.inc('urls_failed')
+                progress.failed(url, e)
                 logging.error(f"Failed to process URL {url}: {e}")
                 print(f"Failed to process URL {url}: {e}")
 
+    metrics_path = args.metrics or os.path.join(os.path.dirname(sink.path), f"metrics_{run_epoch}.json")
+    try:
+        if args.daemon:
+            schedule = scheduler.Scheduler(budget=args.budget)
+            schedule.sync(urls)
+
+            def on_visit(url):
+                # Keep the freshness gauges and the metrics file current while running
+                if (schedule.visits + schedule.failures) % 20 == 0:
+                    schedule.publish(run_metrics)
+                    run_metrics.write(metrics_path)
+
+            try:
+                scheduler.run_daemon(schedule, scrape_url, write_result, on_visit=on_visit)
+            finally:
+                schedule.publish(run_metrics)
+                schedule.report()
+                schedule.close()
+        else:
+            while True:
+                if use_pool:
+                    worker_pool.run_pool(
+                        run_epoch,
+                        make_driver=lambda profile_dir: create_driver(profile_dir=profile_dir, headless=True,
+                                                                      block_resources=not args.load_resources),
+                        scrape_url=lambda driver, url: scrape_url_browser(driver, url, args.extraction, limiter,
+                                                                          waits, snapshot_store, run_metrics),
+                        write_result=write_result,
+                        workers=args.workers,
+                    )
+                else:
+                    scrape_pending()
+                # Failed URLs get another pass until they run out of attempts
+                retried = progress.retry_failed(args.max_attempts)
+                if not retried:
+                    break
+                logging.info(f"Retrying {retried} failed URLs (up to {args.max_attempts} attempts each).")
+                print(f"Retrying {retried} failed URLs (up to {args.max_attempts} attempts each).")
+
     except Exception as e:
         logging.error(f"An unexpected error occurred during data extraction: {e}")
         print(f"An unexpected error occurred during data extraction: {e}")
 
     finally:
-        try:
-            driver.quit()
-            logging.info("Browser closed.")
-            print("Browser closed.")
-        except Exception as e:
-            logging.error(f"Failed to close WebDriver: {e}")
-            print(f"Failed to close WebDriver: {e}")
-
-        # Final save to ensure all data is written
-        if all_data:
-            print(f"\nTotal data entries extracted: {len(all_data)}")
-            logging.info(f"Total data entries extracted: {len(all_data)}")
-            save_all_data_to_json(all_data, run_epoch, json_dir='data_files')
+        if driver is not None:
+            try:
+                driver.quit()
+                logging.info("Browser closed.")
+                print("Browser closed.")
+            except Exception as e:
+                logging.error(f"Failed to close WebDriver: {e}")
+                print(f"Failed to close WebDriver: {e}")
+        if client is not None:
+            client.close()
+        if progress is not None:
+            progress.report()
+            progress.close()
+
+        limiter.report(fixed_sleep_per_request=FIXED_DELAY)
+        waits.report(fixed_sleeps={'containers-stable': FIXED_DELAY})
+        run_metrics.inc('retries', limiter.throttles)
+        run_metrics.report()
+        run_metrics.write(metrics_path)
+        logging.info(f"Run metrics written to: {os.path.abspath(metrics_path)}")
+        print(f"Run metrics written to: {os.path.abspath(metrics_path)}")
+        sink.close()
+        if store is not None:
+            store.finish_run(store_run_id)
+            store.close()
+        if snapshot_store is not None:
+            logging.info(snapshot_store.report())
+            print(snapshot_store.report())
+        if sink.records_written:
+            print(f"\nTotal data entries extracted: {sink.records_written}")
+            logging.info(f"Total data entries extracted: {sink.records_written}")
+            if args.export_json:
+                output_sink.export_json_array(sink.path)
+            if args.delta_dir:
+                deltas = delta_store.DeltaStore(args.delta_dir)
+                entry = deltas.append(run_epoch, list(output_sink.iter_ndjson(sink.path)))
+                logging.info(f"Stored run as {entry['kind']}: {entry['counts']}")
+                print(f"Stored run as {entry['kind']}: {entry['counts']}")
+                deltas.report()
+            if args.aggregates:
+                aggregates = aggregate_store.AggregateStore(args.aggregates)
+                result = aggregates.update(run_epoch, list(output_sink.iter_ndjson(sink.path)))
+                aggregates.close()
+                logging.info(f"Aggregates updated: {result['items']} items in {result['seconds']:.2f}s")
+                print(f"Aggregates updated: {result['items']} items in {result['seconds']:.2f}s")
         else:
             logging.info("No data extracted from any URL.")
             print("No data extracted from any URL.")
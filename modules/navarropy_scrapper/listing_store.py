@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import output_sink
+
+# Persistent, normalized store for exchange listings across runs.
+#
+# Lives next to urls.db as listings.db:
+#   runs     - one row per link_collector run (run_epoch)
+#   items    - one row per exchange URL
+#   sellers  - one row per Profile Link
+#   listings - one row per container, keyed to run/item/seller
+# The database runs in WAL mode and every URL's listings are written with
+# executemany inside a single transaction that first deletes whatever the run
+# already holds for that URL at the same run_time, so a retried or resumed URL
+# is stored once. run_time is the run's epoch for a whole run, which is also
+# what an import of its output gets, and the visit time for the collector's
+# --daemon mode, where one run revisits each URL. Existing exchange_data_*.json
+# or .ndjson files can be imported with (re-importing replaces the run):
+#
+#   python listing_store.py import data_files/exchange_data_*.json
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_epoch INTEGER NOT NULL UNIQUE,
+    started_at INTEGER NOT NULL,
+    finished_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sellers (
+    seller_id INTEGER PRIMARY KEY,
+    profile_link TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    item_id INTEGER NOT NULL REFERENCES items(item_id),
+    seller_id INTEGER NOT NULL REFERENCES sellers(seller_id),
+    run_time INTEGER NOT NULL,
+    what_get TEXT,
+    what_pay TEXT,
+    stock INTEGER,
+    online INTEGER,
+    per_want TEXT,
+    per_have TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_listings_item_run_time ON listings(item_id, run_time);
+DROP INDEX IF EXISTS idx_listings_run;
+CREATE INDEX IF NOT EXISTS idx_listings_run_item ON listings(run_id, item_id);
+CREATE INDEX IF NOT EXISTS idx_listings_seller ON listings(seller_id);
+'''
+
+DEFAULT_DB_PATH = 'listings.db'
+
+
+class ListingStore:
+    """
+    Writes and queries normalized exchange listings.
+
+    Parameters:
+        db_path (str): Path to the SQLite database file.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._item_ids = {}
+        self._seller_ids = {}
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, run_epoch):
+        """Registers a run and returns its run_id (idempotent per run_epoch)."""
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO runs (run_epoch, started_at) VALUES (?, ?)',
+                              (run_epoch, int(time.time())))
+        return self.conn.execute('SELECT run_id FROM runs WHERE run_epoch=?', (run_epoch,)).fetchone()[0]
+
+    def clear_run(self, run_id):
+        """Deletes every listing of a run."""
+        with self.conn:
+            return self.conn.execute('DELETE FROM listings WHERE run_id=?', (run_id,)).rowcount
+
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute('UPDATE runs SET finished_at=? WHERE run_id=?', (int(time.time()), run_id))
+
+    def _item_id(self, url):
+        if url not in self._item_ids:
+            self.conn.execute('INSERT OR IGNORE INTO items (url) VALUES (?)', (url,))
+            self._item_ids[url] = self.conn.execute('SELECT item_id FROM items WHERE url=?', (url,)).fetchone()[0]
+        return self._item_ids[url]
+
+    def _seller_ids_for(self, links):
+        missing = [link for link in set(links) if link not in self._seller_ids]
+        if missing:
+            self.conn.executemany('INSERT OR IGNORE INTO sellers (profile_link) VALUES (?)', [(l,) for l in missing])
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                rows = self.conn.execute(
+                    f'SELECT profile_link, seller_id FROM sellers WHERE profile_link IN ({",".join("?" * len(chunk))})',
+                    chunk).fetchall()
+                self._seller_ids.update(rows)
+        return self._seller_ids
+
+    def write_listings(self, run_id, run_time, url, records):
+        """
+        Writes one URL's listings in a single transaction, replacing any the
+        run already holds for that URL and run_time.
+
+        Parameters:
+            run_id (int): The run returned by start_run().
+            run_time (int): Epoch time the listings belong to: the run epoch,
+                or the visit time when a run visits a URL more than once.
+            url (str): The exchange URL the records came from.
+            records (list): Records in the link_collector shape.
+        """
+        with self.conn:
+            item_id = self._item_id(url)
+            self.conn.execute('DELETE FROM listings WHERE run_id=? AND item_id=? AND run_time=?',
+                              (run_id, item_id, run_time))
+            if not records:
+                return
+            seller_ids = self._seller_ids_for([r.get("Profile Link") or "N/A" for r in records])
+            self.conn.executemany(
+                '''INSERT INTO listings (run_id, item_id, seller_id, run_time, what_get, what_pay,
+                                         stock, online, per_want, per_have)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(run_id, item_id, seller_ids[r.get("Profile Link") or "N/A"], run_time,
+                  r.get("What You Get"), r.get("What You Pay"), r.get("Items in Stock"),
+                  int(bool(r.get("Player Status"))), r.get("Per-Want"), r.get("Per-Have"))
+                 for r in records])
+
+    def latest_snapshots(self, url, n=5):
+        """
+        Returns the listings of the latest n runs that recorded an item.
+
+        Returns:
+            list: Records in the link_collector shape plus "Run Time", newest first.
+        """
+        row = self.conn.execute('SELECT item_id FROM items WHERE url=?', (url,)).fetchone()
+        if row is None:
+            return []
+        rows = self.conn.execute(
+            '''SELECT l.run_time, l.what_get, l.what_pay, s.profile_link, l.stock, l.online, l.per_want, l.per_have
+               FROM listings l JOIN sellers s ON s.seller_id = l.seller_id
+               WHERE l.item_id = ? AND l.run_time IN (
+                   SELECT DISTINCT run_time FROM listings WHERE item_id = ? ORDER BY run_time DESC LIMIT ?)
+               ORDER BY l.run_time DESC, l.listing_id''',
+            (row[0], row[0], n)).fetchall()
+        return [{
+            "Run Time": run_time,
+            "URL": url,
+            "What You Get": what_get,
+            "What You Pay": what_pay,
+            "Profile Link": link,
+            "Items in Stock": stock,
+            "Player Status": bool(online),
+            "Per-Want": per_want,
+            "Per-Have": per_have
+        } for run_time, what_get, what_pay, link, stock, online, per_want, per_have in rows]
+
+
+def import_file(store, path):
+    """Imports an exchange_data_{epoch}.json or .ndjson file as one run, replacing the run's listings."""
+    match = re.search(r'exchange_data_(\d+)\.(nd)?json$', os.path.basename(path))
+    if not match:
+        raise ValueError(f"Cannot determine run epoch from file name: {path}")
+    run_epoch = int(match.group(1))
+
+    if match.group(2):
+        # a run that was killed mid-write leaves a torn last line; iter_ndjson skips it
+        records = list(output_sink.iter_ndjson(path))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+    by_url = {}
+    for record in records:
+        by_url.setdefault(record.get("URL"), []).append(record)
+
+    run_id = store.start_run(run_epoch)
+    replaced = store.clear_run(run_id)
+    if replaced:
+        logging.info(f"Replacing {replaced} listings already stored for run {run_epoch}.")
+        print(f"Replacing {replaced} listings already stored for run {run_epoch}.")
+    for url, url_records in by_url.items():
+        if url:
+            store.write_listings(run_id, run_epoch, url, url_records)
+    store.finish_run(run_id)
+    logging.info(f"Imported {len(records)} listings from '{path}'.")
+    print(f"Imported {len(records)} listings from '{path}'.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != 'import':
+        print("Usage: python listing_store.py import <exchange_data_*.json|.ndjson> ...")
+        sys.exit(1)
+    store = ListingStore()
+    try:
+        for file_path in sys.argv[2:]:
+            import_file(store, file_path)
+    finally:
+        store.close()
@@ -0,0 +1,209 @@
+import argparse
+import glob
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import aggregate_store
+
+# Local load test for api.py.
+#
+# Starts the API as a separate process (so the clients do not share its GIL),
+# then runs N client threads, each on its own keep-alive connection, issuing a
+# weighted mix of the API's endpoints for a fixed duration. Reports p50 / p99
+# latency and throughput per endpoint and overall. With --etag each client
+# sends back the ETag it last saw for a path, like a browser or CDN would.
+#
+#   python load_test.py --db aggregates.db [--clients 16] [--duration 10] [--cache-size 0] [--etag]
+#   python load_test.py --data 'data_files/exchange_data_*.ndjson'    # builds a temporary aggregates.db first
+#   python load_test.py --url http://127.0.0.1:5000                    # against a server that is already running
+
+# (name, weight, path template); {item} is a random item id
+MIX = (
+    ('item', 35, '/api/items/{item}'),
+    ('history', 25, '/api/items/{item}/history'),
+    ('item-sellers', 15, '/api/items/{item}/sellers?limit=10'),
+    ('ratios', 10, '/api/ratios'),
+    ('top-sellers', 15, '/api/sellers/top?by={by}&limit=20'),
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, cache_size, cache_ttl):
+    """Runs api.py in a subprocess and waits until it answers /api/health."""
+    port = free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api.py')
+    process = subprocess.Popen([sys.executable, script, '--db', db_path, '--port', str(port),
+                                '--cache-size', str(cache_size), '--cache-ttl', str(cache_ttl)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("api.py did not start within 15 seconds")
+
+
+def _client(host, port, item_ids, stop_at, use_etag, seed, results):
+    rng = random.Random(seed)
+    names = [name for name, _, _ in MIX]
+    weights = [weight for _, weight, _ in MIX]
+    templates = {name: template for name, _, template in MIX}
+    etags = {}
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        path = templates[name].format(item=rng.choice(item_ids), by=rng.choice(('stock', 'listings', 'items')))
+        headers = {'If-None-Match': etags[path]} if use_etag and path in etags else {}
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            results.append((name, time.perf_counter() - start, 0, 0))
+            continue
+        results.append((name, time.perf_counter() - start, response.status, len(body)))
+        if use_etag and response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    conn.close()
+
+
+def run_load(host, port, item_ids, clients=16, duration=10.0, use_etag=False, seed=42):
+    """
+    Returns:
+        tuple: (list of (endpoint, seconds, status, bytes), wall seconds)
+    """
+    stop_at = time.perf_counter() + duration
+    per_client = [[] for _ in range(clients)]
+    threads = [threading.Thread(target=_client, args=(host, port, item_ids, stop_at, use_etag, seed + n, per_client[n]))
+               for n in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [r for results in per_client for r in results], time.perf_counter() - start
+
+
+def summarize(results, wall):
+    """Per-endpoint and overall request counts, req/s and p50/p99 latency in ms."""
+    rows = {}
+    for name in [name for name, _, _ in MIX] + ['all']:
+        picked = [r for r in results if name == 'all' or r[0] == name]
+        if not picked:
+            continue
+        latencies = np.array([r[1] for r in picked]) * 1000
+        statuses = {}
+        for r in picked:
+            statuses[r[2]] = statuses.get(r[2], 0) + 1
+        rows[name] = {
+            "requests": len(picked),
+            "req_per_s": round(len(picked) / wall, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "max_ms": round(float(latencies.max()), 2),
+            "statuses": dict(sorted(statuses.items())),
+            "mb": round(sum(r[3] for r in picked) / 1048576, 2),
+        }
+    return rows
+
+
+def print_summary(rows, clients, wall, label):
+    lines = [f"{label}: {clients} clients for {wall:.1f}s",
+             f"  {'endpoint':>13} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses"]
+    for name, row in rows.items():
+        statuses = ', '.join(f"{status}: {n}" for status, n in row["statuses"].items())
+        lines.append(f"  {name:>13} {row['requests']:>9} {row['req_per_s']:>8.1f} {row['p50_ms']:>8.2f} "
+                     f"{row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}  {statuses}")
+    for line in lines:
+        logging.info(line)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures api.py latency and throughput under concurrent clients.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--db', help="Aggregates database to serve.")
+    source.add_argument('--data', nargs='+', help="exchange_data_* files (globs allowed) to build a temporary database from.")
+    source.add_argument('--url', help="Test an already running server, e.g. http://127.0.0.1:5000.")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per measurement.")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Server response cache (0 disables it).")
+    parser.add_argument('--cache-ttl', type=float, default=30.0)
+    parser.add_argument('--etag', action='store_true', help="Clients revalidate with If-None-Match.")
+    parser.add_argument('--warmup', type=float, default=1.0, help="Seconds of unmeasured load first.")
+    parser.add_argument('--json', metavar='PATH', help="Also write the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    process = None
+    tmp_dir = None
+    try:
+        if args.url:
+            host_port = args.url.split('://', 1)[-1].rstrip('/')
+            host, _, port = host_port.partition(':')
+            port = int(port or 80)
+        else:
+            db_path = args.db
+            if args.data:
+                tmp_dir = tempfile.mkdtemp(prefix='load_test_')
+                db_path = os.path.join(tmp_dir, 'aggregates.db')
+                store = aggregate_store.AggregateStore(db_path)
+                store.update_from_files(sorted({p for pattern in args.data for p in glob.glob(pattern)}))
+                store.close()
+            process, port = start_server(db_path, args.cache_size, args.cache_ttl)
+            host = '127.0.0.1'
+
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request('GET', '/api/ratios')
+        item_ids = [row["item_id"] for row in json.loads(conn.getresponse().read())]
+        conn.close()
+        if not item_ids:
+            print("The aggregates hold no items; build some runs first.")
+            return
+
+        if args.warmup:
+            run_load(host, port, item_ids, args.clients, args.warmup, args.etag, seed=1000)
+        results, wall = run_load(host, port, item_ids, args.clients, args.duration, args.etag)
+        rows = summarize(results, wall)
+        label = (f"api.py on {len(item_ids)} items, cache {'off' if args.cache_size == 0 else args.cache_size}"
+                 f"{', ETag revalidation' if args.etag else ''}")
+        print_summary(rows, args.clients, wall, label)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({"label": label, "clients": args.clients, "wall": wall, "endpoints": rows}, f, indent=4)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if tmp_dir is not None:
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
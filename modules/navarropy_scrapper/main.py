@@ -1,68 +1,158 @@
-import os, sys, json, time, sqlite3
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import os, sys, json, time, sqlite3, argparse, hashlib
+from urllib.parse import urlparse
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+
+import browser
+import metrics
+import rate_limiter
+import readiness
 
 # Database setup
 def setup_database(db_name='urls.db'):
     conn = sqlite3.connect(db_name)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS extracted_data (img_id TEXT PRIMARY KEY, url TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS run_meta (key TEXT PRIMARY KEY, value TEXT)''')
+    # Human-readable item name next to the content-based img_id
+    if 'item_title' not in [row[1] for row in c.execute('PRAGMA table_info(extracted_data)')]:
+        c.execute('ALTER TABLE extracted_data ADD COLUMN item_title TEXT')
     conn.commit()
     return conn, c
 
-# Check if img_id is already in database
-def is_img_processed(c, img_id):
-    c.execute('SELECT 1 FROM extracted_data WHERE img_id=?', (img_id,))
-    return c.fetchone() is not None
+ITEMS_XPATH = "//*[@class='filter-group' and descendant::*[contains(text(), 'Items I Want')]]//*[@class='filter']//img"
+
+# Reads title/src of every "Items I Want" image in one round-trip
+ITEM_KEYS_SCRIPT = """
+const snap = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const items = [];
+for (let i = 0; i < snap.snapshotLength; i++) {
+    const img = snap.snapshotItem(i);
+    items.push([img.getAttribute('title') || img.getAttribute('alt') || '', img.getAttribute('src') || '']);
+}
+return items;
+"""
+
+# Stable id derived from the item itself rather than its position in the list
+def item_key(title, src):
+    src_path = urlparse(src).path if src else ''
+    digest = hashlib.sha1(f"{title.strip()}|{src_path}".encode('utf-8')).hexdigest()[:16]
+    return f"item_{digest}"
+
+def read_item_keys(driver):
+    return [(item_key(title, src), title.strip()) for title, src in driver.execute_script(ITEM_KEYS_SCRIPT, ITEMS_XPATH)]
+
+# Rewrites positional img_{idx} rows to content-based ids. This assumes the item
+# list has not been reordered since those rows were written.
+def migrate_legacy_ids(conn, items):
+    rows = conn.execute("SELECT img_id FROM extracted_data WHERE img_id LIKE 'img\\_%' ESCAPE '\\'").fetchall()
+    migrated = 0
+    with conn:
+        for (legacy_id,) in rows:
+            idx = legacy_id[len('img_'):]
+            if not idx.isdigit() or int(idx) >= len(items):
+                continue
+            key, title = items[int(idx)]
+            if conn.execute('SELECT 1 FROM extracted_data WHERE img_id=?', (key,)).fetchone():
+                conn.execute('DELETE FROM extracted_data WHERE img_id=?', (legacy_id,))
+            else:
+                conn.execute('UPDATE extracted_data SET img_id=?, item_title=? WHERE img_id=?', (key, title, legacy_id))
+            migrated += 1
+    if migrated:
+        print(f"Migrated {migrated} positional img ids to content-based ids.")
+    return migrated
+
+# Load every processed img_id once, so the item loop only does set lookups
+def load_processed_ids(c):
+    c.execute('SELECT img_id FROM extracted_data')
+    return {row[0] for row in c.fetchall()}
 
-# Save img_id and URL to database
-def store_img_data(c, conn, img_id, url):
-    c.execute('INSERT OR IGNORE INTO extracted_data (img_id, url) VALUES (?, ?)', (img_id, url))
+# Remember how many items the last run saw, for the --resume report
+def store_item_count(c, conn, count):
+    c.execute('INSERT OR REPLACE INTO run_meta (key, value) VALUES (?, ?)', ('item_count', str(count)))
     conn.commit()
 
+def resume_report(c, processed):
+    c.execute('SELECT value FROM run_meta WHERE key=?', ('item_count',))
+    row = c.fetchone()
+    if row is None:
+        print(f"Resume: {len(processed)} items already processed; total item count not known yet.")
+    else:
+        total = int(row[0])
+        print(f"Resume: {len(processed)} of {total} items processed, {max(total - len(processed), 0)} remaining.")
+
+# Buffers (img_id, url, title) rows and commits them in batches or on a timer
+class UrlBatchWriter:
+    def __init__(self, conn, batch_size=25, interval=10.0, replace=False):
+        self.conn = conn
+        self.replace = replace
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def add(self, img_id, url, title=None):
+        self.pending.append((img_id, url, title))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            with self.conn:
+                verb = 'INSERT OR REPLACE' if self.replace else 'INSERT OR IGNORE'
+                self.conn.executemany(f'{verb} INTO extracted_data (img_id, url, item_title) VALUES (?, ?, ?)', self.pending)
+            self.pending = []
+        self.last_flush = time.monotonic()
+
 # Check and handle rate limit
 def check_and_handle_rate_limit(driver):
     rate_limit_url = "https://www.pathofexile.com/trade/exchange/Settlers"
     if driver.current_url == rate_limit_url:
         return True
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Collects exchange search URLs for every item under 'Items I Want'.")
+    parser.add_argument('--headless', action='store_true', help="Run Chrome without a window.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Report how many items remain before starting the browser.")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Re-click every item instead of only items not discovered before.")
+    parser.add_argument('--load-resources', action='store_true',
+                        help="Load images, media and fonts instead of blocking them (for before/after timing).")
+    parser.add_argument('--metrics', metavar='PATH', default='url_discovery_metrics.json',
+                        help="Where to write phase timings and counters: JSON, or a Prometheus textfile if PATH ends in .prom.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Database connection
     db_conn, db_cursor = setup_database()
+    processed = load_processed_ids(db_cursor)
+    writer = UrlBatchWriter(db_conn, replace=args.refresh)
+    if args.resume:
+        resume_report(db_cursor, processed)
 
-    # Determine Chrome user data directory based on OS
-    user_data_dir = (
-        os.path.join(os.environ['LOCALAPPDATA'], r'Google\Chrome\User Data') if sys.platform.startswith('win') else
-        os.path.expanduser('~/Library/Application Support/Google/Chrome') if sys.platform.startswith('darwin') else
-        os.path.expanduser('~/.config/google-chrome') if sys.platform.startswith('linux') else
-        None
-    )
-    if not user_data_dir:
-        raise Exception("Unsupported operating system")
-
-    profile = "Profile 1"  # Change to your dedicated profile
     url = "https://www.pathofexile.com/trade/exchange/Settlers/9z28fK"
 
-    # Configure Chrome options
-    options = Options()
-    options.add_argument(f"--user-data-dir={user_data_dir}")
-    options.add_argument(f'--profile-directory={profile}')
-    options.add_argument("--disable-extensions")
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-gpu")
-
     # Initialize WebDriver
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver = browser.create_driver(headless=args.headless, block_resources=not args.load_resources)
     wait = WebDriverWait(driver, 20)
 
+    # Paces searches against the trade site and backs off when it throttles us
+    limiter = rate_limiter.RateLimiter()
+    # Measured readiness waits that replace the fixed sleeps
+    waits = readiness.WaitTimings()
+    # Per-phase spans and counters, written out at the end of the run
+    run_metrics = metrics.RunMetrics('url_discovery', int(time.time()))
+
     try:
-        driver.get(url)
+        with run_metrics.span('navigate'):
+            browser.timed_get(driver, url, waits)
         print(f"Navigated to {url}")
 
         # Click "Show Filters" until it is visible and clickable
@@ -70,7 +160,7 @@ def main():
             try:
                 show_filters = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[normalize-space(.)='Show Filters']")))
                 show_filters.click()
-                time.sleep(1)  # Allow for any animations
+                readiness.wait_for_dom_quiet(driver, 'show-filters', waits)  # Allow for any animations
             except:
                 break  # Stop clicking once it's no longer available
 
@@ -79,85 +169,96 @@ def main():
             category.click()
 
         # Find all items under "Items I Want"
-        item_imgs = driver.find_elements(By.XPATH, "//*[@class='filter-group' and descendant::*[contains(text(), 'Items I Want')]]//*[@class='filter']//img")
-        print(f"Found {len(item_imgs)} items in 'Items I Want'.")
+        with run_metrics.span('extract'):
+            items = read_item_keys(driver)
+        print(f"Found {len(items)} items in 'Items I Want'.")
+        store_item_count(db_cursor, db_conn, len(items))
+        if migrate_legacy_ids(db_conn, items):
+            processed = load_processed_ids(db_cursor)
 
-        for idx in range(len(item_imgs)):
-            try:
-                # Get a unique identifier for the img element, e.g., its index
-                img_id = f"img_{idx}"
+        # Incremental discovery: only click items that have not been seen before
+        pending = [(key, title) for key, title in items if args.refresh or key not in processed]
+        print(f"{len(pending)} items to discover, {len(items) - len(pending)} already known.")
 
-                # Skip if img is already processed
-                if is_img_processed(db_cursor, img_id):
-                    print(f"Skipping already processed img: {img_id}")
-                    continue
+        for idx, (img_id, title) in enumerate(pending):
+            try:
 
                 while True:
-                    # Reopen filters if they are hidden after a search
-                    while True:
+                    with run_metrics.span('navigate', img_id):
+                        # Reopen filters if they are hidden after a search
+                        while True:
+                            try:
+                                show_filters = driver.find_element(By.XPATH, "//button[normalize-space(.)='Show Filters']")
+                                if show_filters.is_displayed():
+                                    show_filters.click()
+                                    readiness.wait_for_dom_quiet(driver, 'show-filters', waits)  # Let the UI settle
+                                break
+                            except:
+                                break
+
                         try:
-                            show_filters = driver.find_element(By.XPATH, "//button[normalize-space(.)='Show Filters']")
-                            if show_filters.is_displayed():
-                                show_filters.click()
-                                time.sleep(1)  # Brief pause for UI adjustment
-                            break
-                        except:
-                            break
-
-                    try:
-                        categories = driver.find_element(By.XPATH, "//*[@class='filter-title filter-title-clickable' and not(descendant::img) and not(preceding-sibling::img) and not(following-sibling::img) and not(preceding-sibling::*[@class='filter-options']) and not(following-sibling::*[@class='filter-options'])]")
-                        for category in categories:
-                            category.click()
-                    except NoSuchElementException:
-                        pass
-
-
-                    
-                    # Deselect any active filter items
-                    try:
-                        selecteds = driver.find_elements(By.XPATH, '//*[@class="exchange-filter-item active"]')
-                        for selected in selecteds:
-                            selected.click()
-                    except NoSuchElementException:
-                        pass
-
-                    # Refresh the list of items to prevent stale elements
-                    item_imgs = driver.find_elements(By.XPATH, "//*[@class='filter-group' and descendant::*[contains(text(), 'Items I Want')]]//*[@class='filter']//img")
-                    current_item = item_imgs[idx]
-
-                    # Click on the current item
-                    current_item.click()
-                    print(f"Clicked item {idx + 1}.")
-
-                    # Click the search button
-                    search_btn = wait.until(EC.element_to_be_clickable((By.XPATH, "//*[@id='trade']/div[4]/div/div[3]/div[2]/button")))
-                    search_btn.click()
-                    print("Clicked search button.")
-
-                    # Wait for URL to change
-                    wait.until(EC.url_changes(url))
-                    time.sleep(1)
-                    current_url = driver.current_url
-
-                    # Check for rate limit immediately after URL change
-                    if not check_and_handle_rate_limit(driver):
+                            categories = driver.find_element(By.XPATH, "//*[@class='filter-title filter-title-clickable' and not(descendant::img) and not(preceding-sibling::img) and not(following-sibling::img) and not(preceding-sibling::*[@class='filter-options']) and not(following-sibling::*[@class='filter-options'])]")
+                            for category in categories:
+                                category.click()
+                        except NoSuchElementException:
+                            pass
+
+                        # Deselect any active filter items
+                        try:
+                            selecteds = driver.find_elements(By.XPATH, '//*[@class="exchange-filter-item active"]')
+                            for selected in selecteds:
+                                selected.click()
+                        except NoSuchElementException:
+                            pass
+
+                        # Refresh the list of items to prevent stale elements, and locate
+                        # the item by its id in case the list changed since it was read
+                        item_imgs = driver.find_elements(By.XPATH, ITEMS_XPATH)
+                        keys = [key for key, _ in read_item_keys(driver)]
+                        current_item = item_imgs[keys.index(img_id)]
+
+                        # Click on the current item
+                        current_item.click()
+
+                    # Wait for our turn before firing another search
+                    with run_metrics.span('rate-limit-sleep', img_id):
+                        limiter.acquire(url)
+
+                    # Click the search button and wait for the URL to change
+                    with run_metrics.span('navigate', img_id):
+                        search_btn = wait.until(EC.element_to_be_clickable((By.XPATH, "//*[@id='trade']/div[4]/div/div[3]/div[2]/button")))
+                        search_btn.click()
+                        wait.until(EC.url_changes(url))
+
+                    with run_metrics.span('wait-for-ready', img_id):
+                        readiness.wait_for_dom_quiet(driver, 'url-change', waits)
+
+                    with run_metrics.span('extract', img_id):
+                        current_url = driver.current_url
+                        # Check for rate limit immediately after URL change
+                        throttled = check_and_handle_rate_limit(driver)
+                    if not throttled:
+                        limiter.for_url(url).on_success()
                         break
                     else:
-                        print("Rate limit detected. Waiting for 120 seconds...")
-                        time.sleep(120)
-
-                # Store img_id and URL to database if new
-                store_img_data(db_cursor, db_conn, img_id, current_url)
-                print(f"Stored img and URL: {img_id} -> {current_url}")
+                        run_metrics.inc('retries')
+                        limiter.throttled(url)
 
-                # Allow the page to stabilize after loading the search
-                time.sleep(1)
+                # Store img_id and URL to database if new (committed in batches)
+                with run_metrics.span('persist', img_id):
+                    writer.add(img_id, current_url, title)
+                processed.add(img_id)
+                run_metrics.inc('urls_discovered')
+                breakdown = metrics.format_breakdown(run_metrics.finish_url(img_id))
+                print(f"[{idx + 1}/{len(pending)}] {title}: {img_id} -> {current_url} ({breakdown})")
 
             except Exception as e:
+                run_metrics.inc('items_failed')
                 print(f"Failed to process item {idx + 1}: {e}")
                 continue
 
         # Retrieve all stored URLs to save to JSON
+        writer.flush()
         db_cursor.execute('SELECT url FROM extracted_data')
         all_urls = [row[0] for row in db_cursor.fetchall()]
         if all_urls:
@@ -171,6 +272,11 @@ def main():
         print(f"An unexpected error occurred: {e}")
 
     finally:
+        writer.flush()
+        limiter.report(fixed_sleep_per_request=1.0, fixed_sleep_per_throttle=120.0)
+        waits.report(fixed_sleeps={'show-filters': 1, 'url-change': 1})
+        run_metrics.report()
+        print(f"Run metrics written to: {os.path.abspath(run_metrics.write(args.metrics))}")
         db_conn.close()
         input("Press Enter to close the browser...")
         driver.quit()
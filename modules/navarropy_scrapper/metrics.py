@@ -0,0 +1,227 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-phase timing for the navarropy scrapers.
+#
+# Hot-path code wraps each phase in a span:
+#
+#   with run_metrics.span('navigate', url):
+#       driver.get(url)
+#
+# Every span feeds a per-run histogram for its phase and the per-URL
+# breakdown; a span that raises also bumps the errors counter for its phase.
+# finish_url() closes a URL's breakdown into the per-URL total histogram;
+# start_url() drops one left open by a failed attempt, so daemon revisits and
+# retries each get their own breakdown. Point-in-time values (e.g. the daemon
+# scheduler's freshness) go in gauges. At the end of a run write() dumps everything as a JSON summary, or as a
+# Prometheus textfile (for node_exporter's textfile collector) when the path
+# ends in .prom.
+
+PHASES = ('rate-limit-sleep', 'navigate', 'wait-for-ready', 'extract', 'snapshot', 'persist')
+
+# Upper bounds in seconds; one extra +Inf bucket catches the rest
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        cumulative, seen = {}, 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            cumulative['+Inf' if bound == float('inf') else f"{bound:g}"] = seen
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+            "buckets": cumulative,
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe span timings and counters for one scraper run.
+
+    Parameters:
+        job (str): Metric name prefix / job label, e.g. 'link_collector'.
+        run_epoch (int): The run the metrics belong to.
+        clock (callable): Monotonic clock, replaceable for tests.
+    """
+
+    def __init__(self, job, run_epoch, clock=time.perf_counter):
+        self.job = job
+        self.run_epoch = run_epoch
+        self.clock = clock
+        self.started = clock()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.url_totals = Histogram()
+        self.urls = {}
+        self.finished_urls = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, phase, url=None):
+        start = self.clock()
+        try:
+            yield
+        except Exception:
+            self.inc('errors', phase=phase)
+            raise
+        finally:
+            self.observe(phase, self.clock() - start, url)
+
+    def observe(self, phase, seconds, url=None):
+        with self._lock:
+            self.phases.setdefault(phase, Histogram()).observe(seconds)
+            if url is not None:
+                breakdown = self.urls.setdefault(url, {})
+                breakdown[phase] = breakdown.get(phase, 0.0) + seconds
+
+    def inc(self, name, n=1, phase=None):
+        with self._lock:
+            key = (name, phase)
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def counter(self, name):
+        """Total of a counter across phases."""
+        with self._lock:
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def start_url(self, url):
+        """Drops a breakdown left open by an earlier attempt that failed before finish_url()."""
+        with self._lock:
+            self.urls.pop(url, None)
+
+    def finish_url(self, url):
+        """
+        Records a URL's total span time and closes its breakdown, so a later
+        visit (daemon revisit, retry) starts from zero. Returns the breakdown.
+        """
+        with self._lock:
+            breakdown = self.urls.pop(url, {})
+            self.finished_urls[url] = breakdown
+            self.url_totals.observe(sum(breakdown.values()))
+        return breakdown
+
+    def summary(self):
+        with self._lock:
+            return {
+                "job": self.job,
+                "run_epoch": self.run_epoch,
+                "elapsed": round(self.clock() - self.started, 3),
+                "phases": {phase: h.to_dict() for phase, h in self.phases.items()},
+                "url_total": self.url_totals.to_dict(),
+                "counters": {(name if phase is None else f"{name}{{phase={phase}}}"): v
+                             for (name, phase), v in sorted(self.counters.items(), key=lambda kv: (kv[0][0], kv[0][1] or ''))},
+                "gauges": dict(sorted(self.gauges.items())),
+                "urls": {url: {phase: round(s, 6) for phase, s in breakdown.items()}
+                         for url, breakdown in {**self.finished_urls, **self.urls}.items()},
+            }
+
+    def prometheus_text(self):
+        prefix = self.job
+        labels = f'job="{self.job}",run_epoch="{self.run_epoch}"'
+        lines = []
+
+        def histogram(name, hist, extra=''):
+            for bound, n in hist.to_dict()["buckets"].items():
+                lines.append(f'{name}_bucket{{{labels}{extra},le="{bound}"}} {n}')
+            lines.append(f'{name}_sum{{{labels}{extra}}} {hist.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}{extra}}} {hist.count}')
+
+        with self._lock:
+            lines.append(f'# HELP {prefix}_phase_seconds Time spent per scraper phase.')
+            lines.append(f'# TYPE {prefix}_phase_seconds histogram')
+            for phase, hist in self.phases.items():
+                histogram(f'{prefix}_phase_seconds', hist, f',phase="{phase}"')
+            lines.append(f'# HELP {prefix}_url_seconds Total span time per URL.')
+            lines.append(f'# TYPE {prefix}_url_seconds histogram')
+            histogram(f'{prefix}_url_seconds', self.url_totals)
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                for (n, phase), v in sorted(self.counters.items(), key=lambda kv: kv[0][1] or ''):
+                    if n == name:
+                        extra = f',phase="{phase}"' if phase else ''
+                        lines.append(f'{prefix}_{name}_total{{{labels}{extra}}} {v}')
+            for name, v in sorted(self.gauges.items()):
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name}{{{labels}}} {float(v):g}')
+            lines.append(f'# TYPE {prefix}_run_seconds gauge')
+            lines.append(f'{prefix}_run_seconds{{{labels}}} {self.clock() - self.started:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Writes a JSON summary, or a Prometheus textfile if path ends in .prom."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.prometheus_text())
+            else:
+                json.dump(self.summary(), f, ensure_ascii=False, indent=4)
+        # Atomic so a textfile collector never reads a partial file
+        os.replace(tmp_path, path)
+        return path
+
+    def report(self):
+        """Logs where the run's time went, per phase."""
+        total = sum(h.sum for h in self.phases.values())
+        logging.info(f"Phase timings for {self.job} run {self.run_epoch}:")
+        print(f"Phase timings for {self.job} run {self.run_epoch}:")
+        for phase, h in self.phases.items():
+            if not h.count:
+                continue
+            share = h.sum / total * 100 if total else 0.0
+            line = (f"  {phase:>16}: {h.sum:8.1f}s total ({share:4.1f}%), {h.count} spans, "
+                    f"mean {h.sum / h.count:.2f}s, p95 <= {h.quantile(0.95):.2f}s, max {h.max:.2f}s")
+            logging.info(line)
+            print(line)
+        counters = ', '.join(f"{name} {self.counter(name)}" for name in sorted({n for n, _ in self.counters}))
+        if counters:
+            logging.info(f"  Counters: {counters}")
+            print(f"  Counters: {counters}")
+
+
+def format_breakdown(breakdown):
+    return ', '.join(f"{phase} {breakdown[phase]:.2f}s" for phase in PHASES if phase in breakdown)
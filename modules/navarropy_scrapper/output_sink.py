@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import sys
+import textwrap
+import time
+from contextlib import contextmanager
+
+# Append-only output for link_collector.py.py.
+#
+# Each URL's records are appended to data_files/exchange_data_{run_epoch}.ndjson
+# as one JSON object per line and flushed immediately, so a crash loses at most
+# the URL being processed. fsync runs every `fsync_every` URLs or
+# `fsync_interval` seconds, whichever comes first. A URL whose write fails
+# halfway (e.g. the listing store raises after the records were appended) is
+# cut back out inside atomic(), so retrying it does not duplicate records. The
+# indented JSON array the collector used to rewrite after every URL is now an
+# optional export:
+#
+#   python output_sink.py data_files/exchange_data_1725000000.ndjson
+
+
+def ndjson_path(run_epoch, json_dir='data_files'):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, json_dir, f"exchange_data_{run_epoch}.ndjson")
+
+
+class NdjsonSink:
+    """
+    Streams records to an NDJSON file.
+
+    Parameters:
+        path (str): File to append to; its directory is created if needed.
+        fsync_every (int): fsync after this many write() calls.
+        fsync_interval (float): fsync at least this often, in seconds.
+    """
+
+    def __init__(self, path, fsync_every=10, fsync_interval=30.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.records_written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, records):
+        """Appends one URL's records and flushes them to the OS."""
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write('\n')
+        self._file.flush()
+        self.records_written += len(records)
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def size(self):
+        """Size of the file after everything write() has flushed so far."""
+        return os.fstat(self._file.fileno()).st_size
+
+    def truncate(self, offset):
+        """Cuts the file back to `offset` bytes, discarding anything still buffered."""
+        try:
+            self._file.flush()
+        except OSError:
+            pass
+        os.ftruncate(self._file.fileno(), offset)
+
+    @contextmanager
+    def atomic(self):
+        """Undoes every write made inside the block if the block raises."""
+        offset, written = self.size(), self.records_written
+        try:
+            yield self
+        except BaseException:
+            self.truncate(offset)
+            self.records_written = written
+            raise
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_ndjson(path):
+    """Yields records from an NDJSON file, skipping a torn trailing line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping unreadable line {line_no} in '{path}'.")
+
+
+def export_json_array(path, json_path=None):
+    """
+    Converts an NDJSON file into the indented JSON array format the collector
+    used to write, one record at a time.
+
+    Parameters:
+        path (str): Source NDJSON file.
+        json_path (str): Destination; defaults to the same name with .json.
+
+    Returns:
+        str: The path of the written JSON file.
+    """
+    json_path = json_path or os.path.splitext(path)[0] + '.json'
+    tmp_path = json_path + '.tmp'
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for record in iter_ndjson(path):
+            out.write(',\n' if count else '\n')
+            out.write(textwrap.indent(json.dumps(record, ensure_ascii=False, indent=4), '    '))
+            count += 1
+        out.write('\n]' if count else ']')
+    os.replace(tmp_path, json_path)
+    logging.info(f"Exported {count} records to '{os.path.abspath(json_path)}'.")
+    print(f"Exported {count} records to '{os.path.abspath(json_path)}'.")
+    return json_path
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        export_json_array(arg)
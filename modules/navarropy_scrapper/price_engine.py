@@ -0,0 +1,226 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Numeric view of link_collector listings.
+#
+# Records carry prices only as display strings:
+#   "What You Get": "2x Divine Orb", several offers joined with ' | '
+#                   (browser runs from before dom_extract.normalize_offer()
+#                   wrote "2 ×  Divine Orb"; both are still parsed)
+#   "Per-Want":     "1x Divine Orb ⇒ 180x Chaos Orb"
+#   "Per-Have":     "1x Chaos Orb ⇒ 0.005556x Divine Orb"
+# parse_listings() turns them into numeric/categorical columns once. The same
+# strings repeat across thousands of listings, so each column is factorized
+# and only its distinct values go through the regex; the parsed values are
+# then broadcast back with a NumPy take. aggregate() computes per-item
+# statistics with sorted group operations rather than a per-row loop.
+#
+#   python price_engine.py data_files/exchange_data_*.ndjson [--online-only] [--by-run] [--out prices.csv]
+
+AMOUNT_RE = r'([0-9][0-9,]*(?:\.[0-9]+)?)'
+SIDE_RE = re.compile(rf'^\s*{AMOUNT_RE}\s*[x×]\s*(.+?)\s*$')
+RATE_RE = re.compile(rf'^\s*{AMOUNT_RE}x\s+.+?\s*⇒\s*{AMOUNT_RE}x\s+.+?\s*$')
+RUN_EPOCH_RE = re.compile(r'exchange_data_(\d+)')
+# parse_listings() output columns (run_epoch follows URL when the records have it)
+LISTING_DTYPES = {
+    "URL": 'category',
+    "profile": 'category',
+    "stock": np.int64,
+    "online": bool,
+    "get_amount": np.float64,
+    "get_currency": 'category',
+    "pay_amount": np.float64,
+    "pay_currency": 'category',
+    "offers": np.int32,
+    "price": np.float64,
+    "inverse": np.float64,
+}
+
+
+def parse_side(text):
+    """'2 ×  Divine Orb | 1x Chaos Orb' -> (2.0, 'Divine Orb', 2); only the first offer is priced."""
+    if not isinstance(text, str):
+        return np.nan, None, 0
+    parts = text.split(' | ')
+    match = SIDE_RE.match(parts[0])
+    if match is None:
+        return np.nan, None, len(parts)
+    return float(match.group(1).replace(',', '')), match.group(2), len(parts)
+
+
+def parse_rate(text):
+    """'1x Divine Orb ⇒ 180x Chaos Orb' -> 180.0 (right amount per unit of the left)."""
+    match = RATE_RE.match(text) if isinstance(text, str) else None
+    if match is None:
+        return np.nan
+    left = float(match.group(1).replace(',', ''))
+    return float(match.group(2).replace(',', '')) / left if left else np.nan
+
+
+def _parse_column(series, parse):
+    """
+    Factorizes a string column, parses each distinct value once and broadcasts
+    the results back. Returns one array (or Categorical for str results) per
+    value parse() returns.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = [parse(value) for value in uniques]
+    parsed.append(parse(None))  # code -1 (missing) indexes this sentinel
+    fields = list(zip(*parsed)) if isinstance(parsed[0], tuple) else [parsed]
+    out = []
+    for field in fields:
+        if isinstance(field[0], str) or (field[0] is None and any(isinstance(v, str) for v in field)):
+            categorical = pd.Categorical(field)
+            out.append(pd.Categorical.from_codes(categorical.codes[codes], categories=categorical.categories))
+        else:
+            out.append(np.asarray(field, dtype=np.float64)[codes])
+    return out
+
+
+def parse_listings(records):
+    """
+    Parses listing records into a numeric DataFrame.
+
+    Parameters:
+        records (DataFrame or iterable): link_collector records.
+
+    Returns:
+        DataFrame: One row per listing with columns URL, run_epoch (if
+            present), profile, stock, online, get_amount, get_currency,
+            pay_amount, pay_currency, offers, price (pay per unit received)
+            and inverse (units received per unit paid).
+    """
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    if df.empty:
+        dtypes = dict(LISTING_DTYPES)
+        if "run_epoch" in df:
+            dtypes = {"URL": dtypes.pop("URL"), "run_epoch": np.int64, **dtypes}
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+    out = pd.DataFrame({"URL": df["URL"].astype('category')})
+    if "run_epoch" in df:
+        out["run_epoch"] = df["run_epoch"].to_numpy(dtype=np.int64)
+    out["profile"] = df["Profile Link"].astype('category')
+    out["stock"] = pd.to_numeric(df["Items in Stock"], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    out["online"] = df["Player Status"].fillna(False).to_numpy(dtype=bool)
+
+    get_amount, get_currency, offers = _parse_column(df["What You Get"], parse_side)
+    pay_amount, pay_currency, _ = _parse_column(df["What You Pay"], parse_side)
+    out["get_amount"], out["get_currency"] = get_amount, get_currency
+    out["pay_amount"], out["pay_currency"] = pay_amount, pay_currency
+    out["offers"] = offers.astype(np.int32)
+
+    (want,) = _parse_column(df["Per-Want"], parse_rate)
+    (have,) = _parse_column(df["Per-Have"], parse_rate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Per-Want carries the exact ratio; fall back to the offer amounts
+        price = np.where(np.isfinite(want), want, pay_amount / get_amount)
+        inverse = np.where(np.isfinite(have), have, 1.0 / price)
+    out["price"] = np.where(np.isfinite(price), price, np.nan)
+    out["inverse"] = np.where(np.isfinite(inverse), inverse, np.nan)
+    return out
+
+
+def weighted_median(df, keys, value='price', weight='stock'):
+    """
+    Stock-weighted median of `value` per group: the lowest value at which the
+    cumulative weight reaches half of the group's total. Groups without any
+    stock get their lowest value.
+    """
+    ordered = df.sort_values(keys + [value], kind='mergesort')
+    weights = ordered.groupby(keys, observed=True, sort=False)[weight]
+    reached = (2 * weights.cumsum() >= weights.transform('sum')).to_numpy()
+    return ordered[reached].groupby(keys, observed=True)[value].first()
+
+
+def aggregate(listings, online_only=False, by_run=False):
+    """
+    Per-item price statistics.
+
+    Parameters:
+        listings (DataFrame): Output of parse_listings().
+        online_only (bool): Only count sellers whose Player Status is online.
+        by_run (bool): One row per (run_epoch, URL) instead of per URL.
+
+    Returns:
+        DataFrame: best (lowest price), worst, mean, stock-weighted median,
+            spread ((worst - best) / best), listings, sellers and total stock
+            per item, plus the currency pair.
+    """
+    df = listings[listings["online"]] if online_only else listings
+    df = df[np.isfinite(df["price"].to_numpy())]
+    keys = (["run_epoch"] if by_run else []) + ["URL"]
+
+    grouped = df.groupby(keys, observed=True)
+    result = grouped.agg(
+        get_currency=("get_currency", "first"),
+        pay_currency=("pay_currency", "first"),
+        best=("price", "min"),
+        worst=("price", "max"),
+        mean=("price", "mean"),
+        listings=("price", "size"),
+        sellers=("profile", "nunique"),
+        stock=("stock", "sum"),
+    )
+    result["weighted_median"] = weighted_median(df, keys)
+    result["spread"] = (result["worst"] - result["best"]) / result["best"]
+    return result[["get_currency", "pay_currency", "best", "weighted_median", "mean", "worst", "spread",
+                   "listings", "sellers", "stock"]]
+
+
+def load_records(paths):
+    """
+    Reads NDJSON outputs and exported JSON arrays into one DataFrame, tagging
+    each row with the run_epoch from its exchange_data_{epoch} file name.
+    """
+    frames = []
+    for path in paths:
+        if path.endswith('.ndjson'):
+            frame = pd.read_json(path, lines=True, dtype=False)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                frame = pd.DataFrame.from_records(json.load(f))
+        match = RUN_EPOCH_RE.search(os.path.basename(path))
+        frame["run_epoch"] = int(match.group(1)) if match else 0
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parses listing prices and aggregates them per item.")
+    parser.add_argument('paths', nargs='+', help="exchange_data_*.ndjson / .json files (globs allowed).")
+    parser.add_argument('--online-only', action='store_true', help="Only count online sellers.")
+    parser.add_argument('--by-run', action='store_true', help="Aggregate per run as well as per item.")
+    parser.add_argument('--out', default=None, help="Write the aggregates to CSV instead of printing them.")
+    args = parser.parse_args(argv)
+
+    paths = sorted({p for pattern in args.paths for p in glob.glob(pattern)})
+    start = time.perf_counter()
+    records = load_records(paths)
+    loaded = time.perf_counter()
+    listings = parse_listings(records)
+    parsed = time.perf_counter()
+    result = aggregate(listings, online_only=args.online_only, by_run=args.by_run)
+    done = time.perf_counter()
+
+    line = (f"{len(listings)} listings from {len(paths)} files: load {loaded - start:.2f}s, "
+            f"parse {parsed - loaded:.2f}s, aggregate {done - parsed:.2f}s -> {len(result)} items")
+    logging.info(line)
+    print(line)
+    if args.out:
+        result.to_csv(args.out)
+        print(f"Aggregates written to {os.path.abspath(args.out)}")
+    else:
+        with pd.option_context('display.max_rows', 50, 'display.width', 200):
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+# Shared request pacing for main.py and link_collector.py.py.
+#
+# Every request to a host goes through that host's token bucket. When the host
+# throttles us the bucket rate is halved and the next request waits for an
+# exponential backoff with jitter (or the server's Retry-After); successful
+# requests slowly restore the rate (AIMD). When the trade API's rate-limit
+# policy headers are available, e.g.
+#   X-Rate-Limit-Rules: Ip
+#   X-Rate-Limit-Ip: 7:15:60,15:90:120
+#   X-Rate-Limit-Ip-State: 3:15:0,4:90:0
+# the bucket is re-tuned to stay just under the tightest rule instead of
+# running into it. While a host is blocked no tokens accrue, so requests queued
+# behind a backoff leave it spaced at the bucket rate instead of all waking at
+# once. clock and sleep are injectable so the limiter can be driven by a fake
+# clock.
+
+DEFAULT_POLICY = {"rate": 1.0, "capacity": 2}
+HOST_POLICIES = {
+    "www.pathofexile.com": {"rate": 0.5, "capacity": 2},
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` requests may burst, then `rate` per second.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait for it."""
+        self._refill()
+        self.tokens -= 1
+        # while paused, `updated` is the end of the pause and tokens count from there
+        paused = max(0.0, self.updated - self.clock())
+        return paused if self.tokens >= 0 else paused - self.tokens / self.rate
+
+    def pause_until(self, until):
+        """Stops tokens accruing before `until`; at most one is available then."""
+        self._refill()
+        self.tokens = min(self.tokens, 1.0)
+        self.updated = max(self.updated, until)
+
+
+def parse_rule(value):
+    """Parses 'hits:period:penalty,...' into a list of integer triples."""
+    rules = []
+    for part in (value or '').split(','):
+        fields = part.strip().split(':')
+        if len(fields) == 3 and all(f.isdigit() for f in fields):
+            rules.append(tuple(int(f) for f in fields))
+    return rules
+
+
+class HostLimiter:
+    def __init__(self, host, rate, capacity, clock, sleep,
+                 base_backoff=15.0, max_backoff=300.0, recovery=1.1):
+        self.host = host
+        self.max_rate = float(rate)
+        self.bucket = TokenBucket(rate, capacity, clock)
+        self.clock = clock
+        self.sleep = sleep
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.recovery = recovery
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request to this host is allowed; returns the time waited."""
+        with self.lock:
+            wait = max(self.bucket.reserve(), self.blocked_until - self.clock())
+        if wait > 0:
+            self.sleep(wait)
+        return max(wait, 0.0)
+
+    def on_success(self):
+        with self.lock:
+            self.consecutive_throttles = 0
+            self.bucket.rate = min(self.max_rate, self.bucket.rate * self.recovery)
+
+    def on_throttled(self, retry_after=None):
+        """Registers a throttle response and returns the backoff that will be applied."""
+        with self.lock:
+            self.consecutive_throttles += 1
+            self.bucket.rate = max(self.bucket.rate / 2, self.max_rate / 16)
+            if retry_after is not None:
+                backoff = float(retry_after)
+            else:
+                ceiling = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_throttles - 1))
+                backoff = random.uniform(ceiling / 2, ceiling)
+            self._block(self.clock() + backoff)
+            return backoff
+
+    def _block(self, until):
+        self.blocked_until = max(self.blocked_until, until)
+        self.bucket.pause_until(self.blocked_until)
+
+    def on_policy(self, headers):
+        """Re-tunes pacing from X-Rate-Limit-* policy and state headers."""
+        rules = [r.strip() for r in (headers.get('X-Rate-Limit-Rules') or '').split(',') if r.strip()]
+        if not rules:
+            return
+        with self.lock:
+            now = self.clock()
+            rate = None
+            for rule in rules:
+                limits = parse_rule(headers.get(f'X-Rate-Limit-{rule}'))
+                states = parse_rule(headers.get(f'X-Rate-Limit-{rule}-State'))
+                for hits, period, _penalty in limits:
+                    # One token of burst plus (hits - 1) per period never exceeds `hits`.
+                    if hits > 1 and period > 0:
+                        rule_rate = (hits - 1) / period
+                        rate = rule_rate if rate is None else min(rate, rule_rate)
+                for (current, period, active), (hits, _, _) in zip(states, limits):
+                    if active > 0:
+                        self._block(now + active)
+                    elif hits and current >= hits - 1:
+                        self._block(now + period / hits)
+            if rate is not None:
+                self.max_rate = rate
+                self.bucket.rate = min(self.bucket.rate, rate)
+                self.bucket.capacity = 1.0
+                self.bucket.tokens = min(self.bucket.tokens, 1.0)
+
+
+class RateLimiter:
+    """
+    Per-host registry of HostLimiters plus wait statistics for the run.
+
+    Parameters:
+        policies (dict): host -> {"rate": requests/sec, "capacity": burst}.
+        clock (callable): Monotonic time source in seconds.
+        sleep (callable): Sleep function; replace both for a fake clock.
+    """
+
+    def __init__(self, policies=None, clock=time.monotonic, sleep=time.sleep):
+        self.policies = dict(HOST_POLICIES if policies is None else policies)
+        self.clock = clock
+        self.sleep = sleep
+        self.hosts = {}
+        self.requests = 0
+        self.throttles = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self.hosts:
+                policy = self.policies.get(host, DEFAULT_POLICY)
+                self.hosts[host] = HostLimiter(host, policy["rate"], policy["capacity"], self.clock, self.sleep)
+            return self.hosts[host]
+
+    def acquire(self, url):
+        waited = self.for_url(url).acquire()
+        with self._lock:
+            self.requests += 1
+            self.waited += waited
+        return waited
+
+    def observe(self, url, status=200, headers=None):
+        """Feeds a response back into the limiter. Returns True if it was a throttle."""
+        limiter = self.for_url(url)
+        if headers:
+            limiter.on_policy(headers)
+        if status == 429:
+            retry_after = (headers or {}).get('Retry-After')
+            self.throttled(url, int(retry_after) if retry_after and str(retry_after).isdigit() else None)
+            return True
+        limiter.on_success()
+        return False
+
+    def throttled(self, url, retry_after=None):
+        """Registers a throttle detected out of band (e.g. a redirect in the browser)."""
+        backoff = self.for_url(url).on_throttled(retry_after)
+        with self._lock:
+            self.throttles += 1
+        logging.warning(f"Rate limit detected for {url}. Backing off for {backoff:.1f} seconds.")
+        print(f"Rate limit detected. Backing off for {backoff:.1f} seconds...")
+        return backoff
+
+    def report(self, fixed_sleep_per_request=0.0, fixed_sleep_per_throttle=0.0):
+        """Logs waits compared with the fixed sleeps the limiter replaced."""
+        fixed = self.requests * fixed_sleep_per_request + self.throttles * fixed_sleep_per_throttle
+        line = (f"Rate limiter: {self.requests} requests, {self.throttles} throttles, "
+                f"{self.waited:.1f}s waited")
+        if fixed:
+            line += f" (fixed sleeps would have been {fixed:.1f}s, saved {fixed - self.waited:.1f}s)"
+        logging.info(line)
+        print(line)
+        return fixed - self.waited
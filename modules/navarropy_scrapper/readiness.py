@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+# Event-driven page readiness for the navarropy scrapers.
+#
+# Instead of padding every step with time.sleep(), these helpers install a
+# MutationObserver in the page and return as soon as the DOM has settled:
+#   * wait_for_dom_quiet   - no DOM mutations for `quiet_ms`;
+#   * wait_for_stable_count - an XPath matches at least one node and the match
+#                             count has not changed for `stable_ms`.
+# Both give up after `timeout` seconds (returning rather than raising, like the
+# sleeps they replace) and report the measured wait to a WaitTimings recorder.
+
+DOM_QUIET_SCRIPT = """
+const quietMs = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+const start = performance.now();
+let timer = null;
+const finish = (settled) => { observer.disconnect(); clearTimeout(timer); clearTimeout(limit); done(settled); };
+const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(() => finish(true), quietMs); });
+observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true, characterData: true});
+timer = setTimeout(() => finish(true), quietMs);
+const limit = setTimeout(() => finish(false), timeoutMs);
+"""
+
+STABLE_COUNT_SCRIPT = """
+const xpath = arguments[0], stableMs = arguments[1], timeoutMs = arguments[2], done = arguments[arguments.length - 1];
+const count = () => document.evaluate('count(' + xpath + ')', document, null, XPathResult.NUMBER_TYPE, null).numberValue;
+let last = count(), timer = null;
+const finish = (settled) => { observer.disconnect(); clearTimeout(timer); clearTimeout(limit); done(settled); };
+const arm = () => { clearTimeout(timer); timer = setTimeout(() => { if (last > 0) finish(true); }, stableMs); };
+const observer = new MutationObserver(() => { const now = count(); if (now !== last) { last = now; arm(); } });
+observer.observe(document.documentElement, {subtree: true, childList: true});
+arm();
+const limit = setTimeout(() => finish(false), timeoutMs);
+"""
+
+
+class WaitTimings:
+    """Thread-safe per-step record of how long readiness waits took."""
+
+    def __init__(self):
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, settled=True):
+        with self._lock:
+            entry = self.steps.setdefault(step, {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            if not settled:
+                entry["timeouts"] += 1
+
+    def report(self, fixed_sleeps=None):
+        """
+        Logs the measured waits per step.
+
+        Parameters:
+            fixed_sleeps (dict): step -> seconds of the time.sleep() it replaced,
+                used to show how much dead time was removed.
+        """
+        fixed_sleeps = fixed_sleeps or {}
+        for step, entry in sorted(self.steps.items()):
+            mean = entry["total"] / entry["count"]
+            line = (f"Wait '{step}': {entry['count']} waits, mean {mean * 1000:.0f} ms, "
+                    f"max {entry['max'] * 1000:.0f} ms, {entry['timeouts']} timeouts")
+            if step in fixed_sleeps:
+                saved = fixed_sleeps[step] * entry["count"] - entry["total"]
+                line += f", {saved:.1f}s saved vs fixed {fixed_sleeps[step]}s sleeps"
+            logging.info(line)
+            print(line)
+
+
+def _run(driver, step, timings, timeout, script, *args):
+    driver.set_script_timeout(timeout + 5)
+    start = time.monotonic()
+    try:
+        settled = bool(driver.execute_async_script(script, *args))
+    except Exception as e:
+        logging.warning(f"Readiness wait '{step}' failed: {e}")
+        settled = False
+    elapsed = time.monotonic() - start
+    if timings is not None:
+        timings.record(step, elapsed, settled)
+    return elapsed
+
+
+def wait_for_dom_quiet(driver, step, timings=None, quiet_ms=250, timeout=10):
+    """
+    Returns once the DOM has had no mutations for `quiet_ms` milliseconds.
+
+    Returns:
+        float: Seconds spent waiting.
+    """
+    return _run(driver, step, timings, timeout, DOM_QUIET_SCRIPT, quiet_ms, int(timeout * 1000))
+
+
+def wait_for_stable_count(driver, xpath, step, timings=None, stable_ms=250, timeout=10):
+    """
+    Returns once `xpath` matches at least one node and the number of matches
+    has stayed the same for `stable_ms` milliseconds.
+
+    Returns:
+        float: Seconds spent waiting.
+    """
+    return _run(driver, step, timings, timeout, STABLE_COUNT_SCRIPT, xpath, stable_ms, int(timeout * 1000))
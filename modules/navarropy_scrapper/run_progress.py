@@ -0,0 +1,192 @@
+import argparse
+import logging
+import sqlite3
+import time
+
+# Per-run URL progress for link_collector.py.py, kept in urls.db so a run that
+# dies halfway (Chrome crash, killed process) can be resumed.
+#
+# Every URL of a run gets a run_progress row that moves
+#   pending -> in_progress -> done | failed
+# claim() hands out the next pending URL inside an IMMEDIATE transaction, so
+# concurrent workers never get the same one. A URL only becomes done after its
+# records are in the NDJSON output, together with the output's size at that
+# point (sink_offset); on --resume the output is cut back to the last done
+# URL's offset, so records of a URL that was being written when the process
+# died are scraped again rather than duplicated. Failed URLs are retried at
+# the end of the pass until they reach max_attempts.
+#
+#   python run_progress.py [--db urls.db]            # recent runs
+#   python run_progress.py 1725000000 [--db urls.db] # one run, with its failures
+
+STATUSES = ('pending', 'in_progress', 'done', 'failed')
+
+
+class RunProgress:
+    """
+    Parameters:
+        run_epoch (int): The run the progress rows belong to.
+        db_path (str): Path to the SQLite database file.
+        clock (callable): Wall-clock time source for started/finished times.
+    """
+
+    def __init__(self, run_epoch, db_path='urls.db', clock=time.time):
+        self.run_epoch = run_epoch
+        self.clock = clock
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS run_progress (
+                                 run_epoch INTEGER NOT NULL,
+                                 url TEXT NOT NULL,
+                                 status TEXT NOT NULL DEFAULT 'pending',
+                                 attempts INTEGER NOT NULL DEFAULT 0,
+                                 worker INTEGER,
+                                 started_at REAL,
+                                 finished_at REAL,
+                                 duration REAL NOT NULL DEFAULT 0,
+                                 records INTEGER,
+                                 sink_offset INTEGER,
+                                 error TEXT,
+                                 PRIMARY KEY (run_epoch, url))''')
+
+    def add(self, urls):
+        """Registers the run's URLs as pending; URLs already registered are left alone."""
+        with self.conn:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR IGNORE INTO run_progress (run_epoch, url) VALUES (?, ?)',
+                                  [(self.run_epoch, url) for url in urls])
+
+    def claim(self, worker=None):
+        """
+        Atomically claims the next pending URL.
+
+        Returns:
+            str: The claimed URL, or None when nothing is pending.
+        """
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            row = self.conn.execute('SELECT url FROM run_progress WHERE run_epoch=? AND status=? '
+                                    'ORDER BY rowid LIMIT 1', (self.run_epoch, 'pending')).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE run_progress SET status=?, worker=?, attempts=attempts+1, started_at=? '
+                              'WHERE run_epoch=? AND url=?',
+                              ('in_progress', worker, self.clock(), self.run_epoch, row[0]))
+            return row[0]
+
+    def _finish(self, url, status, records=None, sink_offset=None, error=None):
+        now = self.clock()
+        with self.conn:
+            # duration accumulates over attempts, so retries show up as time spent
+            self.conn.execute('UPDATE run_progress SET status=?, finished_at=?, '
+                              'duration=duration + MAX(0, ? - COALESCE(started_at, ?)), '
+                              'records=?, sink_offset=COALESCE(?, sink_offset), error=? '
+                              'WHERE run_epoch=? AND url=?',
+                              (status, now, now, now, records, sink_offset, error, self.run_epoch, url))
+
+    def done(self, url, records, sink_offset=None):
+        """Marks a URL done once its records are written; sink_offset is the output size after them."""
+        self._finish(url, 'done', records, sink_offset)
+
+    def failed(self, url, error):
+        self._finish(url, 'failed', error=str(error)[:500])
+
+    def retry_failed(self, max_attempts):
+        """
+        Re-queues failed URLs that have attempts left.
+
+        Returns:
+            int: How many URLs were re-queued.
+        """
+        with self.conn:
+            return self.conn.execute('UPDATE run_progress SET status=? WHERE run_epoch=? AND status=? AND attempts<?',
+                                     ('pending', self.run_epoch, 'failed', max_attempts)).rowcount
+
+    def resume(self, max_attempts):
+        """
+        Prepares an interrupted run: URLs left in_progress by the dead process
+        and failed URLs with attempts left go back to pending.
+
+        Returns:
+            int: How many URLs were re-queued.
+        """
+        with self.conn:
+            interrupted = self.conn.execute('UPDATE run_progress SET status=? WHERE run_epoch=? AND status=?',
+                                            ('pending', self.run_epoch, 'in_progress')).rowcount
+        return interrupted + self.retry_failed(max_attempts)
+
+    def urls(self):
+        return [row[0] for row in self.conn.execute('SELECT url FROM run_progress WHERE run_epoch=? ORDER BY rowid',
+                                                    (self.run_epoch,))]
+
+    def counts(self):
+        """Number of URLs per status (every status present, zero if unused)."""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, n in self.conn.execute('SELECT status, COUNT(*) FROM run_progress WHERE run_epoch=? '
+                                           'GROUP BY status', (self.run_epoch,)):
+            counts[status] = n
+        return counts
+
+    def sink_offset(self):
+        """Output size after the last URL marked done (0 if none)."""
+        row = self.conn.execute('SELECT MAX(sink_offset) FROM run_progress WHERE run_epoch=? AND status=?',
+                                (self.run_epoch, 'done')).fetchone()
+        return row[0] or 0
+
+    def report(self):
+        counts = self.counts()
+        attempts, duration, records = self.conn.execute(
+            'SELECT COALESCE(SUM(attempts), 0), COALESCE(SUM(duration), 0), COALESCE(SUM(records), 0) '
+            'FROM run_progress WHERE run_epoch=?', (self.run_epoch,)).fetchone()
+        line = (f"Run {self.run_epoch} progress: {counts['done']} done, {counts['failed']} failed, "
+                f"{counts['pending'] + counts['in_progress']} unfinished of {sum(counts.values())} URLs; "
+                f"{attempts} attempts, {duration:.1f}s scraping, {records} records")
+        logging.info(line)
+        print(line)
+        for url, attempts, error in self.conn.execute('SELECT url, attempts, error FROM run_progress '
+                                                      'WHERE run_epoch=? AND status=? ORDER BY rowid',
+                                                      (self.run_epoch, 'failed')):
+            line = f"  Failed after {attempts} attempts: {url} ({error})"
+            logging.info(line)
+            print(line)
+        return counts
+
+    def close(self):
+        self.conn.close()
+
+
+def list_runs(db_path='urls.db', limit=20):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('''SELECT run_epoch, COUNT(*),
+                                      SUM(status = 'done'), SUM(status = 'failed'),
+                                      SUM(status IN ('pending', 'in_progress')), SUM(attempts)
+                               FROM run_progress GROUP BY run_epoch ORDER BY run_epoch DESC LIMIT ?''',
+                            (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shows link_collector run progress from urls.db.")
+    parser.add_argument('run_epoch', type=int, nargs='?', help="Show one run in detail.")
+    parser.add_argument('--db', default='urls.db')
+    args = parser.parse_args(argv)
+
+    if args.run_epoch is not None:
+        progress = RunProgress(args.run_epoch, args.db)
+        progress.report()
+        progress.close()
+        return
+    runs = list_runs(args.db)
+    if not runs:
+        print("No run progress recorded.")
+    for run_epoch, total, done, failed, unfinished, attempts in runs:
+        resume = f"  (resume with --resume {run_epoch})" if unfinished or failed else ""
+        print(f"{run_epoch}: {done}/{total} done, {failed} failed, {unfinished} unfinished, "
+              f"{attempts} attempts{resume}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+import argparse
+import heapq
+import logging
+import math
+import sqlite3
+import time
+
+import numpy as np
+
+import metrics
+import price_engine
+import rate_limiter
+
+# Continuous re-scraping schedule for link_collector.py.py --daemon.
+#
+# Each URL's next visit is derived from what the previous visits saw:
+#   * volatility: EWMA of the relative move in best price and total stock
+#     between visits, divided by sqrt(hours elapsed) so short and long gaps
+#     estimate the same per-sqrt-hour figure (prices move like a random walk)
+#   * listings: items with few listings matter less and get up to twice the
+#     interval
+# The base interval is the time until the expected drift reaches `tolerance`,
+# (tolerance / volatility)^2 hours, clamped to [min_interval, max_interval]:
+# hot items come back every few minutes, flat or illiquid ones hourly. URLs
+# not yet seen twice use min_interval so their volatility is learned quickly.
+# Every interval is then scaled by the same factor (rebalance(), every 50
+# visits) so the summed visit rate of all URLs matches the request budget: an
+# overrun stretches intervals (the schedule never asks for more than the rate
+# limiter allows) and spare budget tightens them, down to min_interval. Visits
+# are also spaced at least 1 / budget seconds apart, so a backlog never bursts.
+#
+# Due times live in a heapq; the state (intervals, volatility, last
+# observation) is persisted to a url_schedule table in urls.db after every
+# visit, so a restarted daemon resumes where it stopped.
+#
+#   python scheduler.py status [--db urls.db]
+#   python scheduler.py simulate [--urls 300] [--hours 12] [--budget 0.5]
+
+DEFAULT_BUDGET = rate_limiter.HOST_POLICIES["www.pathofexile.com"]["rate"]
+
+
+class Scheduler:
+    """
+    Volatility-aware visit schedule for exchange URLs.
+
+    Parameters:
+        db_path (str): SQLite database holding the url_schedule table.
+        budget (float): Global request budget in requests per second.
+        min_interval (float): Shortest revisit interval in seconds.
+        max_interval (float): Longest revisit interval before budget scaling.
+        tolerance (float): Relative drift that triggers a revisit.
+        busy_listings (int): Listing count from which an item counts as fully liquid.
+        alpha (float): EWMA weight of the newest volatility observation.
+        stock_weight (float): Weight of a relative stock move against a price move.
+        clock (callable): Wall-clock time source; replace with sleep for a simulated clock.
+        sleep (callable): Sleep function.
+    """
+
+    def __init__(self, db_path='urls.db', budget=DEFAULT_BUDGET, min_interval=300.0, max_interval=3600.0,
+                 tolerance=0.02, busy_listings=20, alpha=0.3, stock_weight=0.25,
+                 clock=time.time, sleep=time.sleep):
+        self.budget = float(budget)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.tolerance = tolerance
+        self.busy_listings = busy_listings
+        self.alpha = alpha
+        self.stock_weight = stock_weight
+        self.clock = clock
+        self.sleep = sleep
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS url_schedule (
+                                 url TEXT PRIMARY KEY,
+                                 next_due REAL NOT NULL,
+                                 interval REAL NOT NULL,
+                                 last_visit REAL,
+                                 visits INTEGER NOT NULL DEFAULT 0,
+                                 failures INTEGER NOT NULL DEFAULT 0,
+                                 volatility REAL,
+                                 listings INTEGER,
+                                 best_price REAL,
+                                 stock INTEGER)''')
+        self.conn.commit()
+        self.state = {}
+        self.heap = []
+        self.stretch = 1.0
+        self.rebalance_every = 50
+        self._since_rebalance = 0
+        self._next_slot = 0.0
+        self.visits = 0
+        self.failures = 0
+
+    def sync(self, urls):
+        """
+        Loads the persisted schedule for `urls`. New URLs are due now; URLs no
+        longer in the list are dropped from the table.
+        """
+        now = self.clock()
+        wanted = set(urls)
+        columns = ('url', 'next_due', 'interval', 'last_visit', 'visits', 'failures', 'volatility',
+                   'listings', 'best_price', 'stock')
+        rows = self.conn.execute(f'SELECT {", ".join(columns)} FROM url_schedule').fetchall()
+        stale = [(row[0],) for row in rows if row[0] not in wanted]
+        self.state = {row[0]: dict(zip(columns, row)) for row in rows if row[0] in wanted}
+        for url in urls:
+            if url not in self.state:
+                self.state[url] = {"url": url, "next_due": now, "interval": self.min_interval, "last_visit": None,
+                                   "visits": 0, "failures": 0, "volatility": None, "listings": None,
+                                   "best_price": None, "stock": None}
+        with self.conn:
+            self.conn.executemany('DELETE FROM url_schedule WHERE url=?', stale)
+            self.conn.executemany('INSERT OR IGNORE INTO url_schedule (url, next_due, interval) VALUES (?, ?, ?)',
+                                  [(s["url"], s["next_due"], s["interval"]) for s in self.state.values()])
+        self.rebalance()
+        resumed = sum(1 for s in self.state.values() if s["visits"])
+        line = (f"Scheduler: {len(self.state)} URLs ({resumed} resumed, {len(stale)} dropped), "
+                f"budget {self.budget:g} req/s, stretch x{self.stretch:.2f}")
+        logging.info(line)
+        print(line)
+
+    def rebalance(self):
+        """
+        Finds the common factor that makes the summed visit rate of all URLs
+        match the budget, by bisection (URLs pinned at min_interval do not
+        speed up, so the factor is not simply demand / budget), and rebuilds
+        the heap with due times on the new scale.
+        """
+        intervals = np.array([s["interval"] for s in self.state.values()], dtype=np.float64)
+        if not len(intervals) or self.budget <= 0:
+            self.stretch = 1.0
+            return self.stretch
+        floor = np.minimum(intervals, self.min_interval)
+        # Below min_interval / longest interval every URL is pinned at its floor
+        low, high = math.log(self.min_interval / intervals.max()), math.log(1e3)
+        for _ in range(40):
+            mid = (low + high) / 2
+            rate = (1.0 / np.maximum(floor, intervals * math.exp(mid))).sum()
+            low, high = (mid, high) if rate > self.budget else (low, mid)
+        self.stretch = math.exp(high)
+        self._since_rebalance = 0
+        # Move every visited URL's due time to the new scale; failed URLs keep
+        # their backoff
+        for url, state in self.state.items():
+            if state["last_visit"] is not None and not state["failures"]:
+                state["next_due"] = state["last_visit"] + self.effective_interval(state["interval"])
+        self.heap = [(s["next_due"], url) for url, s in self.state.items()]
+        heapq.heapify(self.heap)
+        return self.stretch
+
+    def effective_interval(self, interval):
+        # Spare budget tightens intervals down to min_interval; an overrun
+        # stretches them past max_interval
+        return max(min(self.min_interval, interval), interval * self.stretch)
+
+    def base_interval(self, volatility, listings):
+        if volatility is None:
+            return self.min_interval
+        liquidity = 0.5 + 0.5 * min(1.0, (listings or 0) / self.busy_listings)
+        if volatility <= 0:
+            return self.max_interval
+        seconds = (self.tolerance / volatility) ** 2 * 3600 / liquidity
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def next_url(self):
+        """
+        Returns the soonest-due URL. Visits are also paced to one per
+        1 / budget seconds, so a backlog (e.g. every URL due at start-up) is
+        worked off at the budget rather than in a burst; a zero wait hands
+        out the next slot.
+
+        Returns:
+            tuple: (url, seconds until it may be visited), or (None, 0) with no URLs.
+        """
+        while self.heap:
+            due, url = self.heap[0]
+            state = self.state.get(url)
+            if state is None or state["next_due"] != due:
+                heapq.heappop(self.heap)  # superseded entry
+                continue
+            now = self.clock()
+            wait = max(0.0, due - now, self._next_slot - now)
+            if wait == 0 and self.budget > 0:
+                self._next_slot = now + 1.0 / self.budget
+            return url, wait
+        return None, 0.0
+
+    def _reschedule(self, url, state, interval, next_due):
+        self._since_rebalance += 1
+        if self._since_rebalance >= self.rebalance_every:
+            self.rebalance()
+        state["interval"] = interval
+        state["next_due"] = next_due
+        heapq.heappush(self.heap, (next_due, url))
+        with self.conn:
+            self.conn.execute('''UPDATE url_schedule SET next_due=?, interval=?, last_visit=?, visits=?, failures=?,
+                                     volatility=?, listings=?, best_price=?, stock=? WHERE url=?''',
+                              (next_due, interval, state["last_visit"], state["visits"], state["failures"],
+                               state["volatility"], state["listings"], state["best_price"], state["stock"], url))
+
+    def record(self, url, records):
+        """
+        Updates a URL's volatility from a successful visit and schedules the next one.
+
+        Parameters:
+            url (str): The visited URL.
+            records (list): The listings link_collector extracted for it.
+
+        Returns:
+            float: Seconds until the URL's next visit.
+        """
+        now = self.clock()
+        state = self.state[url]
+        prices = [p for p in (price_engine.parse_rate(r.get("Per-Want")) for r in records) if p > 0]
+        best = min(prices) if prices else None
+        stock = 0
+        for r in records:
+            try:
+                stock += int(r.get("Items in Stock") or 0)
+            except (TypeError, ValueError):
+                pass
+
+        if state["last_visit"] is not None:
+            hours = max(now - state["last_visit"], 60.0) / 3600
+            move = 0.0
+            if best and state["best_price"]:
+                move += abs(math.log(best / state["best_price"]))
+            if state["stock"] is not None:
+                move += self.stock_weight * abs(stock - state["stock"]) / max(stock, state["stock"], 1)
+            observed = move / math.sqrt(hours)
+            previous = state["volatility"]
+            state["volatility"] = observed if previous is None else self.alpha * observed + (1 - self.alpha) * previous
+
+        state["last_visit"] = now
+        state["visits"] += 1
+        state["failures"] = 0
+        state["listings"] = len(records)
+        state["best_price"] = best if best else state["best_price"]
+        state["stock"] = stock
+        self.visits += 1
+        interval = self.base_interval(state["volatility"], state["listings"])
+        self._reschedule(url, state, interval, now + self.effective_interval(interval))
+        return self.effective_interval(interval)
+
+    def record_failure(self, url):
+        """Backs a failed URL off exponentially, up to max_interval; its volatility is kept."""
+        now = self.clock()
+        state = self.state[url]
+        state["failures"] += 1
+        self.failures += 1
+        delay = min(self.max_interval, self.min_interval * 2 ** (state["failures"] - 1))
+        self._reschedule(url, state, state["interval"], now + delay)
+        return delay
+
+    def freshness(self):
+        """
+        Coverage and freshness of the schedule right now.
+
+        Returns:
+            dict: urls, coverage (share of URLs visited within max_interval),
+                never_visited, overdue (due more than min_interval ago),
+                age_p50/age_p95/age_max in seconds since the last visit,
+                planned_rate (requests/sec the schedule asks for), budget,
+                stretch, visits and failures.
+        """
+        now = self.clock()
+        ages = np.array([now - s["last_visit"] for s in self.state.values() if s["last_visit"] is not None])
+        total = len(self.state)
+        return {
+            "urls": total,
+            "coverage": float((ages <= self.max_interval).sum() / total) if total else 0.0,
+            "never_visited": total - len(ages),
+            "overdue": sum(1 for s in self.state.values() if now - s["next_due"] > self.min_interval),
+            "age_p50": float(np.percentile(ages, 50)) if len(ages) else 0.0,
+            "age_p95": float(np.percentile(ages, 95)) if len(ages) else 0.0,
+            "age_max": float(ages.max()) if len(ages) else 0.0,
+            "planned_rate": sum(1.0 / self.effective_interval(s["interval"]) for s in self.state.values()),
+            "budget": self.budget,
+            "stretch": self.stretch,
+            "visits": self.visits,
+            "failures": self.failures,
+        }
+
+    def publish(self, run_metrics):
+        """Copies freshness() into gauges on a RunMetrics, prefixed scheduler_."""
+        for name, value in self.freshness().items():
+            run_metrics.set_gauge(f"scheduler_{name}", value)
+
+    def report(self):
+        f = self.freshness()
+        line = (f"Scheduler: {f['visits']} visits, {f['failures']} failures; coverage {f['coverage'] * 100:.1f}% "
+                f"within {self.max_interval / 60:g} min, age p50 {f['age_p50'] / 60:.1f} min / "
+                f"p95 {f['age_p95'] / 60:.1f} min, {f['overdue']} overdue, "
+                f"planned {f['planned_rate']:.3f} of {f['budget']:g} req/s (stretch x{f['stretch']:.2f})")
+        logging.info(line)
+        print(line)
+
+    def close(self):
+        self.conn.close()
+
+
+def run_daemon(scheduler, scrape_url, write_result, stop=lambda: False, on_visit=None):
+    """
+    Visits URLs as they come due until stop() returns True.
+
+    Parameters:
+        scheduler (Scheduler): A synced scheduler.
+        scrape_url (callable): url -> list of records; may raise.
+        write_result (callable): (url, records) -> None, called after each visit; may raise.
+        stop (callable): Checked before every visit.
+        on_visit (callable): Called with the URL after every visit (e.g. to publish metrics).
+    """
+    while not stop():
+        url, wait = scheduler.next_url()
+        if url is None:
+            return
+        if wait > 0:
+            scheduler.sleep(wait)
+            continue  # re-check stop() and the heap after sleeping
+        try:
+            data = scrape_url(url)
+            # a failed write (disk full, locked database) backs the URL off like a failed scrape
+            write_result(url, data)
+        except Exception as e:
+            delay = scheduler.record_failure(url)
+            logging.error(f"Failed to process URL {url}: {e} (retrying in {delay / 60:.1f} min)")
+            print(f"Failed to process URL {url}: {e} (retrying in {delay / 60:.1f} min)")
+        else:
+            scheduler.record(url, data)
+        if on_visit is not None:
+            on_visit(url)
+
+
+class SimClock:
+    """Simulated time: sleep() advances time() instantly."""
+
+    def __init__(self, start=0.0):
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+# Synthetic workload classes: (share of URLs, volatility per sqrt(hour), listings)
+WORKLOAD = {
+    "hot": (0.2, 0.10, 60),
+    "active": (0.3, 0.03, 25),
+    "quiet": (0.3, 0.008, 8),
+    "illiquid": (0.2, 0.004, 2),
+}
+
+
+def make_workload(n_urls, hours, seed=42, step=60):
+    """
+    Synthetic price and stock paths: a log-price random walk per URL on a
+    `step`-second grid, with each URL's volatility taken from its WORKLOAD class.
+
+    Returns:
+        tuple: (urls, classes, listings, log_price[url, step], stock[url, step])
+    """
+    rng = np.random.default_rng(seed)
+    names = list(WORKLOAD)
+    shares = np.array([WORKLOAD[n][0] for n in names])
+    classes = rng.choice(len(names), size=n_urls, p=shares / shares.sum())
+    sigma = np.array([WORKLOAD[names[c]][1] for c in classes])
+    listings = np.array([WORKLOAD[names[c]][2] for c in classes])
+    steps = int(hours * 3600 / step) + 1
+    scale = (sigma * math.sqrt(step / 3600))[:, None]
+    log_price = np.log(rng.uniform(5, 500, size=(n_urls, 1))) + np.cumsum(
+        rng.standard_normal((n_urls, steps)) * scale, axis=1)
+    stock = np.maximum(0, np.round(listings[:, None] * 10 * np.exp(np.cumsum(
+        rng.standard_normal((n_urls, steps)) * scale, axis=1)))).astype(np.int64)
+    urls = [f"https://www.pathofexile.com/trade/exchange/Standard/sim{i}" for i in range(n_urls)]
+    return urls, [names[c] for c in classes], listings, log_price, stock
+
+
+def simulate(n_urls=300, hours=12.0, budget=DEFAULT_BUDGET, request_seconds=2.0, seed=42, **scheduler_options):
+    """
+    Runs the daemon loop against a synthetic volatility workload on a
+    simulated clock, and a round-robin pass at the same request budget for
+    comparison.
+
+    Returns:
+        dict: Per-class visit intervals and price error for both strategies,
+            plus the scheduler's final freshness().
+    """
+    step = 60
+    tolerance = scheduler_options.get("tolerance", 0.02)
+    urls, classes, listings, log_price, stock = make_workload(n_urls, hours, seed, step)
+    end = hours * 3600
+    index = {url: i for i, url in enumerate(urls)}
+
+    def run(strategy):
+        clock = SimClock()
+        limiter = rate_limiter.RateLimiter(policies={"www.pathofexile.com": {"rate": budget, "capacity": 1}},
+                                           clock=clock.time, sleep=clock.sleep)
+        visits = [[] for _ in urls]
+
+        def scrape(url):
+            limiter.acquire(url)
+            clock.sleep(request_seconds)
+            i = index[url]
+            t = min(int(clock.time() // step), log_price.shape[1] - 1)
+            visits[i].append(t)
+            price = math.exp(log_price[i, t])
+            per_listing = int(stock[i, t] // max(listings[i], 1))
+            return [{"URL": url, "Profile Link": f"seller{k}", "Items in Stock": per_listing,
+                     "Per-Want": f"1x Divine Orb ⇒ {price * (1 + 0.01 * k):.6f}x Chaos Orb"}
+                    for k in range(listings[i])]
+
+        scheduler = None
+        if strategy == 'scheduler':
+            scheduler = Scheduler(':memory:', budget=budget, clock=clock.time, sleep=clock.sleep, **scheduler_options)
+            scheduler.sync(urls)
+            run_daemon(scheduler, scrape, lambda url, data: None, stop=lambda: clock.time() >= end)
+        else:
+            while clock.time() < end:
+                for url in urls:
+                    if clock.time() >= end:
+                        break
+                    scrape(url)
+
+        # Time-averaged error of the last scraped price against the true price
+        errors = np.full(len(urls), np.nan)
+        stale = np.full(len(urls), np.nan)
+        intervals = np.full(len(urls), np.nan)
+        for i, seen in enumerate(visits):
+            if not seen:
+                continue
+            known = np.full(log_price.shape[1], np.nan)
+            known[seen] = log_price[i, seen]
+            first = seen[0]
+            filled = np.maximum.accumulate(np.where(np.isnan(known), 0, np.arange(len(known))))
+            error = np.abs(log_price[i, first:] - log_price[i, filled[first:]])
+            errors[i] = error.mean()
+            stale[i] = (error > tolerance).mean()
+            intervals[i] = (seen[-1] - seen[0]) * step / (len(seen) - 1) if len(seen) > 1 else np.nan
+        return {"visits": sum(len(v) for v in visits), "errors": errors, "stale": stale, "intervals": intervals,
+                "freshness": scheduler.freshness() if scheduler else None, "scheduler": scheduler}
+
+    results = {strategy: run(strategy) for strategy in ('round-robin', 'scheduler')}
+    summary = {"hours": hours, "urls": n_urls, "budget": budget, "tolerance": tolerance, "classes": {}}
+    for name in WORKLOAD:
+        mask = np.array([c == name for c in classes])
+        summary["classes"][name] = {
+            strategy: {"urls": int(mask.sum()),
+                       "interval_min": float(np.nanmean(r["intervals"][mask]) / 60) if mask.any() else 0.0,
+                       "error_pct": float(np.nanmean(r["errors"][mask]) * 100) if mask.any() else 0.0,
+                       "stale_pct": float(np.nanmean(r["stale"][mask]) * 100) if mask.any() else 0.0}
+            for strategy, r in results.items()
+        }
+    for strategy, r in results.items():
+        summary[strategy] = {"visits": r["visits"], "error_pct": float(np.nanmean(r["errors"]) * 100),
+                             "stale_pct": float(np.nanmean(r["stale"]) * 100)}
+    summary["freshness"] = results["scheduler"]["freshness"]
+    results["scheduler"]["scheduler"].close()
+    return summary
+
+
+def print_simulation(summary):
+    lines = [f"Simulated {summary['hours']:g} h, {summary['urls']} URLs, budget {summary['budget']:g} req/s",
+             f"  error: mean |log(scraped / true price)|; stale: share of time off by more than "
+             f"{summary['tolerance'] * 100:g}%",
+             f"  {'class':>9} {'urls':>5} | {'round-robin':>29} | {'scheduler':>29}",
+             f"  {'':>9} {'':>5} | {'interval':>10} {'error':>8} {'stale':>8} | {'interval':>10} {'error':>8} {'stale':>8}"]
+    for name, row in summary["classes"].items():
+        rr, sc = row["round-robin"], row["scheduler"]
+        lines.append(f"  {name:>9} {rr['urls']:>5} | {rr['interval_min']:6.1f} min {rr['error_pct']:7.2f}% "
+                     f"{rr['stale_pct']:7.1f}% | {sc['interval_min']:6.1f} min {sc['error_pct']:7.2f}% "
+                     f"{sc['stale_pct']:7.1f}%")
+    for strategy in ('round-robin', 'scheduler'):
+        s = summary[strategy]
+        lines.append(f"  {strategy}: {s['visits']} visits, mean price error {s['error_pct']:.2f}%, "
+                     f"stale {s['stale_pct']:.1f}% of the time")
+    f = summary["freshness"]
+    lines.append(f"  scheduler freshness: coverage {f['coverage'] * 100:.1f}%, age p50 {f['age_p50'] / 60:.1f} min, "
+                 f"p95 {f['age_p95'] / 60:.1f} min, {f['overdue']} overdue, stretch x{f['stretch']:.2f}")
+    for line in lines:
+        logging.info(line)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspects or simulates the link_collector --daemon schedule.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_status = sub.add_parser('status', help="Show the persisted schedule in urls.db.")
+    p_status.add_argument('--db', default='urls.db')
+    p_status.add_argument('--top', type=int, default=20, help="How many of the soonest-due URLs to list.")
+
+    p_sim = sub.add_parser('simulate', help="Compare against round-robin on a synthetic workload and a simulated clock.")
+    p_sim.add_argument('--urls', type=int, default=300)
+    p_sim.add_argument('--hours', type=float, default=12.0)
+    p_sim.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="Requests per second.")
+    p_sim.add_argument('--request-seconds', type=float, default=2.0, help="Simulated time per scrape.")
+    p_sim.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args(argv)
+    if args.command == 'simulate':
+        start = time.perf_counter()
+        summary = simulate(args.urls, args.hours, args.budget, args.request_seconds, args.seed)
+        print_simulation(summary)
+        print(f"  ({time.perf_counter() - start:.1f}s wall time)")
+        return
+
+    scheduler = Scheduler(args.db)
+    urls = [row[0] for row in scheduler.conn.execute('SELECT url FROM url_schedule')]
+    scheduler.sync(urls)
+    scheduler.report()
+    now = scheduler.clock()
+    for state in sorted(scheduler.state.values(), key=lambda s: s["next_due"])[:args.top]:
+        volatility = "-" if state["volatility"] is None else f"{state['volatility']:.4f}"
+        print(f"  due in {(state['next_due'] - now) / 60:7.1f} min, every {state['interval'] / 60:5.1f} min, "
+              f"volatility {volatility:>7}, {state['listings'] or 0:>3} listings: {state['url']}")
+    scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
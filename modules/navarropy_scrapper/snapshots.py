@@ -0,0 +1,82 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+
+# Compressed page_source snapshots of exchange pages.
+#
+# link_collector.py.py --snapshot-dir saves the rendered HTML of every URL it
+# scrapes so extraction can be re-run offline (html_extract.py) without
+# Chrome. Layout:
+#   <snapshot_dir>/<run_epoch>/<sha1(url)[:16]>.html.gz
+#   <snapshot_dir>/<run_epoch>/index.ndjson   one {"url", "file", "captured_at"} per page
+
+INDEX_NAME = 'index.ndjson'
+
+
+def snapshot_name(url):
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.html.gz"
+
+
+class SnapshotStore:
+    """
+    Parameters:
+        snapshot_dir (str): Root directory for snapshots.
+        run_epoch (int): The run the snapshots belong to.
+        compresslevel (int): gzip level; 6 keeps saving cheap next to page loads.
+    """
+
+    def __init__(self, snapshot_dir, run_epoch, compresslevel=6):
+        self.run_dir = os.path.join(snapshot_dir, str(run_epoch))
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.compresslevel = compresslevel
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def save(self, url, html):
+        """Writes one page's HTML and records it in the run index."""
+        name = snapshot_name(url)
+        path = os.path.join(self.run_dir, name)
+        data = html.encode('utf-8')
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=self.compresslevel) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        line = json.dumps({"url": url, "file": name, "captured_at": time.time()}, ensure_ascii=False)
+        with self.lock:
+            with open(os.path.join(self.run_dir, INDEX_NAME), 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            self.saved += 1
+            self.raw_bytes += len(data)
+            self.stored_bytes += os.path.getsize(path)
+        return path
+
+    def report(self):
+        ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+        return (f"Saved {self.saved} snapshots to {os.path.abspath(self.run_dir)} "
+                f"({self.raw_bytes / 1048576:.1f} MB -> {self.stored_bytes / 1048576:.1f} MB, {ratio:.1f}x)")
+
+
+def iter_snapshots(run_dir):
+    """
+    Yields (url, path) for every snapshot in a run directory, in capture order.
+    A URL captured more than once keeps its last capture.
+    """
+    entries = {}
+    with open(os.path.join(run_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.pop(entry["url"], None)
+                entries[entry["url"]] = os.path.join(run_dir, entry["file"])
+    yield from entries.items()
+
+
+def read_snapshot(path):
+    with gzip.open(path, 'rb') as f:
+        return f.read().decode('utf-8')
@@ -0,0 +1,132 @@
+import logging
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import run_progress
+
+# Concurrent URL processing for link_collector.py.py.
+#
+# The run's URLs are in the run_progress table in urls.db (see
+# run_progress.py) and each worker thread claims the next pending row inside
+# an IMMEDIATE transaction, so two workers never get the same URL. Every
+# worker drives its own Chrome instance on a throwaway profile directory;
+# scraped records are handed to one writer (the calling thread) over an
+# in-memory queue, and a URL is only marked done once the writer has
+# persisted it.
+
+_DONE = object()
+
+
+class WorkerStats:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.processed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def urls_per_minute(self):
+        return self.processed / self.elapsed * 60 if self.elapsed else 0.0
+
+
+def _worker(worker_id, run_epoch, db_path, make_driver, scrape_url, results, stats):
+    profile_dir = tempfile.mkdtemp(prefix=f'link_collector_worker{worker_id}_')
+    progress = run_progress.RunProgress(run_epoch, db_path)
+    driver = None
+    start = time.monotonic()
+    try:
+        driver = make_driver(profile_dir)
+        if driver is None:
+            logging.error(f"Worker {worker_id}: WebDriver failed to start.")
+            return
+        while True:
+            url = progress.claim(worker_id)
+            if url is None:
+                break
+            try:
+                data = scrape_url(driver, url)
+                results.put((worker_id, url, data))
+                stats.processed += 1
+            except Exception as e:
+                logging.error(f"Worker {worker_id}: failed to process URL {url}: {e}")
+                print(f"Worker {worker_id}: failed to process URL {url}: {e}")
+                progress.failed(url, e)
+                stats.failed += 1
+    finally:
+        stats.elapsed = time.monotonic() - start
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.error(f"Worker {worker_id}: failed to close WebDriver: {e}")
+        progress.close()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        results.put(_DONE)
+
+
+def run_pool(run_epoch, make_driver, scrape_url, write_result, workers=4, db_path='urls.db'):
+    """
+    Processes a run's pending URLs with N browser workers and a single result writer.
+
+    Parameters:
+        run_epoch (int): Identifies this run's rows in run_progress; the URLs must already be added.
+        make_driver (callable): profile_dir -> WebDriver, one call per worker.
+        scrape_url (callable): (driver, url) -> list of records.
+        write_result (callable): (url, records) -> output size after the write (or None),
+            only ever called from this thread.
+        workers (int): Number of concurrent browsers.
+        db_path (str): Path to the SQLite database holding run_progress.
+
+    Returns:
+        list: One WorkerStats per worker.
+    """
+    progress = run_progress.RunProgress(run_epoch, db_path)
+    results = queue.Queue(maxsize=workers * 4)
+    stats = [WorkerStats(n) for n in range(1, workers + 1)]
+    threads = [
+        threading.Thread(target=_worker, name=f'link_collector_worker{s.worker_id}',
+                         args=(s.worker_id, run_epoch, db_path, make_driver, scrape_url, results, s),
+                         daemon=True)
+        for s in stats
+    ]
+
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+
+    # Single writer: drain results here until every worker has signalled completion.
+    remaining = len(threads)
+    while remaining:
+        item = results.get()
+        if item is _DONE:
+            remaining -= 1
+            continue
+        worker_id, url, data = item
+        try:
+            progress.done(url, len(data), write_result(url, data))
+        except Exception as e:
+            logging.error(f"Failed to write results for URL {url}: {e}")
+            print(f"Failed to write results for URL {url}: {e}")
+            progress.failed(url, e)
+
+    for t in threads:
+        t.join()
+    progress.close()
+    report_throughput(stats, time.monotonic() - start)
+    return stats
+
+
+def report_throughput(stats, wall_time):
+    for s in stats:
+        line = (f"Worker {s.worker_id}: {s.processed} URLs ({s.failed} failed) in {s.elapsed:.1f}s "
+                f"- {s.urls_per_minute:.2f} URLs/min")
+        logging.info(line)
+        print(line)
+    total = sum(s.processed for s in stats)
+    rate = total / wall_time * 60 if wall_time else 0.0
+    line = f"Total: {total} URLs with {len(stats)} workers in {wall_time:.1f}s - {rate:.2f} URLs/min"
+    logging.info(line)
+    print(line)
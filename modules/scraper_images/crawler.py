@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from urllib.parse import unquote, urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+# Concurrent poewiki category crawler.
+#
+# Walks a category and all of its subcategories (CategoryTreeLabel links) with
+# one pooled aiohttp session. Every page is fetched exactly once, at most
+# `concurrency` requests are in flight overall and at most `per_host` to any
+# single host, and failed fetches are retried with exponential backoff.
+# Image names are extracted exactly like get_image_names() in the original
+# scrapers; crawl_image_names(url, max_depth=1) visits the same pages they did.
+
+BASE_URL = "https://www.poewiki.net"
+USER_AGENT = "poe.coffee-backend/1.0 (+https://github.com/benjamin-mcdaniel/poe.coffee.backend)"
+
+
+def parse_image_names(html):
+    """Returns the decoded file name of every <img src> on a page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    images = []
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        if src:
+            images.append(unquote(src.split('/')[-1]))
+    return images
+
+
+def parse_subcategories(html, base_url=BASE_URL):
+    """Returns absolute URLs of the subcategories listed on a category page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    subcategories = []
+    for subcat in soup.find_all('a', class_='CategoryTreeLabel'):
+        href = subcat.get('href')
+        if href:
+            subcategories.append(f"{base_url}{href}")
+    return subcategories
+
+
+class CategoryCrawler:
+    """
+    Parameters:
+        base_url (str): Prefix for relative subcategory links.
+        concurrency (int): Maximum requests in flight overall.
+        per_host (int): Maximum requests in flight to one host.
+        retries (int): Extra attempts for a failed fetch.
+        backoff (float): Delay before the first retry in seconds, doubled per attempt.
+        timeout (float): Total timeout per request in seconds.
+        max_depth (int): Subcategory levels to follow; None for the whole tree.
+        cache (HttpCache): Optional on-disk cache; fresh pages are read locally
+            and stale ones revalidated with conditional requests.
+    """
+
+    def __init__(self, base_url=BASE_URL, concurrency=8, per_host=4, retries=3, timeout=30, max_depth=None,
+                 cache=None, backoff=0.5):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_depth = max_depth
+        self.cache = cache
+        self.pages_fetched = 0
+        self.failed = []
+        self._host_limits = {}
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, session, url):
+        """Fetches a page, retrying timeouts, connection errors and 429/5xx responses."""
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            return self.cache.hit(entry).decode('utf-8', errors='replace')
+        headers = self.cache.conditional_headers(entry) if self.cache is not None else {}
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._host_limit(url):
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 304:
+                            body = self.cache.revalidated(entry, response.headers) if self.cache else None
+                            if body is None:
+                                # nothing cached behind the validators any more: retry unconditionally
+                                headers, entry = {}, None
+                                raise aiohttp.ClientPayloadError(f"304 for {url} with no cached body")
+                        else:
+                            if response.status == 429 or response.status >= 500:
+                                raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                                  status=response.status)
+                            response.raise_for_status()
+                            body = await response.read()
+                            if self.cache is not None:
+                                self.cache.store(url, body, response.headers)
+                        charset = response.charset or 'utf-8'
+                self.pages_fetched += 1
+                return body.decode(charset, errors='replace')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, 'status', None)
+                if attempt == self.retries or (status is not None and status < 500 and status != 429):
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning(f"Fetch failed for {url} ({e}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+    async def crawl(self, root_url):
+        """
+        Crawls root_url and its subcategory tree.
+
+        Returns:
+            dict: page URL -> (depth, discovery order, list of image names).
+        """
+        pages = {}
+        seen = {root_url}
+        queue = asyncio.Queue()
+        queue.put_nowait((root_url, 0, 0))
+        order = [0]
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": USER_AGENT}) as session:
+            async def worker():
+                while True:
+                    url, depth, position = await queue.get()
+                    try:
+                        html = await self.fetch(session, url)
+                        pages[url] = (depth, position, parse_image_names(html))
+                        if self.max_depth is None or depth < self.max_depth:
+                            for sub in parse_subcategories(html, self.base_url):
+                                if sub not in seen:
+                                    seen.add(sub)
+                                    order[0] += 1
+                                    queue.put_nowait((sub, depth + 1, order[0]))
+                    except Exception as e:
+                        logging.error(f"Failed to crawl {url}: {e}")
+                        self.failed.append(url)
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            await queue.join()
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return pages
+
+    async def crawl_image_names(self, root_url):
+        """Returns the unique image names of the tree, root page first, breadth-first."""
+        pages = await self.crawl(root_url)
+        names = []
+        seen = set()
+        for _, _, page_names in sorted(pages.values(), key=lambda p: (p[0], p[1])):
+            for name in page_names:
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        return names
+
+
+def crawl_image_names(root_url, **kwargs):
+    """Synchronous entry point: crawls a category tree and returns its image names."""
+    crawler = CategoryCrawler(**kwargs)
+    names = asyncio.run(crawler.crawl_image_names(root_url))
+    logging.info(f"Crawled {crawler.pages_fetched} pages ({len(crawler.failed)} failed), {len(names)} images.")
+    return names
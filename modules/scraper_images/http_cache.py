@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from email.utils import formatdate
+
+import requests
+
+# Shared on-disk HTTP cache for the poewiki scrapers.
+#
+# Bodies are stored content-addressed under <cache_dir>/objects/<sha256>, so
+# identical responses are kept once; an SQLite index maps each URL to its body
+# hash plus the validators (ETag / Last-Modified) it was served with. Within
+# `ttl` seconds a cached URL is served locally; after that it is revalidated
+# with If-None-Match / If-Modified-Since and a 304 refreshes the entry without
+# a body. The store is bounded to `max_bytes` by evicting least recently used
+# entries. Used by CachedSession (requests) and CategoryCrawler (aiohttp).
+
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+'''
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def __str__(self):
+        return (f"{self.hits} hits, {self.revalidated} revalidated (304), {self.misses} misses, "
+                f"{self.bytes_saved} bytes saved")
+
+
+class HttpCache:
+    """
+    Parameters:
+        cache_dir (str): Directory holding index.db and objects/.
+        ttl (float): Seconds a cached response is used without revalidation.
+        max_bytes (int): Upper bound on stored body bytes.
+    """
+
+    def __init__(self, cache_dir='.http_cache', ttl=3600, max_bytes=256 * 1024 * 1024, clock=time.time):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CacheStats()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(INDEX_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def lookup(self, url):
+        """Returns the index row for url as a dict, or None."""
+        row = self.conn.execute('SELECT url, digest, size, etag, last_modified, content_type, fetched_at '
+                                'FROM entries WHERE url=?', (url,)).fetchone()
+        if row is None or not os.path.exists(self._object_path(row[1])):
+            return None
+        keys = ('url', 'digest', 'size', 'etag', 'last_modified', 'content_type', 'fetched_at')
+        return dict(zip(keys, row))
+
+    def is_fresh(self, entry):
+        return entry is not None and self.clock() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        elif not entry['etag']:
+            headers['If-Modified-Since'] = formatdate(entry['fetched_at'], usegmt=True)
+        return headers
+
+    def read(self, entry):
+        """Reads a cached body and records the access for LRU eviction; None if the body is gone."""
+        try:
+            with open(self._object_path(entry['digest']), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            with self.conn:
+                self.conn.execute('DELETE FROM entries WHERE url=?', (entry['url'],))
+            return None
+        with self.conn:
+            self.conn.execute('UPDATE entries SET accessed_at=? WHERE url=?', (self.clock(), entry['url']))
+        return body
+
+    def hit(self, entry):
+        """Serves a fresh entry without touching the network."""
+        self.stats.hits += 1
+        self.stats.bytes_saved += entry['size']
+        return self.read(entry)
+
+    def revalidated(self, entry, headers=None):
+        """
+        Handles a 304: refreshes the entry's age (and validators) and returns
+        the cached body, or None if there is no body to fall back on (the
+        caller then has to fetch the URL again without validators).
+        """
+        if entry is None:
+            return None
+        headers = headers or {}
+        with self.conn:
+            self.conn.execute('UPDATE entries SET fetched_at=?, etag=COALESCE(?, etag), '
+                              'last_modified=COALESCE(?, last_modified) WHERE url=?',
+                              (self.clock(), headers.get('ETag'), headers.get('Last-Modified'), entry['url']))
+        body = self.read(entry)
+        if body is not None:
+            self.stats.revalidated += 1
+            self.stats.bytes_saved += entry['size']
+        return body
+
+    def store(self, url, body, headers=None):
+        """Stores a 200 response body for url; bodies larger than max_bytes are not cached."""
+        headers = headers or {}
+        self.stats.misses += 1
+        if len(body) > self.max_bytes:
+            # evicting it straight away would leave validators without a body
+            with self.conn:
+                self.conn.execute('DELETE FROM entries WHERE url=?', (url,))
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        now = self.clock()
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                              (url, digest, len(body), headers.get('ETag'), headers.get('Last-Modified'),
+                               headers.get('Content-Type'), now, now))
+        self.evict(keep=url)
+
+    def evict(self, keep=None):
+        """Drops least recently used entries (except `keep`) until stored bytes fit max_bytes."""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, digest, size in self.conn.execute('SELECT url, digest, size FROM entries WHERE url IS NOT ? '
+                                                   'ORDER BY accessed_at', (keep,)).fetchall():
+            with self.conn:
+                self.conn.execute('DELETE FROM entries WHERE url=?', (url,))
+            if not self.conn.execute('SELECT 1 FROM entries WHERE digest=? LIMIT 1', (digest,)).fetchone():
+                try:
+                    os.remove(self._object_path(digest))
+                except OSError:
+                    pass
+                total -= size
+            if total <= self.max_bytes:
+                break
+
+    def report(self):
+        logging.info(f"HTTP cache: {self.stats}")
+        print(f"HTTP cache: {self.stats}")
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session whose GETs go through an HttpCache. Fresh entries are
+    served without a request; stale ones are revalidated conditionally.
+    """
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def _from_cache(self, url, entry, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.headers['Content-Type'] = entry['content_type'] or ''
+        if entry['etag']:
+            response.headers['ETag'] = entry['etag']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != 'GET':
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        entry = self.cache.lookup(full_url)
+        if self.cache.is_fresh(entry):
+            return self._from_cache(full_url, entry, self.cache.hit(entry))
+
+        conditional = dict(headers or {}, **self.cache.conditional_headers(entry))
+        response = super().request(method, full_url, headers=conditional, **kwargs)
+        if response.status_code == 304:
+            body = self.cache.revalidated(entry, response.headers)
+            if body is not None:
+                return self._from_cache(full_url, entry, body)
+            # nothing cached behind the validators any more: ask for the full body
+            response = super().request(method, full_url, headers=headers, **kwargs)
+        if response.status_code == 200:
+            self.cache.store(full_url, response.content, response.headers)
+        return response
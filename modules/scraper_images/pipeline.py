@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import asyncio
+import shutil
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+from PIL import Image
+
+import wiki_api
+from crawler import USER_AGENT
+
+# Icon download and thumbnail pipeline for the poe.coffee frontend.
+#
+#   discover (api.php) -> bounded download queue (aiohttp, streamed chunks,
+#   sha256 while writing) -> content-hash dedupe -> ProcessPoolExecutor encode
+#   (resized WebP variants)
+#
+# Output layout under --out:
+#   originals/<sha256>.<ext>         one copy per distinct image content
+#   webp/<size>/<name>.webp          one per requested size ('full' = original size);
+#                                    <name> keeps its extension (Foo.png.webp), so
+#                                    Foo.png and Foo.gif do not overwrite each other
+#   manifest.json                    name -> wiki sha1, content sha256, variants
+# The manifest makes runs resumable: it is saved (atomically) every save_every
+# finished files or save_interval seconds, and files whose wiki sha1 is unchanged
+# and whose variants exist are skipped without a request, and identical content is only
+# encoded once: a name whose bytes were already encoded gets hard links (copies
+# where links are not supported) to the existing variants, so every name can be
+# looked up by path. Variants are replaced, never rewritten in place, so
+# re-encoding one name leaves the files linked to other names intact.
+#
+#   python pipeline.py https://www.poewiki.net/wiki/Category:Amulet_icons --out icons
+
+CHUNK_SIZE = 64 * 1024
+
+
+def variant_path(name, label):
+    """Output path of one variant, relative to the output directory."""
+    return os.path.join('webp', label, f"{name}.webp")
+
+
+def encode_variants(original_path, name, out_dir, sizes):
+    """
+    Writes WebP variants of one image. Runs in a worker process.
+
+    Returns:
+        dict: size label -> output path relative to out_dir.
+    """
+    variants = {}
+    with Image.open(original_path) as img:
+        img = img.convert('RGBA')
+        for size in sizes:
+            label = str(size)
+            if size == 'full':
+                variant = img
+            else:
+                variant = img.copy()
+                variant.thumbnail((int(size), int(size)), Image.LANCZOS)
+            rel_path = variant_path(name, label)
+            path = os.path.join(out_dir, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            variant.save(path + '.tmp', 'WEBP', quality=85, method=4)
+            os.replace(path + '.tmp', path)
+            variants[label] = rel_path
+    return variants
+
+
+def link_variants(variants, name, out_dir):
+    """
+    Makes another name's variants available under `name`.
+
+    Returns:
+        dict: size label -> output path relative to out_dir.
+    """
+    linked = {}
+    for label, rel_source in variants.items():
+        rel_path = variant_path(name, label)
+        if rel_path != rel_source:
+            source = os.path.join(out_dir, rel_source)
+            path = os.path.join(out_dir, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(source, path + '.tmp')
+            except OSError:
+                shutil.copyfile(source, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        linked[label] = rel_path
+    return linked
+
+
+class IconPipeline:
+    """
+    Parameters:
+        out_dir (str): Output directory (see layout above).
+        sizes (list): Thumbnail bounding boxes in pixels, or 'full'.
+        concurrency (int): Simultaneous downloads.
+        processes (int): Encoder processes (default: CPU count).
+        queue_size (int): Bound on images waiting between stages.
+        save_every (int): Save the manifest after this many finished files...
+        save_interval (float): ...or once this many seconds have passed since the last save.
+    """
+
+    def __init__(self, out_dir, sizes=(32, 64, 128, 'full'), concurrency=8, processes=None, queue_size=32,
+                 save_every=50, save_interval=5.0):
+        self.out_dir = out_dir
+        self.sizes = list(sizes)
+        self.concurrency = concurrency
+        self.processes = processes
+        self.queue_size = queue_size
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.manifest_path = os.path.join(out_dir, 'manifest.json')
+        self.manifest = self._load_manifest()
+        self.stats = {"downloaded": 0, "bytes": 0, "encoded": 0, "cache_hits": 0, "dedup_hits": 0, "failed": 0}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_current(self, image):
+        entry = self.manifest.get(image['name'])
+        variants = entry.get('variants', {}) if entry is not None else {}
+        # entries from before variant names kept the extension are redone once
+        return (entry is not None and entry.get('sha1') == image.get('sha1')
+                and all(variants.get(str(s)) == variant_path(image['name'], str(s)) for s in self.sizes)
+                and all(os.path.exists(os.path.join(self.out_dir, p)) for p in variants.values()))
+
+    async def download(self, session, image):
+        """Streams an image to originals/ while hashing it; returns (path, sha256)."""
+        originals = os.path.join(self.out_dir, 'originals')
+        os.makedirs(originals, exist_ok=True)
+        ext = os.path.splitext(image['name'])[1] or '.bin'
+        part_path = os.path.join(originals, f".{hashlib.md5(image['name'].encode()).hexdigest()}.part")
+        sha = hashlib.sha256()
+        async with session.get(image['url']) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    self.stats["bytes"] += len(chunk)
+        digest = sha.hexdigest()
+        path = os.path.join(originals, f"{digest}{ext}")
+        if os.path.exists(path):
+            os.remove(part_path)
+        else:
+            os.replace(part_path, path)
+        self.stats["downloaded"] += 1
+        return path, digest
+
+    async def run(self, images):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # only variants in the current layout can be linked (old ones may hold another file's content)
+        encoded_by_digest = {entry['sha256']: entry['variants'] for name, entry in self.manifest.items()
+                             if entry.get('sha256') and self._is_current(dict(entry, name=name))}
+        in_flight = {}
+        start = time.monotonic()
+        unsaved = 0
+        last_save = start
+
+        def checkpoint():
+            # A killed run loses at most the files finished since the last save
+            nonlocal unsaved, last_save
+            unsaved += 1
+            if unsaved >= self.save_every or time.monotonic() - last_save >= self.save_interval:
+                self.save_manifest()
+                unsaved, last_save = 0, time.monotonic()
+
+        async def producer():
+            for image in images:
+                if not image.get('url'):
+                    continue
+                if self._is_current(image):
+                    self.stats["cache_hits"] += 1
+                    continue
+                await queue.put(image)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def worker(session, pool):
+            while True:
+                image = await queue.get()
+                if image is None:
+                    return
+                try:
+                    path, digest = await self.download(session, image)
+                    previous = self.manifest.get(image['name'], {})
+                    if previous.get('sha256') not in (None, digest) and \
+                            encoded_by_digest.get(previous['sha256']) == previous.get('variants'):
+                        # this name's variants are about to hold other content
+                        del encoded_by_digest[previous['sha256']]
+                    if digest in encoded_by_digest or digest in in_flight:
+                        # Same bytes under another name: the existing variants are linked, not encoded again.
+                        self.stats["dedup_hits"] += 1
+                        source = encoded_by_digest.get(digest) or await in_flight[digest]
+                        variants = link_variants(source, image['name'], self.out_dir)
+                    else:
+                        in_flight[digest] = asyncio.ensure_future(loop.run_in_executor(
+                            pool, encode_variants, path, image['name'], self.out_dir, self.sizes))
+                        variants = await in_flight[digest]
+                        encoded_by_digest[digest] = variants
+                        self.stats["encoded"] += 1
+                    self.manifest[image['name']] = {"sha1": image.get('sha1'), "sha256": digest,
+                                                    "url": image['url'], "variants": variants}
+                    checkpoint()
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logging.error(f"Failed to process {image['name']}: {e}")
+
+        timeout = aiohttp.ClientTimeout(total=120)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        try:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                 headers={"User-Agent": USER_AGENT}) as session:
+                    await asyncio.gather(producer(), *(worker(session, pool) for _ in range(self.concurrency)))
+        finally:
+            self.save_manifest()
+        self.report(time.monotonic() - start)
+        return self.stats
+
+    def report(self, elapsed):
+        s = self.stats
+        processed = s["encoded"] + s["dedup_hits"]
+        line = (f"Pipeline: {processed} images in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f} images/sec), "
+                f"{s['bytes'] / 1048576:.1f} MB downloaded ({s['bytes'] / 1048576 / elapsed if elapsed else 0:.2f} MB/s), "
+                f"{s['cache_hits']} cache hits, {s['dedup_hits']} duplicate contents, {s['failed']} failed")
+        logging.info(line)
+        print(line)
+
+
+def parse_size(value):
+    return value if value == 'full' else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downloads category icons and writes WebP variants.")
+    parser.add_argument('category_url')
+    parser.add_argument('--out', default='icons', help="Output directory.")
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[32, 64, 128, 'full'])
+    parser.add_argument('--depth', type=int, default=None, help="Subcategory levels to follow.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Simultaneous downloads.")
+    parser.add_argument('--processes', type=int, default=None, help="Encoder processes.")
+    args = parser.parse_args(argv)
+
+    base_url = '/'.join(args.category_url.split('/')[:3])
+    images = wiki_api.WikiApiClient(base_url).list_images(args.category_url, max_depth=args.depth)
+    pipeline = IconPipeline(args.out, args.sizes, args.concurrency, args.processes)
+    asyncio.run(pipeline.run(images))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,58 @@
 import os
-import requests
-from bs4 import BeautifulSoup
+import argparse
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+import wiki_api
+from http_cache import HttpCache, CachedSession
+from crawler import crawl_image_names
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the URL from the environment variable
-url = os.getenv('SCRAPE_URL')
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Lists every image in a poewiki category tree.")
+    parser.add_argument('--backend', choices=('html', 'api'), default='html',
+                        help="'html' crawls rendered category pages; 'api' uses the MediaWiki api.php.")
+    parser.add_argument('--depth', type=int, default=None,
+                        help="Subcategory levels to follow (default: the whole tree).")
+    parser.add_argument('--concurrency', type=int, default=8, help="Maximum requests in flight.")
+    parser.add_argument('--cache-dir', default='.http_cache', help="On-disk HTTP cache directory.")
+    parser.add_argument('--cache-ttl', type=float, default=3600,
+                        help="Seconds a cached page is used before it is revalidated.")
+    parser.add_argument('--no-cache', action='store_true', help="Always fetch pages in full.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Get the category URL from the environment variable
+    url = os.getenv('SCRAPE_URL')
+
+    if not url:
+        raise ValueError("No URL provided. Please set the SCRAPE_URL environment variable.")
 
-if not url:
-    raise ValueError("No URL provided. Please set the SCRAPE_URL environment variable.")
+    parsed = urlparse(url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}"
 
-# Send a GET request to the URL
-response = requests.get(url)
+    cache = None if args.no_cache else HttpCache(args.cache_dir, ttl=args.cache_ttl)
 
-# Check if the request was successful
-if response.status_code != 200:
-    raise Exception(f"Failed to retrieve the webpage. Status code: {response.status_code}")
+    try:
+        if args.backend == 'api':
+            # Enumerate files through api.php, 500 per request
+            session = CachedSession(cache) if cache is not None else None
+            image_names = wiki_api.get_image_names(url, base_url=base_url, max_depth=args.depth, session=session)
+        else:
+            # Crawl the category and its subcategories concurrently
+            image_names = crawl_image_names(url, base_url=base_url, max_depth=args.depth,
+                                            concurrency=args.concurrency, cache=cache)
+    finally:
+        if cache is not None:
+            cache.report()
+            cache.close()
 
-# Parse the content of the response with BeautifulSoup
-soup = BeautifulSoup(response.content, 'html.parser')
+    for image in image_names:
+        print(image)
 
-# Find and print all the <h1> tags
-for h1_tag in soup.find_all('h1'):
-    print(h1_tag.text)
+if __name__ == "__main__":
+    main()
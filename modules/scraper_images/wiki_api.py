@@ -0,0 +1,122 @@
+import logging
+from urllib.parse import unquote, urlparse
+
+import requests
+
+# MediaWiki API backend for image enumeration.
+#
+# Instead of parsing rendered category HTML, this asks api.php for the files in
+# a category (generator=categorymembers, 500 per request) together with their
+# imageinfo (URL, size, dimensions, sha1), follows `continue` tokens until the
+# category is exhausted, and recurses into subcategories. Only file pages are
+# returned, so thumbnails and site chrome never show up, and large categories
+# are no longer truncated at the first page of results.
+
+API_PATH = "/w/api.php"
+USER_AGENT = "poe.coffee-backend/1.0 (+https://github.com/benjamin-mcdaniel/poe.coffee.backend)"
+PAGE_SIZE = 500
+
+
+def category_title(category_url):
+    """'https://www.poewiki.net/wiki/Category:Amulet_icons' -> 'Category:Amulet icons'."""
+    path = unquote(urlparse(category_url).path)
+    title = path.rsplit('/wiki/', 1)[-1] if '/wiki/' in path else path.lstrip('/')
+    # api.php reports titles with spaces; the root has to match them to be deduped
+    return title.replace('_', ' ')
+
+
+def file_name(title):
+    """'File:Araku Tiki inventory icon.png' -> 'Araku_Tiki_inventory_icon.png'."""
+    return title.split(':', 1)[-1].replace(' ', '_')
+
+
+class WikiApiClient:
+    """
+    Parameters:
+        base_url (str): Wiki root, e.g. https://www.poewiki.net or a local fixture server.
+        session (requests.Session): Optional session to reuse (e.g. a caching one).
+        timeout (float): Per-request timeout in seconds.
+    """
+
+    def __init__(self, base_url="https://www.poewiki.net", session=None, timeout=30):
+        self.api_url = base_url.rstrip('/') + API_PATH
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", USER_AGENT)
+        self.timeout = timeout
+        self.requests_made = 0
+        self.bytes_received = 0
+
+    def query(self, **params):
+        """Runs an action=query request, following continuation, and yields each response."""
+        params = dict(params, action='query', format='json', formatversion='2')
+        while True:
+            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            self.requests_made += 1
+            self.bytes_received += len(response.content)
+            data = response.json()
+            if 'error' in data:
+                raise Exception(f"MediaWiki API error: {data['error'].get('info', data['error'])}")
+            yield data
+            if 'continue' not in data:
+                break
+            params.update(data['continue'])
+
+    def subcategories(self, title):
+        return [member['title']
+                for data in self.query(list='categorymembers', cmtitle=title, cmtype='subcat', cmlimit=PAGE_SIZE)
+                for member in data.get('query', {}).get('categorymembers', [])]
+
+    def category_files(self, title):
+        """
+        Returns the files directly in a category with their imageinfo.
+
+        Returns:
+            list: dicts with name, title, url, size, width, height and sha1.
+        """
+        files = {}
+        for data in self.query(generator='categorymembers', gcmtitle=title, gcmtype='file', gcmlimit=PAGE_SIZE,
+                               prop='imageinfo', iiprop='url|size|sha1'):
+            for page in data.get('query', {}).get('pages', []):
+                entry = files.setdefault(page['pageid'], {"name": file_name(page['title']), "title": page['title']})
+                for info in page.get('imageinfo', []):
+                    entry.update({
+                        "url": info.get('url'),
+                        "size": info.get('size'),
+                        "width": info.get('width'),
+                        "height": info.get('height'),
+                        "sha1": info.get('sha1'),
+                    })
+        return sorted(files.values(), key=lambda f: f['title'])
+
+    def list_images(self, category_url, max_depth=None):
+        """Lists the files of a category and its subcategory tree, each file once."""
+        root = category_title(category_url)
+        seen_categories = {root}
+        seen_files = set()
+        images = []
+        level = [root]
+        depth = 0
+        while level:
+            next_level = []
+            for title in level:
+                for entry in self.category_files(title):
+                    if entry['title'] not in seen_files:
+                        seen_files.add(entry['title'])
+                        images.append(entry)
+                if max_depth is None or depth < max_depth:
+                    for sub in self.subcategories(title):
+                        if sub not in seen_categories:
+                            seen_categories.add(sub)
+                            next_level.append(sub)
+            level = next_level
+            depth += 1
+        logging.info(f"Listed {len(images)} files from {len(seen_categories)} categories "
+                     f"in {self.requests_made} API requests ({self.bytes_received} bytes).")
+        return images
+
+
+def get_image_names(category_url, base_url="https://www.poewiki.net", max_depth=None, session=None):
+    """Same interface as the HTML scrapers: returns the category tree's image file names."""
+    client = WikiApiClient(base_url, session=session)
+    return [entry['name'] for entry in client.list_images(category_url, max_depth=max_depth)]
@@ -0,0 +1,165 @@
+import http.server
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+# Unit tests for the scraper modules. Like benchmarks/, the scripts are put on
+# sys.path the way they expect to be run; files whose names are not importable
+# (link_collector.py.py) are loaded under explicit module names.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = os.path.join(ROOT, 'modules')
+NAVARROPY_DIR = os.path.join(MODULES, 'navarropy_scrapper')
+SCRAPER_IMAGES_DIR = os.path.join(MODULES, 'scraper_images')
+POEWIKI_DIR = os.path.join(MODULES, '_test_bs4_poewiki_supabase')
+SUPABASE_DIR = os.path.join(POEWIKI_DIR, 'supabase')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BENCH_FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+for path in (NAVARROPY_DIR, SCRAPER_IMAGES_DIR, POEWIKI_DIR, SUPABASE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# link_collector.py.py configures a trade_scraper.log file handler on import;
+# with a handler already on the root logger that basicConfig call is a no-op.
+logging.getLogger().addHandler(logging.NullHandler())
+
+
+def load_script(module_name, path):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_listing(url, profile, price, stock=10, online=True):
+    """A link_collector record for item `url` sold by `profile` at `price` Chaos per Divine."""
+    return {
+        "URL": url,
+        "What You Get": "1x Divine Orb",
+        "What You Pay": f"{price:g}x Chaos Orb",
+        "Profile Link": f"https://www.pathofexile.com/account/view-profile/{profile}",
+        "Items in Stock": stock,
+        "Player Status": online,
+        "Per-Want": f"1x Divine Orb ⇒ {price:g}x Chaos Orb",
+        "Per-Have": f"1x Chaos Orb ⇒ {1 / price:.6f}x Divine Orb",
+    }
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path, body))
+        status, headers, payload = self.server.handler(self.command, self.path, dict(self.headers), body)
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_server(handler):
+    """
+    Serves handler(method, path, headers, body) -> (status, headers, body) on
+    127.0.0.1 from a background thread; every request is recorded in
+    server.requests as (method, path, body).
+
+    Yields:
+        tuple: (base URL, server)
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    server.handler = handler
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def read_fixture(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# A small poewiki category tree: the recorded Amulet_icons page (which lists
+# itself among its 8 subcategories), the recorded Talisman_icons subcategory
+# (linking back to the root, to Legacy_amulet_icons and to a third level) and
+# generated leaf categories holding <category>_1.png and <category>_2.png.
+WIKI_ROOT_PATH = '/wiki/Category:Amulet_icons'
+WIKI_ROOT_HTML = read_fixture(os.path.join(BENCH_FIXTURES_DIR, 'wiki_category.html'))
+WIKI_TALISMAN_HTML = read_fixture(os.path.join(FIXTURES_DIR, 'wiki', 'talisman_icons.html'))
+WIKI_CHROME_IMAGES = {'poewiki-logo.png', 'poweredby_mediawiki_88x31.png'}   # site chrome, not category files
+
+
+def wiki_leaf_files(category):
+    return [f"{category.replace(' ', '_')}_{n}.png" for n in (1, 2)]
+
+
+def wiki_leaf_html(category):
+    """A category page without subcategories holding two files."""
+    files = ''.join(f'<li class="gallerybox"><a href="/wiki/File:{name}" class="image">'
+                    f'<img alt="" src="/images/0/0{n}/{name}" width="78" height="78" /></a></li>'
+                    for n, name in enumerate(wiki_leaf_files(category), 1))
+    return (f'<!DOCTYPE html><html><body><h1 class="firstHeading">Category:{category}</h1>'
+            f'<ul class="gallery mw-gallery-traditional">{files}</ul></body></html>')
+
+
+class WikiStub:
+    """stub_server handler for the rendered wiki: injects failures and tracks requests in flight."""
+
+    def __init__(self, failures=None, delay=0.05):
+        self.failures = dict(failures or {})   # path -> statuses answered before the page
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def page(self, path):
+        if path == WIKI_ROOT_PATH:
+            return WIKI_ROOT_HTML
+        if path == '/wiki/Category:Talisman_icons':
+            return WIKI_TALISMAN_HTML
+        if path.startswith('/wiki/Category:'):
+            return wiki_leaf_html(unquote(path.split(':', 1)[1]))
+        return None
+
+    def __call__(self, method, path, headers, body):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            statuses = self.failures.get(path)
+            status = statuses.pop(0) if statuses else 200
+        try:
+            time.sleep(self.delay)
+            page = self.page(path)
+            if status == 200 and page is None:
+                status = 404
+            return status, {'Content-Type': 'text/html; charset=UTF-8'}, page if status == 200 else 'error'
+        finally:
+            with self.lock:
+                self.in_flight -= 1
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import aggregate_store
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Settlers/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Settlers/b"
+URL_C = "https://www.pathofexile.com/trade/exchange/Settlers/c"
+
+
+def write_run(directory, run_epoch, records, ext='ndjson'):
+    path = directory / f'exchange_data_{run_epoch}.{ext}'
+    with open(path, 'w', encoding='utf-8') as f:
+        if ext == 'json':
+            json.dump(records, f)
+        else:
+            f.writelines(json.dumps(r) + '\n' for r in records)
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = aggregate_store.AggregateStore(str(tmp_path / 'aggregates.db'))
+    yield s
+    s.close()
+
+
+def test_each_run_is_folded_once_per_call(store, tmp_path):
+    first = [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 182)]
+    second = [make_listing(URL_A, 's1', 185)]
+    paths = [write_run(tmp_path, 1725003600, second), write_run(tmp_path, 1725000000, first),
+             write_run(tmp_path, 1725000000, first, ext='json')]
+
+    results = store.update_from_files(paths)
+    assert [r["run_epoch"] for r in results] == [1725000000, 1725003600]
+    assert store.generation() == 2
+    assert store.update_from_files(paths) == [] and store.generation() == 2
+
+
+def profile(name):
+    return f"https://www.pathofexile.com/account/view-profile/{name}"
+
+
+def test_a_run_fills_latest_sellers_and_top_sellers(store):
+    store.update(1725000000, [make_listing(URL_A, 's1', 180, stock=5), make_listing(URL_A, 's2', 182, stock=20),
+                              make_listing(URL_A, 's2', 184, stock=1), make_listing(URL_B, 's1', 90, stock=3)])
+    item_a = store.item(1)
+    assert (item_a["url"], item_a["get_currency"], item_a["pay_currency"]) == (URL_A, 'Divine Orb', 'Chaos Orb')
+    assert (item_a["best"], item_a["worst"], item_a["listings"], item_a["sellers"], item_a["stock"]) == \
+        (180.0, 184.0, 3, 2, 26)
+    assert [row["url"] for row in store.latest()] == [URL_A, URL_B]
+    assert store.item(99) is None
+
+    assert [(s["profile"], s["listings"], s["stock"], s["best_price"]) for s in store.item_sellers(1)] == \
+        [(profile('s1'), 1, 5, 180.0), (profile('s2'), 2, 21, 182.0)]
+    assert [(s["profile"], s["items"], s["stock"]) for s in store.top_sellers('stock')] == \
+        [(profile('s2'), 1, 21), (profile('s1'), 2, 8)]
+    assert store.top_sellers('items', limit=1)[0]["profile"] == profile('s1')
+    assert store.status() == {"generation": 1, "runs": 1, "first_run": 1725000000, "last_run": 1725000000,
+                              "items": 2, "sellers": 2}
+
+
+def test_an_older_run_loaded_late_only_adds_history(store):
+    store.update(1725003600, [make_listing(URL_A, 's1', 180)])
+    store.update(1725000000, [make_listing(URL_A, 's2', 170)])
+    assert store.item(1)["run_epoch"] == 1725003600
+    assert [s["profile"] for s in store.item_sellers(1)] == [profile('s1')]
+    assert [(h["run_epoch"], h["best"]) for h in store.history(1)] == [(1725000000, 170.0), (1725003600, 180.0)]
+    assert [h["run_epoch"] for h in store.history(1, start=1725000001)] == [1725003600]
+    assert store.generation() == 2
+
+
+def test_refolding_a_run_replaces_it(store):
+    store.update(1725000000, [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 182)])
+    store.update(1725000000, [make_listing(URL_A, 's3', 185)])   # e.g. a resumed run
+    assert [(h["run_epoch"], h["best"], h["sellers"]) for h in store.history(1)] == [(1725000000, 185.0, 1)]
+    assert [s["profile"] for s in store.item_sellers(1)] == [profile('s3')]
+    assert [s["profile"] for s in store.top_sellers()] == [profile('s3')]
+    assert store.status()["runs"] == 1 and store.generation() == 2
+
+
+def test_readers_see_what_the_writer_folded(store, tmp_path):
+    reader = aggregate_store.AggregateStore(store.db_path, readonly=True)
+    assert reader.latest() == []
+    store.update_from_files([write_run(tmp_path, 1725000000, [make_listing(URL_A, 's1', 180)], ext='json')])
+    assert reader.generation() == 1 and reader.item(1)["best"] == 180.0
+    reader.close()
+
+
+def test_refolding_a_run_without_an_item_drops_it_from_that_run(store):
+    store.update(1725000000, [make_listing(URL_A, 's1', 170), make_listing(URL_B, 's1', 90)])
+    store.update(1725003600, [make_listing(URL_A, 's2', 180), make_listing(URL_B, 's2', 91)])
+    store.update(1725003600, [make_listing(URL_B, 's3', 92)])   # the resumed run never got to URL_A
+
+    assert [h["run_epoch"] for h in store.history(1)] == [1725000000]
+    item_a = store.item(1)
+    assert (item_a["run_epoch"], item_a["best"]) == (1725000000, 170.0)
+    assert store.item_sellers(1) == []
+    assert [s["profile"] for s in store.item_sellers(2)] == [profile('s3')]
+    assert [s["profile"] for s in store.top_sellers()] == [profile('s3')]
+
+    # an item the run was the only one to have disappears from latest altogether
+    store.update(1725007200, [make_listing(URL_A, 's1', 175), make_listing(URL_C, 's1', 10)])
+    store.update(1725007200, [make_listing(URL_A, 's1', 176)])
+    assert [row["url"] for row in store.latest()] == [URL_A, URL_B]
+    assert store.history(3) == [] and store.item_sellers(3) == []
@@ -0,0 +1,100 @@
+import pytest
+
+import aggregate_store
+import api
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Settlers/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Settlers/b"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'aggregates.db')
+    store = aggregate_store.AggregateStore(path)
+    store.update(1725000000, [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 182),
+                              make_listing(URL_B, 's1', 90)])
+    store.close()
+    return path
+
+
+@pytest.fixture
+def app(db_path):
+    app = api.create_app(db_path, cache_size=16, cache_ttl=30)
+    app.config['RESPONSE_CACHE'].clock = FakeClock()
+    return app
+
+
+def test_responses_are_cached_until_the_ttl_runs_out(app):
+    cache = app.config['RESPONSE_CACHE']
+    client = app.test_client()
+    first = client.get('/api/ratios')
+    assert first.status_code == 200 and [row["url"] for row in first.json] == [URL_A, URL_B]
+    assert client.get('/api/ratios').data == first.data
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.headers['Cache-Control'] == 'public, max-age=30'
+
+    cache.clock.now += 31
+    client.get('/api/ratios')
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_a_new_run_invalidates_the_cache(app, db_path):
+    client = app.test_client()
+    before = client.get('/api/items/1')
+    store = aggregate_store.AggregateStore(db_path)
+    store.update(1725003600, [make_listing(URL_A, 's1', 185)])
+    store.close()
+    after = client.get('/api/items/1')
+    assert (before.json["best"], after.json["best"]) == (180.0, 185.0)
+    assert before.headers['ETag'] != after.headers['ETag']
+    assert client.get('/api/health').json["generation"] == 2
+
+
+def test_matching_etag_gets_an_empty_304(app):
+    client = app.test_client()
+    first = client.get('/api/items/1/sellers')
+    etag = first.headers['ETag']
+    revalidated = client.get('/api/items/1/sellers', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b'' and revalidated.headers['ETag'] == etag
+    assert client.get('/api/items/1/sellers', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/api/ratios?limit=abc', '/api/ratios?limit=-1', '/api/sellers/top?by=price',
+                                  '/api/items/1/history?start=yesterday'])
+def test_bad_parameters_are_rejected(app, path):
+    response = app.test_client().get(path)
+    assert response.status_code == 400 and response.json["error"] == "Bad Request"
+
+
+def test_unknown_items_are_404(app):
+    client = app.test_client()
+    assert client.get('/api/items/99').status_code == 404
+    assert client.get('/api/items/99/history').status_code == 404
+
+
+def test_each_request_closes_its_connection(app, monkeypatch):
+    opened, closed = [], []
+
+    class CountingStore(aggregate_store.AggregateStore):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(aggregate_store, 'AggregateStore', CountingStore)
+    client = app.test_client()
+    for path in ('/api/health', '/api/ratios', '/api/ratios', '/api/items/99'):
+        client.get(path)
+    assert len(opened) == 4 and closed == opened
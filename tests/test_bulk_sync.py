@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+import bulk_sync
+import upload_to_supabase
+from conftest import stub_server
+
+FILE_PART_RE = re.compile(rb'name="file"; filename="[^"]*"\r\nContent-Type: ([^\r]+)\r\n\r\n(.*)\r\n--', re.S)
+
+
+class StorageStub:
+    """
+    Supabase storage upload endpoint: POST /storage/v1/object/<bucket>/<name>.
+    The n-th upload of a name answers 503 while n <= failures[name].
+    """
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.attempts = {}
+        self.objects = {}
+        self.headers = []
+        self.lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        match = re.match(r'/storage/v1/object/([^/]+)/(.+)$', path)
+        if method != 'POST' or match is None:
+            return 404, {'Content-Type': 'application/json'}, b'{"statusCode":"404","error":"Not Found","message":"?"}'
+        bucket, name = match.groups()
+        with self.lock:
+            self.headers.append(headers)
+            self.attempts[name] = self.attempts.get(name, 0) + 1
+            if self.attempts[name] <= self.failures.get(name, 0):
+                return 503, {'Content-Type': 'application/json'}, \
+                    b'{"statusCode":"503","error":"Service Unavailable","message":"try again"}'
+            content_type, data = FILE_PART_RE.search(body).groups()
+            self.objects[name] = (data, content_type.decode())
+        return 200, {'Content-Type': 'application/json'}, json.dumps({"Key": f"{bucket}/{name}"})
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / 'icons'
+    (root / 'currency').mkdir(parents=True)
+    for name in ('a.png', 'b.png', 'c.png'):
+        (root / name).write_bytes(name.encode() * 10)
+    (root / 'currency' / 'divine.png').write_bytes(b'divine')
+    (root / '.hidden').write_bytes(b'skip me')
+    return root
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Starts local storage stubs and points upload_to_supabase's real client at the latest one."""
+    with ExitStack() as stack:
+        def start(failures=None):
+            stub = StorageStub(failures)
+            base_url, server = stack.enter_context(stub_server(stub))
+            monkeypatch.setattr(upload_to_supabase, 'SUPABASE_URL', base_url)
+            monkeypatch.setattr(upload_to_supabase, 'SUPABASE_KEY', 'test-service-key')
+            monkeypatch.setattr(upload_to_supabase, '_client', None)
+            return stub, server
+
+        yield start
+
+
+def run_sync(source, delays, **options):
+    return bulk_sync.sync(str(source), prefix='icons/', workers=3, bucket_name='icons-bucket', sleep=delays.append,
+                          **options)
+
+
+def test_uploads_are_authenticated_upserts(source, storage):
+    stub, server = storage()
+    stats = run_sync(source, [])
+
+    assert (stats["uploaded"], stats["skipped"], stats["failed"]) == (4, 0, 0)
+    assert {path for _, path, _ in server.requests} == {f"/storage/v1/object/icons-bucket/icons/{n}" for n in
+                                                        ('a.png', 'b.png', 'c.png', 'currency/divine.png')}
+    for headers in stub.headers:
+        headers = {k.lower(): v for k, v in headers.items()}
+        assert headers['x-upsert'] == 'true' and headers['authorization'] == 'Bearer test-service-key'
+    assert stub.objects['icons/currency/divine.png'] == (b'divine', 'image/png')
+    # one client for every upload
+    assert upload_to_supabase.get_client() is upload_to_supabase.get_client()
+
+
+def test_server_errors_are_retried(source, storage):
+    stub, _ = storage({'icons/a.png': 2, 'icons/currency/divine.png': 1})
+    delays = []
+    stats = run_sync(source, delays, retries=3)
+
+    assert (stats["uploaded"], stats["skipped"], stats["failed"]) == (4, 0, 0)
+    assert stub.attempts == {'icons/a.png': 3, 'icons/b.png': 1, 'icons/c.png': 1, 'icons/currency/divine.png': 2}
+    assert sorted(delays) == [0.5, 0.5, 1.0]   # exponential backoff per object
+    assert stub.objects['icons/a.png'] == (b'a.png' * 10, 'image/png')
+
+
+def test_exhausted_retries_count_as_failed_and_stay_out_of_the_manifest(source, storage):
+    stub, _ = storage({'icons/b.png': 10})
+    stats = run_sync(source, [], retries=2)
+
+    assert (stats["uploaded"], stats["skipped"], stats["failed"]) == (3, 0, 1)
+    assert stub.attempts['icons/b.png'] == 3
+    manifest = json.loads((source / '.sync_manifest.json').read_text())
+    assert sorted(manifest) == ['icons/a.png', 'icons/c.png', 'icons/currency/divine.png']
+    assert manifest['icons/a.png'] == bulk_sync.file_digest(str(source / 'a.png'))
+
+
+def test_manifest_persists_across_runs(source, storage, tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    storage({'icons/b.png': 10})
+    run_sync(source, [], retries=1, manifest_path=manifest_path)
+
+    # the failed file is retried, unchanged files cost no request, changes are re-uploaded
+    (source / 'c.png').write_bytes(b'changed')
+    second, _ = storage()
+    stats = run_sync(source, [], manifest_path=manifest_path)
+    assert (stats["uploaded"], stats["skipped"], stats["failed"]) == (2, 2, 0)
+    assert sorted(second.attempts) == ['icons/b.png', 'icons/c.png']
+
+    third, server = storage()
+    stats = run_sync(source, [], manifest_path=manifest_path)
+    assert (stats["uploaded"], stats["skipped"], stats["failed"]) == (0, 4, 0)
+    assert server.requests == []
+    assert not os.path.exists(manifest_path + '.tmp')
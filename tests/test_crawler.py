@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import crawler
+from conftest import WIKI_ROOT_HTML, WIKI_ROOT_PATH, WIKI_TALISMAN_HTML, WikiStub, stub_server, wiki_leaf_html
+
+
+def crawl(base_url, **options):
+    c = crawler.CategoryCrawler(base_url=base_url, backoff=0.01, **options)
+    return c, asyncio.run(c.crawl_image_names(base_url + WIKI_ROOT_PATH))
+
+
+def expected_names(*pages):
+    names = set()
+    for html in pages:
+        names.update(crawler.parse_image_names(html))
+    return names
+
+
+def requested(server):
+    counts = {}
+    for _, path, _ in server.requests:
+        counts[path] = counts.get(path, 0) + 1
+    return counts
+
+
+def test_crawls_the_tree_once_per_page():
+    wiki = WikiStub()
+    with stub_server(wiki) as (base_url, server):
+        c, names = crawl(base_url, concurrency=8, per_host=3)
+
+    subcategories = [s.split(':')[-1] for s in crawler.parse_subcategories(WIKI_ROOT_HTML, '')]
+    pages = [WIKI_ROOT_HTML, WIKI_TALISMAN_HTML, wiki_leaf_html('Unique_talisman_icons')]
+    # the recorded root lists itself among its subcategories
+    pages += [wiki_leaf_html(s) for s in subcategories if s not in ('Amulet_icons', 'Talisman_icons')]
+    assert set(names) == expected_names(*pages)
+    assert len(names) == len(set(names))
+    assert names[:5] == crawler.parse_image_names(WIKI_ROOT_HTML)[:5]   # root page first
+
+    # the root and Talisman_icons link back to the root, Talisman_icons to
+    # Legacy_amulet_icons too; every page is still fetched once
+    counts = requested(server)
+    assert len(counts) == 9 and set(counts.values()) == {1}
+    assert c.pages_fetched == 9 and c.failed == []
+
+
+@pytest.mark.parametrize('per_host', [1, 3])
+def test_per_host_concurrency_is_bounded(per_host):
+    wiki = WikiStub()
+    with stub_server(wiki) as (base_url, _):
+        crawl(base_url, concurrency=8, per_host=per_host)
+    assert wiki.peak == per_host
+
+
+def test_transient_failures_are_retried_and_client_errors_are_not():
+    wiki = WikiStub({'/wiki/Category:Belt_icons': [503, 502],
+                 '/wiki/Category:Ring_icons': [429],
+                 '/wiki/Category:Atlas_base_amulet_icons': [404],
+                 '/wiki/Category:Legacy_amulet_icons': [500, 500, 500, 500]})
+    with stub_server(wiki) as (base_url, server):
+        c, names = crawl(base_url, retries=3)
+
+    counts = requested(server)
+    assert counts['/wiki/Category:Belt_icons'] == 3
+    assert counts['/wiki/Category:Ring_icons'] == 2
+    assert counts['/wiki/Category:Atlas_base_amulet_icons'] == 1
+    assert counts['/wiki/Category:Legacy_amulet_icons'] == 4   # retries exhausted
+    assert sorted(c.failed) == [base_url + '/wiki/Category:Atlas_base_amulet_icons',
+                                base_url + '/wiki/Category:Legacy_amulet_icons']
+    assert 'Belt_icons_1.png' in names and 'Ring_icons_2.png' in names
+    assert 'Atlas_base_amulet_icons_1.png' not in names
+
+
+def test_max_depth_stops_at_the_first_level():
+    with stub_server(WikiStub()) as (base_url, server):
+        crawl(base_url, max_depth=1)
+    assert '/wiki/Category:Unique_talisman_icons' not in requested(server)
+    assert len(requested(server)) == 8
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import delta_store
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Standard/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Standard/b"
+
+
+def sort_key(record):
+    return sorted((k, str(v)) for k, v in record.items())
+
+
+def same_records(left, right):
+    return sorted(left, key=sort_key) == sorted(right, key=sort_key)
+
+
+@pytest.fixture
+def runs():
+    first = [make_listing(URL_A, "s1", 180), make_listing(URL_A, "s2", 181), make_listing(URL_B, "s1", 90),
+             make_listing(URL_B, "s1", 90)]
+    second = [make_listing(URL_A, "s1", 180, stock=7), make_listing(URL_A, "s2", 185), make_listing(URL_B, "s1", 90),
+              make_listing(URL_B, "s3", 95)]
+    return first, second
+
+
+def test_diff_classifies_and_apply_round_trips(runs):
+    first, second = runs
+    ops, counts = delta_store.diff(first, second)
+    assert counts == {"changed_stock": 1, "changed_price": 1, "unchanged": 1, "removed": 1, "added": 1}
+    assert same_records(delta_store.apply(first, ops), second)
+
+
+def test_append_and_reconstruct(tmp_path, runs):
+    store = delta_store.DeltaStore(str(tmp_path), keyframe_every=24)
+    assert store.append(100, runs[0])["kind"] == "keyframe"
+    assert store.append(200, runs[1])["kind"] == "delta"
+
+    reopened = delta_store.DeltaStore(str(tmp_path))
+    assert same_records(reopened.reconstruct(100), runs[0])
+    assert same_records(reopened.reconstruct(200), runs[1])
+
+
+def test_append_same_epoch_twice_replaces_it(tmp_path, runs):
+    first, second = runs
+    store = delta_store.DeltaStore(str(tmp_path))
+    store.append(100, first)
+    partial = second[:2]
+    store.append(200, partial)
+    # A resumed run 200 is stored again with all of its records
+    entry = store.append(200, second)
+
+    assert [e["run_epoch"] for e in store.index] == [100, 200]
+    assert entry["records"] == len(second)
+    assert same_records(delta_store.DeltaStore(str(tmp_path)).reconstruct(200), second)
+    assert sorted(os.listdir(tmp_path)) == sorted([delta_store.INDEX_NAME] + [e["file"] for e in store.index])
+
+
+def test_append_same_epoch_twice_as_first_run(tmp_path, runs):
+    store = delta_store.DeltaStore(str(tmp_path))
+    store.append(100, runs[0][:1])
+    store.append(100, runs[0])
+    assert len(store.index) == 1 and store.index[0]["kind"] == "keyframe"
+    assert same_records(store.reconstruct(100), runs[0])
+
+
+def test_append_older_run_is_rejected(tmp_path, runs):
+    store = delta_store.DeltaStore(str(tmp_path))
+    store.append(200, runs[0])
+    with pytest.raises(ValueError):
+        store.append(100, runs[1])
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+import exchange_api
+import html_extract
+import rate_limiter
+from conftest import FIXTURES_DIR, NAVARROPY_DIR, stub_server
+
+URL = "https://www.pathofexile.com/trade/exchange/Settlers/9z28fK"
+API_FIXTURES = os.path.join(FIXTURES_DIR, 'exchange_api')
+
+
+def fixture(name):
+    with open(os.path.join(API_FIXTURES, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def browser_records():
+    with open(os.path.join(NAVARROPY_DIR, 'fixtures', 'exchange_page.html'), encoding='utf-8') as f:
+        return html_extract.extract_containers_html(f.read(), URL)
+
+
+def trade_api(responses=None):
+    """Stub of the trade site's JSON API serving the recorded fixtures."""
+    responses = list(responses or [])
+
+    def handle(method, path, headers, body):
+        if responses:
+            return responses.pop(0)
+        routes = {
+            ('GET', '/api/trade/data/static'): 'static.json',
+            ('GET', '/api/trade/exchange/Settlers/9z28fK'): 'query.json',
+            ('POST', '/api/trade/exchange/Settlers'): 'search.json',
+        }
+        if (method, path) not in routes:
+            return 404, {}, '{"error": {"code": 1, "message": "Resource not found"}}'
+        return 200, {'Content-Type': 'application/json'}, json.dumps(fixture(routes[method, path]))
+    return handle
+
+
+def fast_limiter():
+    return rate_limiter.RateLimiter(policies={}, sleep=lambda seconds: None)
+
+
+def test_parse_exchange_url():
+    assert exchange_api.parse_exchange_url(URL) == ('Settlers', '9z28fK')
+    with pytest.raises(ValueError):
+        exchange_api.parse_exchange_url("https://www.pathofexile.com/trade/search/Settlers/abc")
+
+
+@pytest.mark.parametrize('value, text', [(2, '2'), (180.0, '180'), (1 / 180, '0.005556'), (0.5, '0.5'), (1e-7, '0')])
+def test_format_amount_matches_the_page(value, text):
+    assert exchange_api.format_amount(value) == text
+
+
+def test_listings_to_records_matches_browser_records():
+    names = {e["id"]: e["text"] for group in fixture('static.json')["result"] for e in group["entries"]}
+    records = exchange_api.listings_to_records(URL, fixture('search.json')["result"].values(), names)
+    assert records == browser_records()
+
+
+def test_fetch_listings_through_stub_server():
+    with stub_server(trade_api()) as (base_url, server):
+        client = exchange_api.ExchangeClient(base_url=base_url, limiter=fast_limiter())
+        try:
+            waits = []
+            assert client.fetch_listings(URL, on_wait=waits.append) == browser_records()
+            assert client.fetch_listings(URL) == browser_records()
+            # one rate limiter wait per request: the query, the search and the static data
+            assert len(waits) == 3
+        finally:
+            client.close()
+    paths = [(method, path) for method, path, _ in server.requests]
+    # the static currency names are fetched once per client
+    assert paths.count(('GET', '/api/trade/data/static')) == 1
+    search = json.loads([body for method, _, body in server.requests if method == 'POST'][0])
+    assert search == {"query": fixture('query.json')["query"], "sort": {"have": "asc"}, "engine": "new"}
+
+
+def test_throttled_request_is_retried():
+    throttled = (429, {'Retry-After': '2', 'X-Rate-Limit-Rules': 'Ip', 'X-Rate-Limit-Ip': '7:15:60',
+                       'X-Rate-Limit-Ip-State': '7:15:2'}, '{"error": {"code": 3}}')
+    limiter = fast_limiter()
+    with stub_server(trade_api([throttled])) as (base_url, server):
+        client = exchange_api.ExchangeClient(base_url=base_url, limiter=limiter)
+        try:
+            assert len(client.fetch_listings(URL)) == 100
+        finally:
+            client.close()
+    assert limiter.throttles == 1
+    assert len(server.requests) == 4
+
+
+def test_missing_query_raises():
+    with stub_server(trade_api()) as (base_url, _):
+        client = exchange_api.ExchangeClient(base_url=base_url, limiter=fast_limiter())
+        try:
+            with pytest.raises(Exception):
+                client.fetch_listings("https://www.pathofexile.com/trade/exchange/Settlers/missing")
+        finally:
+            client.close()
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+
+import history_archive
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Settlers/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Settlers/b"
+URL_C = "https://www.pathofexile.com/trade/exchange/Settlers/c"
+
+# two runs on 2024-08-30 and one on 2024-08-31 (UTC)
+RUNS = {
+    1725000000: [make_listing(URL_B, 's1', 90), make_listing(URL_A, 's1', 180, stock=5),
+                 make_listing(URL_A, 's2', 182, online=False)],
+    1725003600: [make_listing(URL_A, 's1', 185)],
+    1725091200: [make_listing(URL_B, 's2', 95, stock=7), make_listing(URL_A, 's3', 179)],
+}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    for run_epoch, records in RUNS.items():
+        history_archive.write_run(archive_dir, run_epoch, records)
+    return archive_dir
+
+
+def test_runs_are_partitioned_by_date(archive, tmp_path):
+    assert sorted(p.name for p in (tmp_path / 'archive').iterdir()) == ['date=2024-08-30', 'date=2024-08-31']
+    assert [run.run_epoch for run in history_archive.iter_runs(archive)] == list(RUNS)
+    assert not list((tmp_path / 'archive').glob('*/*.tmp'))
+
+
+def test_history_across_reopened_runs(archive):
+    frame = history_archive.history(archive, URL_A, columns=("price", "stock", "online", "profile"))
+    assert frame["run_epoch"].tolist() == [1725000000, 1725000000, 1725003600, 1725091200]
+    assert frame["price"].tolist() == [180.0, 182.0, 185.0, 179.0]
+    assert frame["stock"].tolist() == [5, 10, 10, 10]
+    assert frame["online"].tolist() == [True, False, True, True]
+    assert frame["profile"].tolist()[-1] == "https://www.pathofexile.com/account/view-profile/s3"
+
+    run = next(history_archive.iter_runs(archive))
+    assert isinstance(run.column("price"), np.memmap)
+    assert run.url_slice(URL_B) == slice(2, 3)   # rows are sorted by URL
+
+
+def test_history_prunes_by_time(archive):
+    later = history_archive.history(archive, URL_A, start_epoch=1725003600)
+    assert later["run_epoch"].tolist() == [1725003600, 1725091200]
+    first_day = history_archive.history(archive, URL_B, end_epoch=1725086399)
+    assert first_day["price"].tolist() == [90.0]
+
+
+def test_history_of_an_unknown_item_is_empty(archive, tmp_path):
+    for frame in (history_archive.history(archive, URL_C, columns=("price",)),
+                  history_archive.history(str(tmp_path / 'missing'), URL_A, columns=("price",))):
+        assert frame.empty and list(frame.columns) == ["run_epoch", "price"]
+
+
+def test_runs_round_trip_and_rewrites_replace(archive):
+    run_path = history_archive.run_dir(archive, 1725000000)
+    key = lambda r: (r["URL"], r["Profile Link"])
+    assert sorted(history_archive.read_run(run_path), key=key) == sorted(RUNS[1725000000], key=key)
+
+    history_archive.write_run(archive, 1725000000, [make_listing(URL_C, 's9', 10)])
+    assert history_archive.read_run(run_path) == [make_listing(URL_C, 's9', 10)]
+    assert history_archive.history(archive, URL_B)["run_epoch"].tolist() == [1725091200]
+
+
+def test_convert_verifies_the_round_trip(tmp_path):
+    paths = []
+    for run_epoch, records in RUNS.items():
+        path = tmp_path / f'exchange_data_{run_epoch}.ndjson'
+        path.write_text(''.join(json.dumps(r) + '\n' for r in records), encoding='utf-8')
+        paths.append(str(path))
+    archive_dir = str(tmp_path / 'archive')
+    converted = history_archive.convert(paths, archive_dir, verify=True)
+    assert [target for _, target in converted] == [history_archive.run_dir(archive_dir, e) for e in RUNS]
@@ -0,0 +1,98 @@
+import os
+from urllib.parse import urljoin
+
+import pytest
+from lxml import etree
+from lxml import html as lxml_html
+from selenium.webdriver.common.by import By
+
+import dom_extract
+import html_extract
+from conftest import NAVARROPY_DIR
+
+URL = "https://www.pathofexile.com/trade/exchange/Settlers/abc"
+
+
+def exchange_page():
+    with open(os.path.join(NAVARROPY_DIR, 'fixtures', 'exchange_page.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+class LxmlElement:
+    """Just enough of a selenium WebElement for dom_extract._read_container, backed by an
+    lxml element: .text is rendered like Selenium's visible text (whitespace collapsed,
+    &nbsp; read as a space) and href resolves against the page URL like the DOM property."""
+
+    def __init__(self, el):
+        self.el = el
+
+    def find_elements(self, by, xpath):
+        assert by == By.XPATH
+        return [LxmlElement(e) for e in self.el.xpath(xpath)]
+
+    @property
+    def text(self):
+        return ' '.join(self.el.text_content().replace('\xa0', ' ').split())
+
+    def get_attribute(self, name):
+        if name == 'innerHTML':
+            return (self.el.text or '') + ''.join(
+                etree.tostring(child, encoding='unicode', method='html') for child in self.el)
+        if name == 'href':
+            return urljoin(URL, self.el.get('href'))
+        return self.el.get(name)
+
+
+def live_records(page_html):
+    doc = lxml_html.document_fromstring(page_html)
+    return [dom_extract.build_record(URL, dom_extract._read_container(LxmlElement(c)))
+            for c in doc.xpath(dom_extract.CONTAINER_XPATH)]
+
+
+def test_offline_parse_matches_the_live_path_on_the_exchange_page():
+    live = live_records(exchange_page())
+    offline = html_extract.extract_containers_html(exchange_page(), URL)
+    assert len(offline) == 100
+    assert offline == live
+    assert offline[0]["What You Get"] == "2x Divine Orb"
+    assert offline[0]["Per-Want"] == "1x Divine Orb ⇒ 180x Chaos Orb"
+    # the page has sellers with an empty status span; both paths read them as offline
+    assert any(not r["Player Status"] for r in offline)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2\u00a0×\u00a0 Divine Orb", "2x Divine Orb"),
+    ("2 ×  Divine Orb", "2x Divine Orb"),
+    ("  360 × Chaos Orb\n", "360x Chaos Orb"),
+    (" Divine Orb ", "Divine Orb"),
+])
+def test_normalize_offer(text, expected):
+    assert dom_extract.normalize_offer(text) == expected
+
+
+def test_missing_fields_fall_back_to_na():
+    raw = {"what_get": ["2 × Divine Orb", " "], "what_pay": ["360 × Chaos Orb"], "link": None,
+           "stock": None, "status": None, "per_want": [], "per_have": []}
+    record = dom_extract.build_record(URL, raw)
+    assert record == {
+        "URL": URL,
+        "What You Get": "2x Divine Orb",
+        "What You Pay": "360x Chaos Orb",
+        "Profile Link": "N/A",
+        "Items in Stock": 0,
+        "Player Status": False,
+        "Per-Want": "N/A",
+        "Per-Have": "N/A",
+    }
+
+
+def test_a_container_missing_its_seller_block_parses_the_same_on_both_paths():
+    page = """<html><body><div class="row exchange">
+      <div class="price-block">3&nbsp;×&nbsp;<img title="Divine Orb"> Divine Orb</div>
+      <div class="price-block s">540&nbsp;×&nbsp;<img title="Chaos Orb"> Chaos Orb</div>
+    </div></body></html>"""
+    offline = html_extract.extract_containers_html(page, URL)
+    assert offline == live_records(page)
+    assert offline[0]["What You Get"] == "3x Divine Orb"
+    assert (offline[0]["Profile Link"], offline[0]["Items in Stock"], offline[0]["Player Status"],
+            offline[0]["Per-Want"], offline[0]["Per-Have"]) == ("N/A", 0, False, "N/A", "N/A")
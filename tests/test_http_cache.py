@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+
+import aiohttp
+import pytest
+
+import crawler
+import http_cache
+from conftest import stub_server
+
+
+class FakeClock:
+    def __init__(self, now=1725000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Pages:
+    """Serves /<name> with an ETag per version and answers matching If-None-Match with 304."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.versions = dict.fromkeys(pages, 1)
+        self.on_conditional = None
+
+    def __call__(self, method, path, headers, body):
+        name = path.lstrip('/')
+        etag = f'"{name}-{self.versions[name]}"'
+        if headers.get('If-None-Match') is not None and self.on_conditional:
+            self.on_conditional()
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        return 200, {'ETag': etag, 'Content-Type': 'text/html; charset=utf-8'}, self.pages[name]
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    c = http_cache.HttpCache(str(tmp_path / 'cache'), ttl=60, max_bytes=1000, clock=clock)
+    yield c
+    c.close()
+
+
+def test_fresh_pages_are_served_locally_and_stale_ones_revalidated(cache, clock):
+    pages = Pages({'a': b'<html>a</html>'})
+    session = http_cache.CachedSession(cache)
+    with stub_server(pages) as (base_url, server):
+        assert session.get(f"{base_url}/a").content == b'<html>a</html>'
+        assert session.get(f"{base_url}/a").text == '<html>a</html>'
+        assert len(server.requests) == 1
+
+        clock.now += 61
+        assert session.get(f"{base_url}/a").content == b'<html>a</html>'
+        clock.now += 30                     # the 304 made the entry fresh again
+        session.get(f"{base_url}/a")
+
+        clock.now += 61
+        pages.pages['a'], pages.versions['a'] = b'<html>a2</html>', 2
+        assert session.get(f"{base_url}/a").content == b'<html>a2</html>'
+    assert len(server.requests) == 3
+    stats = cache.stats
+    assert (stats.hits, stats.revalidated, stats.misses) == (2, 1, 2)
+    assert stats.bytes_saved == 3 * len(b'<html>a</html>')
+
+
+def test_least_recently_used_entries_are_evicted_first(cache, clock):
+    for url in ('a', 'b', 'c'):
+        cache.store(url, url.encode() * 400)
+        clock.now += 1
+    # a, b and c do not fit in 1000 bytes together: a went first
+    assert cache.lookup('a') is None and cache.lookup('b') and cache.lookup('c')
+    cache.hit(cache.lookup('b'))
+    clock.now += 1
+    cache.store('d', b'd' * 400)
+    assert cache.lookup('c') is None and cache.lookup('b') and cache.lookup('d')
+    assert len([f for _, _, files in os.walk(cache.objects_dir) for f in files]) == 2
+
+
+def test_identical_bodies_are_stored_once(cache):
+    cache.store('a', b'x' * 600)
+    cache.store('b', b'x' * 600)
+    assert cache.lookup('a')["digest"] == cache.lookup('b')["digest"]
+    assert len([f for _, _, files in os.walk(cache.objects_dir) for f in files]) == 1
+
+
+def test_bodies_larger_than_the_cache_are_not_kept(cache):
+    cache.store('big', b'small')
+    cache.store('big', b'x' * 1001, {'ETag': '"big-2"'})
+    assert cache.lookup('big') is None
+    assert cache.conditional_headers(cache.lookup('big')) == {}
+    assert cache.stats.misses == 2
+
+
+def evict_everything(cache):
+    def evict():
+        shutil.rmtree(cache.objects_dir)
+        os.makedirs(cache.objects_dir)
+    return evict
+
+
+def test_session_refetches_when_a_304_has_no_body_behind_it(cache, clock):
+    pages = Pages({'a': b'<html>a</html>'})
+    session = http_cache.CachedSession(cache)
+    with stub_server(pages) as (base_url, server):
+        session.get(f"{base_url}/a")
+        clock.now += 61
+        pages.on_conditional = evict_everything(cache)   # e.g. another process evicted it meanwhile
+        response = session.get(f"{base_url}/a")
+    assert response.status_code == 200 and response.content == b'<html>a</html>'
+    assert len(server.requests) == 3
+    assert cache.lookup(f"{base_url}/a") is not None
+
+
+def test_crawler_refetches_when_a_304_has_no_body_behind_it(cache, clock):
+    pages = Pages({'a': b'<html>a</html>'})
+    c = crawler.CategoryCrawler(cache=cache, backoff=0.01)
+
+    async def fetch(url):
+        async with aiohttp.ClientSession() as session:
+            return await c.fetch(session, url)
+
+    with stub_server(pages) as (base_url, server):
+        asyncio.run(fetch(f"{base_url}/a"))
+        clock.now += 61
+        pages.on_conditional = evict_everything(cache)
+        assert asyncio.run(fetch(f"{base_url}/a")) == '<html>a</html>'
+    assert len(server.requests) == 3 and c.pages_fetched == 2
+    assert cache.stats.revalidated == 0
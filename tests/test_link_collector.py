@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import metrics
+from conftest import NAVARROPY_DIR, load_script
+
+
+@pytest.fixture(scope='module')
+def link_collector():
+    return load_script('link_collector', os.path.join(NAVARROPY_DIR, 'link_collector.py.py'))
+
+
+@pytest.mark.parametrize('flags', [['--delta-dir'], ['--aggregates'], ['--resume', '1725000000'], ['--workers', '4']])
+def test_daemon_rejects_per_run_flags(link_collector, flags):
+    with pytest.raises(SystemExit):
+        link_collector.parse_args(['--daemon'] + flags)
+
+
+def test_daemon_alone_parses(link_collector):
+    args = link_collector.parse_args(['--daemon', '--engine', 'http', '--budget', '0.2'])
+    assert args.daemon and args.budget == 0.2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_http_engine_times_rate_limit_waits_apart_from_navigate(link_collector):
+    clock = FakeClock()
+
+    class Client:
+        def fetch_listings(self, url, on_wait=None):
+            for waited in (1.5, 0.5):   # the query fetch and the search
+                clock.now += waited
+                on_wait(waited)
+                clock.now += 0.25
+            return []
+
+    url = "https://www.pathofexile.com/trade/exchange/Settlers/abc"
+    run_metrics = metrics.RunMetrics('link_collector', 0, clock=clock)
+    link_collector.scrape_url_http(Client(), url, run_metrics)
+    assert run_metrics.finish_url(url) == pytest.approx({'rate-limit-sleep': 2.0, 'navigate': 0.5})
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+import listing_store
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Settlers/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Settlers/b"
+
+
+def count(store, run_id=None):
+    if run_id is None:
+        return store.conn.execute('SELECT COUNT(*) FROM listings').fetchone()[0]
+    return store.conn.execute('SELECT COUNT(*) FROM listings WHERE run_id=?', (run_id,)).fetchone()[0]
+
+
+def test_rewriting_a_url_replaces_its_listings(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    run = store.start_run(1725000000)
+    other_run = store.start_run(1725003600)
+    store.write_listings(run, 1725000000, URL_A, [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 181)])
+    store.write_listings(run, 1725000000, URL_B, [make_listing(URL_B, 's1', 90)])
+    store.write_listings(other_run, 1725003600, URL_A, [make_listing(URL_A, 's1', 185)])
+
+    # URL_A retried within the first run: its rows are replaced, nothing else changes
+    store.write_listings(run, 1725000000, URL_A, [make_listing(URL_A, 's3', 179)])
+    assert count(store, run) == 2 and count(store, other_run) == 1
+    rows = store.conn.execute('SELECT s.profile_link FROM listings l JOIN sellers s USING (seller_id) '
+                              'JOIN items i USING (item_id) WHERE l.run_id=? AND i.url=?', (run, URL_A)).fetchall()
+    assert rows == [("https://www.pathofexile.com/account/view-profile/s3",)]
+
+    # a retry that finds no listings clears what the failed attempt left
+    store.write_listings(run, 1725000000, URL_B, [])
+    assert count(store, run) == 1
+    store.close()
+
+
+def write_ndjson(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r) + '\n')
+
+
+def test_reimporting_a_run_replaces_it(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    path = str(tmp_path / 'exchange_data_1725000000.ndjson')
+    write_ndjson(path, [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 181), make_listing(URL_B, 's1', 90)])
+    listing_store.import_file(store, path)
+    listing_store.import_file(store, path)
+    assert count(store) == 3
+
+    # a shorter file for the same run leaves no stale rows behind
+    write_ndjson(path, [make_listing(URL_A, 's1', 182)])
+    listing_store.import_file(store, path)
+    assert count(store) == 1
+    assert store.conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0] == 1
+    store.close()
+
+
+def test_importing_an_interrupted_run_skips_its_torn_last_line(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    path = str(tmp_path / 'exchange_data_1725000000.ndjson')
+    write_ndjson(path, [make_listing(URL_A, 's1', 180), make_listing(URL_B, 's1', 90)])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(make_listing(URL_A, 's2', 181))[:40])   # killed mid-write
+    listing_store.import_file(store, path)
+    assert count(store) == 2
+    store.close()
+
+
+def test_live_writes_and_imports_of_a_run_line_up(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    records = [make_listing(URL_A, 's1', 180), make_listing(URL_A, 's2', 181)]
+    run = store.start_run(1725000000)
+    store.write_listings(run, 1725000000, URL_A, records)   # what link_collector writes for a run
+
+    path = str(tmp_path / 'exchange_data_1725000000.ndjson')
+    write_ndjson(path, records)
+    listing_store.import_file(store, path)
+    assert count(store) == 2
+    assert store.conn.execute('SELECT DISTINCT run_time FROM listings').fetchall() == [(1725000000,)]
+    snapshot = store.latest_snapshots(URL_A)
+    assert [r["Run Time"] for r in snapshot] == [1725000000, 1725000000]
+    assert [{k: v for k, v in r.items() if k != "Run Time"} for r in snapshot] == records
+    store.close()
+
+
+def test_daemon_visits_within_a_run_are_kept_apart(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    run = store.start_run(1725000000)
+    for visit, price in ((1725000100, 180), (1725000700, 182), (1725001300, 185)):
+        store.write_listings(run, visit, URL_A, [make_listing(URL_A, 's1', price)])
+    store.write_listings(run, 1725001300, URL_A, [make_listing(URL_A, 's1', 186)])   # retried visit
+    assert count(store, run) == 3
+    assert [r["Per-Want"] for r in store.latest_snapshots(URL_A, n=2)] == \
+        ["1x Divine Orb ⇒ 186x Chaos Orb", "1x Divine Orb ⇒ 182x Chaos Orb"]
+    store.close()
+
+
+def test_snapshots_cover_the_latest_runs_of_one_item(tmp_path):
+    store = listing_store.ListingStore(str(tmp_path / 'listings.db'))
+    for run_epoch, price in ((1725000000, 180), (1725003600, 182), (1725007200, 185)):
+        run = store.start_run(run_epoch)
+        store.write_listings(run, run_epoch, URL_A, [make_listing(URL_A, 's1', price)])
+        store.write_listings(run, run_epoch, URL_B, [make_listing(URL_B, 's1', price / 2)])
+        store.finish_run(run)
+    assert [r["Run Time"] for r in store.latest_snapshots(URL_A, n=2)] == [1725007200, 1725003600]
+    assert {r["URL"] for r in store.latest_snapshots(URL_B)} == {URL_B}
+    assert store.latest_snapshots("https://www.pathofexile.com/trade/exchange/Settlers/unknown") == []
+    assert store.conn.execute('SELECT COUNT(*) FROM runs WHERE finished_at IS NULL').fetchone()[0] == 0
+
+    with pytest.raises(ValueError):
+        listing_store.import_file(store, str(tmp_path / 'listings.json'))
+    store.close()
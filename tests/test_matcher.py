@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from bench_matcher import make_names, make_queries, naive_best
+from matcher import FuzzyMatcher
+
+
+@pytest.fixture(scope='module')
+def candidates():
+    names = make_names(400, random.Random(7))
+    return names + ["Eye_Astrolabe_inventory_icon.png", "Eye_Agate_Astrolabe_inventory_icon.png"]
+
+
+def test_exact_names_win_over_longer_lookalikes(candidates):
+    matcher = FuzzyMatcher(candidates)
+    assert matcher.best_match("Eye_Astrolabe_inventory_icon.png") == ("Eye_Astrolabe_inventory_icon.png", 1.0)
+    assert matcher.best_match("eye astrolabe inventory icon.png") == ("Eye_Astrolabe_inventory_icon.png", 1.0)
+    assert matcher.best_match("Eye_Agate_Astrolabe_inventory_icon.png")[0] == "Eye_Agate_Astrolabe_inventory_icon.png"
+
+
+def test_scores_as_well_as_exhaustive_difflib(candidates):
+    queries = make_queries(candidates, 80, random.Random(11))
+    results = FuzzyMatcher(candidates).match_all(queries)
+    exhaustive = {q: naive_best(q, candidates) for q in queries}
+    # made-up two-word names (every 4th query) have no real match; the rest must agree exactly
+    real = [q for n, q in enumerate(queries) if n % 4 != 2]
+    assert [q for q in real if results[q][1] < exhaustive[q][1]] == []
+    made_up = [q for n, q in enumerate(queries) if n % 4 == 2]
+    shortfalls = [exhaustive[q][1] - results[q][1] for q in made_up]
+    assert sum(s > 0 for s in shortfalls) <= len(made_up) // 10 and max(shortfalls) < 0.02
+
+
+def test_ties_at_the_cutoff_are_all_scored():
+    # 40 names overlap the query equally; the shortlist of 5 must not drop the best one arbitrarily
+    names = [f"Ring_{n:02d}_inventory_icon.png" for n in range(40)]
+    matcher = FuzzyMatcher(names, shortlist=5)
+    assert matcher.best_match("Ring_3_inventory_icon.png")[1] == naive_best("Ring_3_inventory_icon.png", names)[1]
+    assert len(matcher.shortlist_for("Ring_3_inventory_icon.png")) >= 5
+
+
+def test_large_candidate_sets_drop_common_ngrams(candidates):
+    assert not FuzzyMatcher(candidates).stop_grams
+    pruned = FuzzyMatcher(candidates, prune_above=100)
+    assert "_in" in pruned.stop_grams
+    assert pruned.best_match("Eye_Astrolabe_inventory_icon.png")[1] == 1.0
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def run_metrics():
+    clock = FakeClock()
+    m = metrics.RunMetrics('test', 1725000000, clock=clock)
+    m.fake_clock = clock
+    return m
+
+
+def timed(m, phase, url, seconds):
+    with m.span(phase, url):
+        m.fake_clock.now += seconds
+
+
+def test_span_feeds_phase_histogram_and_breakdown(run_metrics):
+    timed(run_metrics, 'navigate', 'u', 2.0)
+    timed(run_metrics, 'extract', 'u', 0.5)
+    assert run_metrics.phases['navigate'].count == 1
+    assert run_metrics.phases['navigate'].sum == pytest.approx(2.0)
+    assert run_metrics.finish_url('u') == {'navigate': 2.0, 'extract': 0.5}
+    assert run_metrics.url_totals.sum == pytest.approx(2.5)
+
+
+def test_failing_span_counts_an_error(run_metrics):
+    with pytest.raises(RuntimeError):
+        with run_metrics.span('navigate', 'u'):
+            raise RuntimeError("boom")
+    assert run_metrics.counters[('errors', 'navigate')] == 1
+    assert run_metrics.phases['navigate'].count == 1
+
+
+def test_revisits_do_not_accumulate(run_metrics):
+    for _ in range(3):
+        run_metrics.start_url('u')
+        timed(run_metrics, 'navigate', 'u', 1.0)
+        assert run_metrics.finish_url('u') == {'navigate': 1.0}
+    assert run_metrics.url_totals.count == 3
+    assert run_metrics.url_totals.sum == pytest.approx(3.0)
+    assert run_metrics.summary()['urls'] == {'u': {'navigate': 1.0}}
+
+
+def test_failed_attempt_is_dropped_by_start_url(run_metrics):
+    run_metrics.start_url('u')
+    timed(run_metrics, 'navigate', 'u', 5.0)   # attempt fails, never finished
+    run_metrics.start_url('u')
+    timed(run_metrics, 'navigate', 'u', 1.0)
+    assert run_metrics.finish_url('u') == {'navigate': 1.0}
+
+
+def test_histogram_quantile_and_buckets():
+    h = metrics.Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 4, 10):
+        h.observe(value)
+    assert h.quantile(0.5) == 2
+    assert h.quantile(1.0) == 10
+    assert h.to_dict()['buckets'] == {'1': 1, '2': 3, '5': 4, '+Inf': 5}
+
+
+def test_write_json_and_prometheus(tmp_path, run_metrics):
+    timed(run_metrics, 'navigate', 'u', 1.0)
+    run_metrics.finish_url('u')
+    run_metrics.inc('urls_scraped')
+    run_metrics.set_gauge('scheduler_coverage', 0.5)
+
+    summary = json.loads(open(run_metrics.write(str(tmp_path / 'm.json')), encoding='utf-8').read())
+    assert summary['counters'] == {'urls_scraped': 1}
+    assert summary['gauges'] == {'scheduler_coverage': 0.5}
+
+    text = open(run_metrics.write(str(tmp_path / 'm.prom')), encoding='utf-8').read()
+    assert 'test_phase_seconds_count{job="test",run_epoch="1725000000",phase="navigate"} 1' in text
+    assert 'test_urls_scraped_total{job="test",run_epoch="1725000000"} 1' in text
+    assert 'test_scheduler_coverage{job="test",run_epoch="1725000000"} 0.5' in text
@@ -0,0 +1,46 @@
+import pytest
+
+import output_sink
+from conftest import make_listing
+
+URL = "https://www.pathofexile.com/trade/exchange/Settlers/abc"
+
+
+def test_write_appends_one_line_per_record(tmp_path):
+    path = str(tmp_path / 'out' / 'exchange_data_1.ndjson')
+    records = [make_listing(URL, 'a', 180), make_listing(URL, 'b', 181)]
+    with output_sink.NdjsonSink(path) as sink:
+        sink.write(records)
+        sink.write([])
+        assert sink.records_written == 2
+    assert list(output_sink.iter_ndjson(path)) == records
+
+
+def test_atomic_undoes_a_failed_write(tmp_path):
+    path = str(tmp_path / 'exchange_data_1.ndjson')
+    first = [make_listing(URL, 'a', 180)]
+    with output_sink.NdjsonSink(path) as sink:
+        sink.write(first)
+        offset = sink.size()
+        with pytest.raises(RuntimeError):
+            with sink.atomic():
+                sink.write([make_listing(URL, 'b', 181), make_listing(URL, 'c', 182)])
+                raise RuntimeError("listing store is locked")   # e.g. the store write after the sink
+        assert sink.size() == offset and sink.records_written == 1
+
+        # a record that cannot be serialised fails halfway through the URL
+        with pytest.raises(TypeError):
+            with sink.atomic():
+                sink.write([make_listing(URL, 'd', 183), {"URL": URL, "bad": object()}])
+        assert sink.size() == offset
+
+        retried = [make_listing(URL, 'b', 181)]
+        with sink.atomic():
+            sink.write(retried)
+    assert list(output_sink.iter_ndjson(path)) == first + retried
+
+
+def test_iter_ndjson_skips_a_torn_line(tmp_path):
+    path = tmp_path / 'exchange_data_1.ndjson'
+    path.write_text('{"URL": "a"}\n{"URL": "b", "Per-W\n', encoding='utf-8')
+    assert list(output_sink.iter_ndjson(str(path))) == [{"URL": "a"}]
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import pipeline
+from conftest import SCRAPER_IMAGES_DIR, stub_server
+
+SIZES = [16, 'full']
+
+
+def image_bytes(color, fmt):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 40), color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def pixel(out_dir, rel_path):
+    with Image.open(os.path.join(out_dir, rel_path)) as img:
+        return img.convert('RGB').getpixel((0, 0))
+
+
+class Files:
+    def __init__(self, files):
+        self.files = files
+
+    def __call__(self, method, path, headers, body):
+        name = path.rsplit('/', 1)[-1]
+        if name not in self.files:
+            return 404, {}, b''
+        return 200, {'Content-Type': 'application/octet-stream'}, self.files[name]
+
+
+def images(base_url, files, sha1s=None):
+    return [{"name": name, "url": f"{base_url}/images/{name}", "sha1": (sha1s or {}).get(name, 'v1')}
+            for name in files]
+
+
+def run(out_dir, images):
+    p = pipeline.IconPipeline(str(out_dir), SIZES, concurrency=2, processes=1)
+    return p, asyncio.run(p.run(images))
+
+
+@pytest.fixture
+def files():
+    red = image_bytes('red', 'PNG')
+    return {'Foo.png': red, 'Foo.gif': image_bytes('blue', 'GIF'), 'Bar.png': red}
+
+
+def test_variants_keep_the_extension_and_duplicates_are_linked(tmp_path, files):
+    with stub_server(Files(files)) as (base_url, _):
+        p, stats = run(tmp_path, images(base_url, files))
+
+    assert stats["encoded"] == 2 and stats["dedup_hits"] == 1 and stats["failed"] == 0
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    for name in files:
+        for label in ('16', 'full'):
+            assert manifest[name]["variants"][label] == pipeline.variant_path(name, label)
+    assert pixel(tmp_path, pipeline.variant_path('Foo.png', '16'))[0] > 200
+    assert pixel(tmp_path, pipeline.variant_path('Foo.gif', '16'))[2] > 200   # not overwritten by Foo.png
+    foo = os.stat(tmp_path / pipeline.variant_path('Foo.png', 'full'))
+    bar = os.stat(tmp_path / pipeline.variant_path('Bar.png', 'full'))
+    assert (foo.st_ino, foo.st_dev) == (bar.st_ino, bar.st_dev)
+    assert manifest['Foo.png']["sha256"] == manifest['Bar.png']["sha256"] != manifest['Foo.gif']["sha256"]
+    assert not [n for n in os.listdir(tmp_path / 'webp' / '16') if n.endswith('.tmp')]
+
+
+def test_rerun_skips_unchanged_and_reencoding_leaves_links_intact(tmp_path, files):
+    with stub_server(Files(files)) as (base_url, server):
+        run(tmp_path, images(base_url, files))
+        server.requests.clear()
+        _, stats = run(tmp_path, images(base_url, files))
+        assert stats["cache_hits"] == 3 and server.requests == []
+
+        # Foo.png changes on the wiki; Bar.png shares its old variants through hard links
+        files['Foo.png'] = image_bytes('lime', 'PNG')
+        _, stats = run(tmp_path, images(base_url, files, {'Foo.png': 'v2'}))
+    assert stats["encoded"] == 1 and stats["cache_hits"] == 2
+    assert pixel(tmp_path, pipeline.variant_path('Foo.png', 'full'))[1] > 200
+    assert pixel(tmp_path, pipeline.variant_path('Bar.png', 'full'))[0] > 200
+
+
+def test_old_layout_entries_are_redone(tmp_path, files):
+    (tmp_path / 'webp' / 'full').mkdir(parents=True)
+    (tmp_path / 'webp' / 'full' / 'Foo.webp').write_bytes(b'stale')
+    (tmp_path / 'manifest.json').write_text(json.dumps({
+        'Foo.png': {"sha1": 'v1', "sha256": 'x', "url": 'old', "variants": {'full': 'webp/full/Foo.webp'}}}))
+    with stub_server(Files(files)) as (base_url, _):
+        _, stats = run(tmp_path, images(base_url, ['Foo.png']))
+    assert stats["cache_hits"] == 0 and stats["encoded"] == 1
+
+
+def test_failed_download_is_counted(tmp_path, files):
+    with stub_server(Files(files)) as (base_url, _):
+        _, stats = run(tmp_path, images(base_url, ['Foo.png', 'Missing.png']))
+    assert stats["encoded"] == 1 and stats["failed"] == 1
+    assert 'Missing.png' not in json.loads((tmp_path / 'manifest.json').read_text())
+
+
+KILLED_RUN = f"""
+import asyncio, json, sys
+sys.path.insert(0, {SCRAPER_IMAGES_DIR!r})
+import pipeline
+p = pipeline.IconPipeline(sys.argv[1], {SIZES!r}, concurrency=1, processes=1, save_every=1)
+asyncio.run(p.run(json.loads(sys.argv[2])))
+"""
+
+
+def test_a_killed_run_resumes_from_its_saved_manifest(tmp_path):
+    colors = ['red', 'lime', 'blue', 'yellow', 'cyan', 'magenta', 'white', 'black']
+    files = {f"Icon_{n}.png": image_bytes(color, 'PNG') for n, color in enumerate(colors)}
+    release = threading.Event()
+    serve = Files(files)
+
+    def handler(method, path, headers, body):
+        # Icon_5 onwards hang until the first run has been killed
+        if path.rsplit('/', 1)[-1] >= 'Icon_5.png':
+            release.wait(30)
+        return serve(method, path, headers, body)
+
+    manifest_path = tmp_path / 'manifest.json'
+    with stub_server(handler) as (base_url, server):
+        todo = images(base_url, files)
+        process = subprocess.Popen([sys.executable, '-c', KILLED_RUN, str(tmp_path), json.dumps(todo)],
+                                   start_new_session=True)
+        try:
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline:
+                if manifest_path.exists() and len(json.loads(manifest_path.read_text())) == 5:
+                    break
+                time.sleep(0.05)
+        finally:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            release.set()
+        assert len(json.loads(manifest_path.read_text())) == 5
+
+        server.requests.clear()
+        _, stats = run(tmp_path, todo)
+    assert stats["cache_hits"] == 5 and stats["encoded"] == 3 and stats["failed"] == 0
+    assert sorted(path.rsplit('/', 1)[-1] for _, path, _ in server.requests) == ['Icon_5.png', 'Icon_6.png',
+                                                                               'Icon_7.png']
+    assert len(json.loads(manifest_path.read_text())) == 8
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_engine
+from conftest import make_listing
+
+URL_A = "https://www.pathofexile.com/trade/exchange/Settlers/a"
+URL_B = "https://www.pathofexile.com/trade/exchange/Settlers/b"
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("2x Divine Orb", (2.0, "Divine Orb", 1)),
+    ("2 ×  Divine Orb", (2.0, "Divine Orb", 1)),        # browser runs from before normalize_offer()
+    ("2×Divine Orb", (2.0, "Divine Orb", 1)),
+    ("1,250x Chaos Orb", (1250.0, "Chaos Orb", 1)),
+    ("0.5x Mirror Shard | 3x Chaos Orb", (0.5, "Mirror Shard", 2)),
+])
+def test_parse_side(text, expected):
+    assert price_engine.parse_side(text) == expected
+
+
+@pytest.mark.parametrize('text', ["N/A", "", None, "Divine Orb"])
+def test_parse_side_without_an_amount(text):
+    amount, currency, _ = price_engine.parse_side(text)
+    assert math.isnan(amount) and currency is None
+
+
+def test_parse_rate():
+    assert price_engine.parse_rate("1x Divine Orb ⇒ 180x Chaos Orb") == 180.0
+    assert price_engine.parse_rate("4x Chaos Orb ⇒ 1x Exalted Orb") == 0.25
+    assert math.isnan(price_engine.parse_rate("N/A"))
+    assert math.isnan(price_engine.parse_rate("0x Divine Orb ⇒ 180x Chaos Orb"))
+
+
+def test_parse_listings_falls_back_to_the_offer_amounts():
+    records = [
+        make_listing(URL_A, 's1', 180, stock=5),
+        dict(make_listing(URL_A, 's2', 1), **{"What You Get": "2 ×  Divine Orb", "What You Pay": "362x Chaos Orb",
+                                               "Per-Want": "N/A", "Per-Have": "N/A"}),
+        dict(make_listing(URL_A, 's3', 1), **{"What You Pay": "N/A", "Per-Want": "N/A", "Per-Have": "N/A",
+                                               "Items in Stock": "N/A", "Player Status": None}),
+    ]
+    listings = price_engine.parse_listings(records)
+    assert listings["price"].tolist()[:2] == [180.0, 181.0]
+    assert listings["inverse"][1] == pytest.approx(1 / 181)
+    assert math.isnan(listings["price"][2]) and listings["stock"][2] == 0 and not listings["online"][2]
+    assert listings["get_currency"].tolist() == ["Divine Orb"] * 3
+    assert listings["pay_currency"].tolist()[:2] == ["Chaos Orb"] * 2
+
+
+def test_empty_records_give_an_empty_typed_frame():
+    full = price_engine.parse_listings([make_listing(URL_A, 's1', 180)])
+    for empty in (price_engine.parse_listings([]), price_engine.parse_listings(pd.DataFrame())):
+        assert empty.empty and empty.dtypes.astype(str).to_dict() == full.dtypes.astype(str).to_dict()
+    tagged = price_engine.parse_listings(pd.DataFrame(columns=["URL", "run_epoch"]))
+    assert list(tagged.columns[:2]) == ["URL", "run_epoch"] and tagged["run_epoch"].dtype == np.int64
+    assert price_engine.aggregate(tagged, by_run=True).empty
+
+
+def test_aggregate_per_item():
+    records = [make_listing(URL_A, 's1', 180, stock=1), make_listing(URL_A, 's2', 182, stock=10),
+               make_listing(URL_A, 's2', 190, stock=1, online=False), make_listing(URL_B, 's1', 90, stock=3),
+               dict(make_listing(URL_B, 's3', 1), **{"Per-Want": "N/A", "What You Pay": "N/A"})]
+    result = price_engine.aggregate(price_engine.parse_listings(records))
+    a, b = result.loc[URL_A], result.loc[URL_B]
+    assert (a["best"], a["worst"], a["weighted_median"]) == (180.0, 190.0, 182.0)
+    assert a["mean"] == pytest.approx(184.0) and a["spread"] == pytest.approx(10 / 180)
+    assert (a["listings"], a["sellers"], a["stock"]) == (3, 2, 12)
+    assert (b["listings"], b["sellers"], b["best"]) == (1, 1, 90.0)   # the unpriced listing is dropped
+
+    online = price_engine.aggregate(price_engine.parse_listings(records), online_only=True).loc[URL_A]
+    assert (online["worst"], online["listings"]) == (182.0, 2)
+
+
+def test_aggregate_by_run():
+    records = [dict(make_listing(URL_A, 's1', price), run_epoch=run) for run, price in
+               ((1725000000, 180), (1725000000, 184), (1725003600, 185))]
+    result = price_engine.aggregate(price_engine.parse_listings(records), by_run=True)
+    assert result["best"].to_dict() == {(1725000000, URL_A): 180.0, (1725003600, URL_A): 185.0}
@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+import rate_limiter
+
+HOST = "https://www.pathofexile.com"
+
+
+class FakeClock:
+    """time and sleep for the limiter; sleeping just moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_limiter(clock, rate=1.0, capacity=2, sleep=None):
+    return rate_limiter.RateLimiter({"www.pathofexile.com": {"rate": rate, "capacity": capacity}},
+                                    clock=clock, sleep=sleep or clock.sleep)
+
+
+def concurrent_waits(limiter, n):
+    """Waits of n threads calling acquire() at the same instant (the clock does not move)."""
+    waits = []
+    lock = threading.Lock()
+
+    def worker():
+        wait = limiter.acquire(HOST)
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(waits)
+
+
+def test_bucket_bursts_then_refills(clock):
+    bucket = rate_limiter.TokenBucket(rate=2.0, capacity=3, clock=clock)
+    assert [bucket.reserve() for _ in range(5)] == [0.0, 0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.0   # pays back the two borrowed tokens
+    assert bucket.reserve() == 0.5
+    clock.now += 60
+    assert bucket.tokens == pytest.approx(-1.0)
+    bucket.reserve()
+    assert bucket.tokens == pytest.approx(2.0)   # refill stops at capacity
+
+
+def test_acquire_paces_requests(clock):
+    limiter = make_limiter(clock, rate=0.5, capacity=2)
+    for _ in range(5):
+        limiter.acquire(HOST)
+    assert clock.slept == [2.0, 2.0, 2.0]
+    assert limiter.requests == 5 and limiter.waited == pytest.approx(6.0)
+
+
+def test_throttle_halves_rate_then_recovers_additively(clock):
+    limiter = make_limiter(clock, rate=1.0)
+    host = limiter.for_url(HOST)
+    assert limiter.observe(HOST, 429, {'Retry-After': '30'}) is True
+    assert host.bucket.rate == 0.5 and host.blocked_until == clock.now + 30
+    limiter.observe(HOST, 429, {'Retry-After': '30'})
+    assert host.bucket.rate == 0.25
+    for _ in range(10):
+        limiter.observe(HOST, 429)
+    assert host.bucket.rate == 1.0 / 16   # floor
+
+    rates = []
+    for _ in range(40):
+        limiter.observe(HOST, 200)
+        rates.append(host.bucket.rate)
+    assert rates[0] == pytest.approx(1.1 / 16)
+    assert rates == sorted(rates) and rates[-1] == 1.0   # back to the configured rate, never above
+    assert host.consecutive_throttles == 0 and limiter.throttles == 12
+
+
+def test_exponential_backoff_without_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    host = make_limiter(clock).for_url(HOST)
+    assert [host.on_throttled() for _ in range(6)] == [15, 30, 60, 120, 240, 300]
+
+
+def test_waiters_behind_a_backoff_are_staggered(clock):
+    limiter = make_limiter(clock, rate=1.0, capacity=2, sleep=lambda seconds: None)
+    limiter.observe(HOST, 429, {'Retry-After': '10'})
+    # five workers ask at once: the first goes when the block ends, the rest
+    # follow at the halved rate instead of bursting together
+    assert concurrent_waits(limiter, 5) == pytest.approx([10, 12, 14, 16, 18])
+
+
+def test_policy_headers_set_the_rate(clock):
+    limiter = make_limiter(clock, rate=1.0, capacity=4, sleep=lambda seconds: None)
+    host = limiter.for_url(HOST)
+    limiter.observe(HOST, 200, {'X-Rate-Limit-Rules': 'Ip,Account',
+                                'X-Rate-Limit-Ip': '7:15:60,15:90:120', 'X-Rate-Limit-Ip-State': '1:15:0,1:90:0',
+                                'X-Rate-Limit-Account': '60:300:60', 'X-Rate-Limit-Account-State': '2:300:0'})
+    # the tightest rule, 15 hits per 90 s, leaves 14 / 90 after one token of burst
+    assert host.max_rate == pytest.approx(14 / 90)
+    assert host.bucket.capacity == 1.0 and host.blocked_until == 0.0
+    assert concurrent_waits(limiter, 3) == pytest.approx([0, 90 / 14, 2 * 90 / 14])
+
+
+def test_policy_state_near_the_limit_blocks(clock):
+    limiter = make_limiter(clock, sleep=lambda seconds: None)
+    host = limiter.for_url(HOST)
+    limiter.observe(HOST, 200, {'X-Rate-Limit-Rules': 'Ip', 'X-Rate-Limit-Ip': '5:10:60',
+                                'X-Rate-Limit-Ip-State': '4:10:0'})
+    assert host.blocked_until == pytest.approx(clock.now + 2.0)   # one period / hits
+    limiter.observe(HOST, 429, {'X-Rate-Limit-Rules': 'Ip', 'X-Rate-Limit-Ip': '5:10:60',
+                                'X-Rate-Limit-Ip-State': '6:10:60', 'Retry-After': '60'})
+    assert host.blocked_until == pytest.approx(clock.now + 60)
+    assert concurrent_waits(limiter, 2) == pytest.approx([60, 60 + 1 / 0.2])   # rate halved to 0.2
+
+
+def test_hosts_are_limited_independently(clock):
+    limiter = make_limiter(clock)
+    limiter.observe(HOST, 429, {'Retry-After': '30'})
+    assert limiter.acquire("https://www.poewiki.net/wiki/Divine_Orb") == 0.0
+    assert limiter.acquire(HOST + "/trade") == pytest.approx(30)
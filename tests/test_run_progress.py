@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+import run_progress
+
+URLS = [f"https://www.pathofexile.com/trade/exchange/Settlers/{c}" for c in 'abcd']
+
+
+class FakeClock:
+    def __init__(self, now=1725000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'urls.db')
+
+
+def test_urls_move_from_pending_to_done_or_failed(db_path):
+    clock = FakeClock()
+    progress = run_progress.RunProgress(1725000000, db_path, clock=clock)
+    progress.add(URLS)
+    progress.add(URLS[:2])   # registering again leaves the rows alone
+    assert progress.urls() == URLS
+    assert progress.counts() == {'pending': 4, 'in_progress': 0, 'done': 0, 'failed': 0}
+
+    first = progress.claim(worker=1)
+    second = progress.claim(worker=2)
+    assert (first, second) == (URLS[0], URLS[1])
+    clock.now += 2.5
+    progress.done(first, records=12, sink_offset=4096)
+    progress.failed(second, RuntimeError("Timed out"))
+    assert progress.counts() == {'pending': 2, 'in_progress': 0, 'done': 1, 'failed': 1}
+    assert progress.sink_offset() == 4096
+    row = progress.conn.execute('SELECT attempts, worker, duration, records FROM run_progress WHERE url=?',
+                                (first,)).fetchone()
+    assert row == (1, 1, 2.5, 12)
+    assert progress.conn.execute('SELECT error FROM run_progress WHERE url=?', (second,)).fetchone() == ("Timed out",)
+    progress.close()
+
+
+def test_failed_urls_are_retried_until_they_run_out_of_attempts(db_path):
+    progress = run_progress.RunProgress(1725000000, db_path, clock=FakeClock())
+    progress.add(URLS[:1])
+    for attempt in range(1, 4):
+        assert progress.claim() == URLS[0]
+        progress.failed(URLS[0], "blocked")
+        assert progress.retry_failed(max_attempts=3) == (1 if attempt < 3 else 0)
+    assert progress.claim() is None
+    assert progress.counts()['failed'] == 1
+    progress.close()
+
+
+def test_resume_requeues_interrupted_urls_and_keeps_the_sink_offset(db_path):
+    progress = run_progress.RunProgress(1725000000, db_path, clock=FakeClock())
+    progress.add(URLS)
+    for offset, url in ((100, progress.claim()), (250, progress.claim())):
+        progress.done(url, 1, sink_offset=offset)
+    progress.claim()                      # left in_progress by the process that died
+    progress.failed(progress.claim(), "crashed")
+    progress.close()
+
+    resumed = run_progress.RunProgress(1725000000, db_path, clock=FakeClock())
+    assert resumed.resume(max_attempts=3) == 2
+    assert resumed.counts() == {'pending': 2, 'in_progress': 0, 'done': 2, 'failed': 0}
+    assert resumed.sink_offset() == 250
+    assert [resumed.claim(), resumed.claim(), resumed.claim()] == [URLS[2], URLS[3], None]
+    resumed.close()
+
+
+def test_concurrent_workers_never_claim_the_same_url(db_path):
+    urls = [f"https://www.pathofexile.com/trade/exchange/Settlers/{n}" for n in range(200)]
+    setup = run_progress.RunProgress(1725000000, db_path)
+    setup.add(urls)
+    setup.close()
+    claimed = []
+
+    def worker(n):
+        progress = run_progress.RunProgress(1725000000, db_path)
+        while (url := progress.claim(worker=n)) is not None:
+            claimed.append(url)
+            progress.done(url, 0)
+        progress.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(urls)
+
+
+def test_runs_are_kept_apart_and_listed_newest_first(db_path):
+    assert run_progress.list_runs(db_path) == []
+    older = run_progress.RunProgress(1725000000, db_path, clock=FakeClock())
+    older.add(URLS)
+    older.done(older.claim(), 3)
+    newer = run_progress.RunProgress(1725003600, db_path, clock=FakeClock())
+    newer.add(URLS[:2])
+    assert newer.claim() == URLS[0] and newer.sink_offset() == 0
+    assert run_progress.list_runs(db_path) == [(1725003600, 2, 0, 0, 2, 1), (1725000000, 4, 1, 0, 3, 1)]
+    older.close()
+    newer.close()
@@ -0,0 +1,157 @@
+import math
+import random
+
+import pytest
+
+import scheduler
+from conftest import make_listing
+
+HOT = [f"https://www.pathofexile.com/trade/exchange/Standard/hot{i}" for i in range(10)]
+QUIET = [f"https://www.pathofexile.com/trade/exchange/Standard/quiet{i}" for i in range(30)]
+
+
+def listings(url, price, n=20):
+    return [make_listing(url, f"s{k}", price * (1 + 0.01 * k)) for k in range(n)]
+
+
+@pytest.fixture
+def clock():
+    return scheduler.SimClock(start=1_725_000_000)
+
+
+def make_scheduler(clock, db=':memory:', **options):
+    return scheduler.Scheduler(db, clock=clock.time, sleep=clock.sleep, **options)
+
+
+def test_volatility_is_an_ewma_of_moves_per_sqrt_hour(clock):
+    s = make_scheduler(clock, alpha=0.5, stock_weight=0.0)
+    url = HOT[0]
+    s.sync([url])
+    s.record(url, listings(url, 100))
+    assert s.state[url]["volatility"] is None
+
+    clock.sleep(3600)
+    s.record(url, listings(url, 100 * math.e ** 0.04))
+    # prices go through the records' "%g" formatting, hence the tolerance
+    assert s.state[url]["volatility"] == pytest.approx(0.04, rel=1e-3)
+
+    clock.sleep(4 * 3600)
+    s.record(url, listings(url, 100 * math.e ** 0.04))  # no move over 4 h
+    assert s.state[url]["volatility"] == pytest.approx(0.02, rel=1e-3)
+
+
+def test_base_interval_follows_volatility_and_listings(clock):
+    s = make_scheduler(clock)
+    assert s.base_interval(None, 0) == s.min_interval
+    assert s.base_interval(0.5, 40) == s.min_interval
+    assert s.base_interval(0.0, 40) == s.max_interval
+    busy, thin = s.base_interval(0.04, 40), s.base_interval(0.04, 0)
+    assert busy == pytest.approx((0.02 / 0.04) ** 2 * 3600)
+    assert thin == pytest.approx(2 * busy)
+
+
+def test_next_url_returns_the_soonest_due(clock):
+    s = make_scheduler(clock, budget=100)
+    s.sync(HOT[:3])
+    for url, delay in zip(HOT[:3], (900, 300, 600)):
+        s.state[url].update(last_visit=clock.time(), failures=0)
+        s._reschedule(url, s.state[url], s.state[url]["interval"], clock.time() + delay)
+    url, wait = s.next_url()
+    assert url == HOT[1] and wait == pytest.approx(300)
+
+
+def simulate(clock, s, hours, budget, seed=7):
+    """Random-walk prices: hot items move 10%/sqrt(h), quiet ones 0.2%/sqrt(h)."""
+    rng = random.Random(seed)
+    prices = {url: 100.0 for url in HOT + QUIET}
+    updated = {url: clock.time() for url in prices}
+    visits = {url: 0 for url in prices}
+
+    def scrape(url):
+        sigma = 0.10 if url in HOT else 0.002
+        hours_passed = (clock.time() - updated[url]) / 3600
+        prices[url] *= math.exp(rng.gauss(0, sigma * math.sqrt(hours_passed)))
+        updated[url] = clock.time()
+        visits[url] += 1
+        clock.sleep(1.0)
+        return listings(url, prices[url])
+
+    start = clock.time()
+    s.sync(HOT + QUIET)
+    scheduler.run_daemon(s, scrape, lambda url, data: None, stop=lambda: clock.time() - start >= hours * 3600)
+    return visits
+
+
+def test_volatile_urls_are_visited_more_often(clock):
+    s = make_scheduler(clock, budget=0.05)
+    visits = simulate(clock, s, hours=8, budget=0.05)
+
+    hot = sum(visits[u] for u in HOT) / len(HOT)
+    quiet = sum(visits[u] for u in QUIET) / len(QUIET)
+    assert hot > 3 * quiet
+    hot_interval = sum(s.state[u]["interval"] for u in HOT) / len(HOT)
+    quiet_interval = sum(s.state[u]["interval"] for u in QUIET) / len(QUIET)
+    assert hot_interval < quiet_interval
+    assert quiet_interval == pytest.approx(s.max_interval, rel=0.2)
+
+
+@pytest.mark.parametrize('budget', [0.005, 0.05])
+def test_total_visits_stay_within_budget(clock, budget):
+    s = make_scheduler(clock, budget=budget)
+    hours = 6
+    visits = simulate(clock, s, hours=hours, budget=budget)
+    # One visit per 1 / budget seconds at most, start-up backlog included
+    assert sum(visits.values()) <= budget * hours * 3600 + 1
+    freshness = s.freshness()
+    assert freshness["visits"] == sum(visits.values())
+    assert freshness["planned_rate"] <= budget * 1.05
+
+
+def test_failures_back_off_exponentially(clock):
+    s = make_scheduler(clock, budget=100)
+    s.sync(HOT[:1])
+    delays = [s.record_failure(HOT[0]) for _ in range(6)]
+    assert delays == [300, 600, 1200, 2400, 3600, 3600]
+    s.record(HOT[0], listings(HOT[0], 100))
+    assert s.state[HOT[0]]["failures"] == 0
+
+
+def test_state_persists_across_restarts(clock, tmp_path):
+    db = str(tmp_path / 'urls.db')
+    s = make_scheduler(clock, db)
+    s.sync(HOT[:2])
+    s.record(HOT[0], listings(HOT[0], 100))
+    clock.sleep(600)
+    s.record(HOT[0], listings(HOT[0], 110))
+    before = dict(s.state[HOT[0]])
+    s.close()
+
+    resumed = make_scheduler(clock, db)
+    resumed.sync(HOT[:2])
+    after = resumed.state[HOT[0]]
+    assert after["visits"] == 2
+    assert after["volatility"] == pytest.approx(before["volatility"])
+    assert after["last_visit"] == before["last_visit"]
+    resumed.close()
+
+    dropped = make_scheduler(clock, db)
+    dropped.sync(HOT[1:3])   # HOT[0] left the URL list, HOT[2] joined it
+    assert set(dropped.state) == {HOT[1], HOT[2]}
+    dropped.close()
+
+
+def test_a_failing_write_backs_the_url_off_and_the_daemon_keeps_going(clock):
+    s = make_scheduler(clock, budget=100)
+    s.sync(HOT[:2])
+    written = []
+
+    def write_result(url, data):
+        if url == HOT[0]:
+            raise OSError("database is locked")
+        written.append(url)
+
+    start = clock.time()
+    scheduler.run_daemon(s, lambda url: listings(url, 100), write_result, stop=lambda: clock.time() - start >= 3600)
+    assert s.state[HOT[0]]["visits"] == 0 and s.state[HOT[0]]["failures"] >= 2
+    assert s.failures == s.state[HOT[0]]["failures"]
+    assert written and set(written) == {HOT[1]} and s.state[HOT[1]]["visits"] == len(written)
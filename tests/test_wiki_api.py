@@ -0,0 +1,139 @@
+import json
+import os
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+import crawler
+import wiki_api
+from conftest import (FIXTURES_DIR, WIKI_CHROME_IMAGES, WIKI_ROOT_PATH, WikiStub, stub_server,
+                      wiki_leaf_files)
+
+API_FIXTURES = os.path.join(FIXTURES_DIR, 'wiki_api')
+ROOT = 'Category:Amulet icons'
+
+
+def recorded(name):
+    with open(os.path.join(API_FIXTURES, f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# category -> (subcategory responses, file responses), each in continuation order
+RECORDED = {
+    ROOT: (['amulet_icons_subcats_1', 'amulet_icons_subcats_2'],
+           ['amulet_icons_files_1', 'amulet_icons_files_2', 'amulet_icons_files_3']),
+    'Category:Talisman icons': (['talisman_icons_subcats'], ['talisman_icons_files']),
+}
+
+
+def leaf_files(title):
+    names = wiki_leaf_files(title.split(':', 1)[1])
+    pages = [{"pageid": 7000 + n, "ns": 6, "title": "File:" + name.replace('_', ' '), "imagerepository": "local",
+              "imageinfo": [{"size": 6000, "width": 78, "height": 78, "url": f"https://www.poewiki.net/images/{name}",
+                             "sha1": f"{n:040x}"}]}
+             for n, name in enumerate(names)]
+    return [{"batchcomplete": True, "query": {"pages": pages}}]
+
+
+class ApiStub:
+    """stub_server handler for api.php: replays the recorded responses and checks continuation."""
+
+    def __init__(self):
+        self.calls = []
+
+    def responses(self, params):
+        if params.get('list') == 'categorymembers':
+            title, kind, token = params['cmtitle'], 'subcat', 'cmcontinue'
+        else:
+            title, kind, token = params['gcmtitle'], 'file', 'gcmcontinue'
+        title = title.replace('_', ' ')   # MediaWiki accepts either form
+        self.calls.append((kind, title, params.get(token)))
+        if title.rstrip() == 'Category:':
+            return [{"error": {"code": "invalidtitle", "info": f'Bad title "{title}".'}}]
+        if title in RECORDED:
+            return [recorded(name) for name in RECORDED[title][kind == 'file']]
+        if kind == 'subcat':
+            return [{"batchcomplete": True, "query": {"categorymembers": []}}]
+        return leaf_files(title)
+
+    def __call__(self, method, path, headers, body):
+        url = urlparse(path)
+        params = dict(parse_qsl(url.query))
+        if url.path != wiki_api.API_PATH:
+            return 404, {}, 'Not Found'
+        assert params.get('action') == 'query' and params.get('formatversion') == '2'
+        responses = self.responses(params)
+        # the first response, or the one after the response whose continue set matches the request
+        index = 0
+        for i, previous in enumerate(responses[:-1]):
+            if all(params.get(k) == v for k, v in previous.get('continue', {}).items()):
+                index = i + 1
+        return 200, {'Content-Type': 'application/json'}, json.dumps(responses[index])
+
+
+@pytest.fixture
+def api():
+    stub = ApiStub()
+    with stub_server(stub) as (base_url, server):
+        stub.base_url = base_url
+        yield stub
+
+
+def test_category_title():
+    assert wiki_api.category_title("https://www.poewiki.net/wiki/Category:Amulet_icons") == ROOT
+    assert wiki_api.category_title("https://www.poewiki.net/wiki/Category:Three_Rat_%28Legacy%29") == \
+        'Category:Three Rat (Legacy)'
+    assert wiki_api.file_name('File:Araku Tiki inventory icon.png') == 'Araku_Tiki_inventory_icon.png'
+
+
+def test_category_files_follow_continue(api):
+    client = wiki_api.WikiApiClient(api.base_url)
+    files = client.category_files(ROOT)
+    assert len(files) == 300 and client.requests_made == 3
+    # pages split across responses get their imageinfo from the later one
+    assert all(f["url"] and f["sha1"] and f["size"] for f in files)
+    assert [token for _, _, token in api.calls] == [None, recorded('amulet_icons_files_1')["continue"]["gcmcontinue"],
+                                                    recorded('amulet_icons_files_2')["continue"]["gcmcontinue"]]
+
+
+def test_subcategories_follow_continue(api):
+    client = wiki_api.WikiApiClient(api.base_url)
+    assert client.subcategories(ROOT) == [
+        'Category:Amulet icons', 'Category:Belt icons', 'Category:Ring icons', 'Category:Unique amulet icons',
+        'Category:Talisman icons', 'Category:Legacy amulet icons', 'Category:Race reward amulet icons',
+        'Category:Atlas base amulet icons']
+    assert client.requests_made == 2
+
+
+def test_list_images_walks_subcategories_breadth_first(api):
+    client = wiki_api.WikiApiClient(api.base_url)
+    images = client.list_images("https://www.poewiki.net" + WIKI_ROOT_PATH)
+
+    listed = [title for kind, title, token in api.calls if kind == 'file' and token is None]
+    assert listed[0] == ROOT and listed[-1] == 'Category:Unique talisman icons'
+    assert len(listed) == len(set(listed)) == 9   # back links to the root and siblings are not followed
+    names = [image["name"] for image in images]
+    assert len(names) == len(set(names)) == 300 + 5 + 7 * 2
+    assert names[:300] == [f["name"] for f in wiki_api.WikiApiClient(api.base_url).category_files(ROOT)]
+
+
+def test_max_depth(api):
+    client = wiki_api.WikiApiClient(api.base_url)
+    assert len(client.list_images("https://www.poewiki.net" + WIKI_ROOT_PATH, max_depth=0)) == 300
+    assert len(client.list_images("https://www.poewiki.net" + WIKI_ROOT_PATH, max_depth=1)) == 300 + 5 + 6 * 2
+
+
+def test_matches_the_html_backend(api):
+    api_names = wiki_api.get_image_names("https://www.poewiki.net" + WIKI_ROOT_PATH, base_url=api.base_url)
+    with stub_server(WikiStub(delay=0)) as (base_url, _):
+        html_names = crawler.crawl_image_names(base_url + WIKI_ROOT_PATH, base_url=base_url)
+    # the rendered pages also carry the site logo and footer images
+    assert set(api_names) == set(html_names) - WIKI_CHROME_IMAGES
+    assert WIKI_CHROME_IMAGES <= set(html_names)
+
+
+def test_errors_raise(api):
+    with pytest.raises(Exception, match='Bad title'):
+        wiki_api.WikiApiClient(api.base_url).category_files('Category:')
+    with pytest.raises(Exception, match='404'):
+        wiki_api.WikiApiClient(api.base_url + '/nowiki').category_files(ROOT)